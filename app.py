@@ -4,9 +4,34 @@ Entry point for Golf Club Email Bot
 This file imports the Flask app for Gunicorn
 """
 
-from island_email_bot import app
+import logging
+import os
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def serve(default_port: int):
+    """
+    Run the app under gunicorn with the production config (gunicorn.conf.py:
+    threaded workers), so local runs handle concurrent webhooks like Render does.
+    Falls back to Flask's threaded development server if gunicorn isn't installed.
+
+    island_email_bot isn't imported before the exec - gunicorn's workers import
+    it themselves, and this process would only open the DB pool and replay
+    Stripe events to be replaced straight away
+    """
+    os.environ.setdefault('PORT', str(default_port))
+    try:
+        # gunicorn reads --config before applying --chdir, so the path is absolute
+        os.execvp('gunicorn', ['gunicorn', '--chdir', APP_DIR,
+                               '--config', os.path.join(APP_DIR, 'gunicorn.conf.py'), 'app:app'])
+    except OSError:
+        from island_email_bot import app
+        logging.warning("⚠️  gunicorn not found - using Flask development server")
+        app.run(host='0.0.0.0', port=int(os.environ['PORT']), debug=False, threaded=True)
+
 
 if __name__ == '__main__':
-    import os
-    port = int(os.getenv('PORT', 10000))
-    app.run(host='0.0.0.0', port=port)
+    serve(10000)
+else:
+    from island_email_bot import app
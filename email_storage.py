@@ -8,7 +8,7 @@ import json
 import logging
 import psycopg2
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 logger = logging.getLogger(__name__)
 
@@ -117,6 +117,31 @@ def save_inbound_email(
             conn.close()
 
 
+# Shared by the single and batched processing status updates
+UPDATE_PROCESSING_STATUS_SQL = """
+    UPDATE inbound_emails
+    SET processing_status = %s,
+        processed_at = %s,
+        booking_id = COALESCE(%s, booking_id),
+        error_message = %s,
+        parsed_data = COALESCE(%s::jsonb, parsed_data)
+    WHERE message_id = %s
+"""
+
+
+def processing_status_params(
+    processed_at: datetime,
+    message_id: str,
+    status: str,
+    booking_id: str = None,
+    error_message: str = None,
+    parsed_data: dict = None
+) -> tuple:
+    """Parameters for UPDATE_PROCESSING_STATUS_SQL, with parsed_data as JSON"""
+    parsed_json = json.dumps(parsed_data) if parsed_data else None
+    return (status, processed_at, booking_id, error_message, parsed_json, message_id)
+
+
 def update_email_processing_status(
     message_id: str,
     status: str,
@@ -144,19 +169,9 @@ def update_email_processing_status(
             return False
 
         cursor = conn.cursor()
-
-        # Convert parsed_data to JSON
-        parsed_json = json.dumps(parsed_data) if parsed_data else None
-
-        cursor.execute("""
-            UPDATE inbound_emails
-            SET processing_status = %s,
-                processed_at = %s,
-                booking_id = COALESCE(%s, booking_id),
-                error_message = %s,
-                parsed_data = COALESCE(%s::jsonb, parsed_data)
-            WHERE message_id = %s
-        """, (status, datetime.now(), booking_id, error_message, parsed_json, message_id))
+        cursor.execute(UPDATE_PROCESSING_STATUS_SQL, processing_status_params(
+            datetime.now(), message_id, status, booking_id, error_message, parsed_data
+        ))
 
         conn.commit()
         cursor.close()
@@ -175,6 +190,49 @@ def update_email_processing_status(
             conn.close()
 
 
+def update_email_processing_statuses(updates: List[Dict[str, Any]]) -> bool:
+    """
+    Apply several processing status updates in one connection and transaction
+
+    Args:
+        updates: dicts with the update_email_processing_status() arguments
+                 (message_id, status, and optionally booking_id, error_message, parsed_data)
+
+    Returns:
+        bool: True if all updates were applied
+    """
+    if not updates:
+        return True
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        if not conn:
+            return False
+
+        cursor = conn.cursor()
+
+        processed_at = datetime.now()
+        rows = [processing_status_params(processed_at, **update) for update in updates]
+        cursor.executemany(UPDATE_PROCESSING_STATUS_SQL, rows)
+
+        conn.commit()
+        cursor.close()
+
+        logger.info(f"✅ Updated processing status for {len(rows)} email(s)")
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Failed to update email statuses: {e}")
+        if conn:
+            conn.rollback()
+        return False
+
+    finally:
+        if conn:
+            conn.close()
+
+
 def get_inbound_email(message_id: str) -> Optional[Dict[str, Any]]:
     """
     Retrieve an inbound email by Message-ID
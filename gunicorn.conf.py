@@ -0,0 +1,23 @@
+"""
+Gunicorn configuration for the Golf Club Email Bot
+Used by the Procfile / render.yaml start command
+"""
+
+import os
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+
+# Threaded workers: checkout endpoints block on Stripe HTTPS round-trips
+# (100-500ms), so each worker overlaps several requests instead of one
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+
+def worker_exit(server, worker):
+    # Let the Stripe event worker finish events already acknowledged with a 200
+    # before this worker process goes away
+    bot = sys.modules.get("island_email_bot")
+    if bot is not None:
+        bot.drain_stripe_event_queue()
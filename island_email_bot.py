@@ -36,32 +36,81 @@ Additional Flow:
   Note: "Customer replied again on [timestamp]"
 """
 
-from flask import Flask, request, jsonify, redirect, render_template
+from flask import Flask, request, redirect, render_template, Response
+from html import escape as escape_html
+import jinja2
+from markupsafe import Markup
 import logging
+import logging.handlers
+import atexit
 import json
 import os
+import sys
 import requests
 from datetime import datetime, timedelta
 from dateutil import parser as date_parser
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content
 import psycopg2
 from psycopg2.extras import RealDictCursor, Json
-from psycopg2.pool import SimpleConnectionPool
-from typing import List, Dict, Optional
+from psycopg2.pool import ThreadedConnectionPool
+from typing import List, Dict, Optional, Union
 import uuid
 import hashlib
+import io
+from decimal import Decimal, ROUND_HALF_UP
+import gzip
+import shutil
+import queue
+import weakref
 import re
 from urllib.parse import quote
-from threading import Thread
+from threading import Thread, Lock, Timer
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from functools import lru_cache, wraps
+from itertools import groupby
+from operator import itemgetter
 import time
 import stripe
-from email_storage import save_inbound_email, update_email_processing_status
+from urllib3.exceptions import NewConnectionError
+from email_storage import save_inbound_email, update_email_processing_statuses
+
+# orjson parses/serializes JSON several times faster than the stdlib json module.
+# Fall back to the stdlib if it isn't installed.
+try:
+    import orjson
+    fast_json_loads = orjson.loads
+    fast_json_dumps = orjson.dumps
+except ImportError:
+    orjson = None
+    fast_json_loads = json.loads
+
+    def fast_json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+
+def fast_json_text(obj) -> str:
+    """fast_json_dumps() as str - the dumps hook for psycopg2 Json params"""
+    return fast_json_dumps(obj).decode('utf-8')
+
+
+# json/jsonb columns read back through psycopg2 are parsed with the same parser
+psycopg2.extras.register_default_json(loads=fast_json_loads)
+psycopg2.extras.register_default_jsonb(loads=fast_json_loads)
+
+# RE2 guarantees linear-time matching on untrusted inbound email bodies.
+# Fall back to the stdlib engine if the binding isn't installed.
+try:
+    import re2
+    RE2_AVAILABLE = True
+except ImportError:
+    re2 = re
+    RE2_AVAILABLE = False
 
 app = Flask(__name__)
 
 # --- CONFIG ---
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
+SENDGRID_MAIL_SEND_URL = "https://api.sendgrid.com/v3/mail/send"
 FROM_EMAIL = os.getenv("FROM_EMAIL", "clubname@bookings.teemail.io")
 FROM_NAME = os.getenv("FROM_NAME", "Golf Club Bookings")
 PER_PLAYER_FEE = float(os.getenv("PER_PLAYER_FEE", "325.00"))
@@ -69,6 +118,10 @@ BOOKINGS_FILE = os.getenv("BOOKINGS_FILE", "provisional_bookings.jsonl")
 
 # PostgreSQL Configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Per-process pool bounds - the max must cover every thread that can hold a
+# connection at once (gunicorn threads + email/storage/Stripe workers)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "24"))
 
 # Core API endpoint (for availability checking)
 CORE_API_URL = os.getenv("CORE_API_URL", "https://core-new-aku3.onrender.com")
@@ -91,22 +144,98 @@ CLUB_BOOKING_EMAIL = os.getenv("CLUB_BOOKING_EMAIL", "clubname@bookings.teemail.
 # Stripe Configuration
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+STRIPE_TEST_MODE = bool(STRIPE_SECRET_KEY and STRIPE_SECRET_KEY.startswith('sk_test_'))
 # Success/Cancel URLs now point to app endpoints (can be overridden via env vars)
 BOOKING_APP_URL = os.getenv("BOOKING_APP_URL", "https://theisland-email-bot.onrender.com")
 # Optional: Separate domain for booking form (defaults to BOOKING_APP_URL if not set)
 BOOKING_FORM_URL = os.getenv("BOOKING_FORM_URL", BOOKING_APP_URL)
 STRIPE_SUCCESS_URL = os.getenv("STRIPE_SUCCESS_URL", f"{BOOKING_APP_URL}/booking-success")
 STRIPE_CANCEL_URL = os.getenv("STRIPE_CANCEL_URL", f"{BOOKING_APP_URL}/booking-cancelled")
+# Checkout product image - Stripe fetches this during Session.create, so point it at a
+# CDN / Stripe-hosted file link (long max-age) rather than a slow origin server
+STRIPE_PRODUCT_IMAGE_URL = os.getenv("STRIPE_PRODUCT_IMAGE_URL", "https://theisland.ie/wp-content/uploads/2024/01/island-logo.png")
 
 # Initialize Stripe
 if STRIPE_SECRET_KEY:
     stripe.api_key = STRIPE_SECRET_KEY
 
+    # One pooled HTTPS session for every Stripe call (checkout + webhooks), so
+    # connections to api.stripe.com are reused instead of re-handshaking TLS
+    _stripe_http_session = requests.Session()
+    _stripe_http_session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=50))
+    stripe.default_http_client = stripe.http_client.RequestsClient(
+        session=_stripe_http_session,
+        verify_ssl_certs=True
+    )
+
 # --- LOGGING ---
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s"
+# LOG_FORMAT=json writes one JSON object per line (extra= fields included) for
+# log ingestion; LOG_TO_FILE=1 also writes to LOG_FILE, rotated and gzipped -
+# one file per process (bot.<pid>.log), since every gunicorn worker has its own
+# handler and one worker's rollover would rename and delete the file the others
+# are still writing to
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_TO_FILE = os.getenv("LOG_TO_FILE") == "1"
+LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+
+# Attributes every LogRecord has - anything else on a record came from extra=
+_LOG_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonLineFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and extra= fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _LOG_RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        try:
+            return fast_json_text(entry)
+        except TypeError:
+            return json.dumps(entry, default=str)
+
+
+def gzip_rotated_log(source: str, dest: str):
+    """RotatingFileHandler rotator - compress the rolled-over file"""
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+log_handlers = [logging.StreamHandler()]
+if LOG_TO_FILE:
+    log_file_root, log_file_ext = os.path.splitext(LOG_FILE)
+    log_file_handler = logging.handlers.RotatingFileHandler(
+        f"{log_file_root}.{os.getpid()}{log_file_ext}", maxBytes=64 << 20, backupCount=5
+    )
+    log_file_handler.namer = lambda name: name + '.gz'
+    log_file_handler.rotator = gzip_rotated_log
+    log_handlers.append(log_file_handler)
+
+log_formatter = (JsonLineFormatter() if LOG_FORMAT == 'json'
+                 else logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+for log_handler in log_handlers:
+    log_handler.setFormatter(log_formatter)
+
+logging.basicConfig(level=logging.INFO, handlers=log_handlers)
+
+# Hand records to a listener thread that owns the real (stderr) handlers, so
+# request and worker threads only enqueue and never block on log I/O
+log_queue = queue.Queue(-1)
+log_listener = logging.handlers.QueueListener(
+    log_queue, *logging.getLogger().handlers, respect_handler_level=True
 )
+logging.getLogger().handlers = [logging.handlers.QueueHandler(log_queue)]
+log_listener.start()
+atexit.register(log_listener.stop)
 
 # --- DATABASE CONNECTION POOL ---
 db_pool = None
@@ -135,6 +264,11 @@ BRAND_COLORS = {
     'bg_light': '#f9fafb',          # Background Gray (light)
 }
 
+# Most-used brand colors, bound once for the email builders
+BRAND_NAVY = BRAND_COLORS['navy_primary']
+BRAND_ROYAL_BLUE = BRAND_COLORS['royal_blue']
+BRAND_GOLD = BRAND_COLORS['gold_accent']
+
 
 # ============================================================================
 # DATABASE FUNCTIONS
@@ -148,13 +282,15 @@ def init_db_pool():
             logging.error("❌ DATABASE_URL not set!")
             return False
 
-        db_pool = SimpleConnectionPool(
-            minconn=1,
-            maxconn=10,
+        # Threaded pool: connections are checked out concurrently by the
+        # gunicorn gthread workers and the background executors
+        db_pool = ThreadedConnectionPool(
+            minconn=DB_POOL_MIN,
+            maxconn=DB_POOL_MAX,
             dsn=DATABASE_URL
         )
 
-        logging.info("✅ Database connection pool created")
+        logging.info(f"✅ Database connection pool created ({DB_POOL_MIN}-{DB_POOL_MAX} connections)")
         return True
     except Exception as e:
         logging.error(f"❌ Failed to create DB pool: {e}")
@@ -174,10 +310,132 @@ def release_db_connection(conn):
         db_pool.putconn(conn)
 
 
+# Hot-path statements prepared server-side once per pooled connection, so
+# Postgres skips re-parsing/re-planning the SQL text on every call
+PREPARED_STATEMENTS = {
+    'booking_ins': """
+        INSERT INTO bookings (
+            booking_id, message_id, timestamp, guest_email, dates, date, tee_time,
+            players, total, status, note,
+            club, club_name
+        ) VALUES (
+            $1, $2, $3, $4, $5, $6, $7,
+            $8, $9, $10, $11,
+            $12, $13
+        )
+        ON CONFLICT (booking_id) DO UPDATE SET
+            status = EXCLUDED.status,
+            note = EXCLUDED.note,
+            updated_at = CURRENT_TIMESTAMP
+    """,
+    'waitlist_ins': """
+        INSERT INTO waitlist (
+            waitlist_id, guest_email, guest_name, requested_date,
+            preferred_time, time_flexibility, players, golf_course,
+            status, priority, club, created_at, updated_at
+        ) VALUES (
+            $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, NOW(), NOW()
+        )
+        ON CONFLICT (waitlist_id) DO NOTHING
+        RETURNING id
+    """,
+}
+
+# Columns update_booking_in_db() may set, in statement parameter order
+BOOKING_UPDATE_COLUMNS = (
+    'status', 'note', 'players', 'total', 'customer_confirmed_at',
+    'confirmation_message_id', 'date', 'tee_time'
+)
+
+
+# Booking columns as returned by get_booking_by_id() (booking_id exposed as 'id')
+BOOKING_SELECT_COLUMNS = """
+    booking_id as id, timestamp, guest_email, dates, date, tee_time,
+    players, total, status, note, club, club_name,
+    customer_confirmed_at, created_at, updated_at,
+    message_id, confirmation_message_id
+"""
+
+# Output names of BOOKING_SELECT_COLUMNS, in order - rows come back as plain
+# tuples and are zipped against this instead of a RealDictCursor per query
+BOOKING_SELECT_FIELDS = tuple(
+    column.split(' as ')[-1].strip() for column in BOOKING_SELECT_COLUMNS.split(',')
+)
+
+
+def booking_update_statement(columns: List[str], returning: bool = False) -> str:
+    """
+    Register (once) the UPDATE for this combination of BOOKING_UPDATE_COLUMNS
+    and return its PREPARED_STATEMENTS name - callers only use a handful of combos.
+    With returning, the statement also returns the updated BOOKING_SELECT_COLUMNS row
+    """
+    mask = sum(1 << BOOKING_UPDATE_COLUMNS.index(key) for key in columns)
+    name = f"booking_upd_{mask:x}" + ("_ret" if returning else "")
+
+    if name not in PREPARED_STATEMENTS:
+        set_clauses = [f"{key} = ${i}" for i, key in enumerate(columns, start=2)]
+        set_clauses.append("updated_at = CURRENT_TIMESTAMP")
+        PREPARED_STATEMENTS[name] = f"""
+            UPDATE bookings
+            SET {', '.join(set_clauses)}
+            WHERE booking_id = $1
+        """ + (f"RETURNING {BOOKING_SELECT_COLUMNS}" if returning else "")
+
+    return name
+
+
+# connection -> names already PREPAREd on it (entries vanish with the connection)
+_prepared_on_connection = weakref.WeakKeyDictionary()
+
+
+def execute_prepared(cursor, name: str, params: tuple):
+    """Run a statement from PREPARED_STATEMENTS, preparing it on first use per connection"""
+    conn = cursor.connection
+    prepared = _prepared_on_connection.setdefault(conn, set())
+
+    if name not in prepared:
+        cursor.execute(f"PREPARE {name} AS {PREPARED_STATEMENTS[name]}")
+        prepared.add(name)
+
+    placeholders = ', '.join(['%s'] * len(params))
+    cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+
+
+def forget_prepared_statements(conn):
+    """Reset PREPARE state on a connection after a failed transaction (call after rollback)"""
+    if conn is None or conn not in _prepared_on_connection:
+        return
+    del _prepared_on_connection[conn]
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DEALLOCATE ALL")
+        conn.commit()
+        cursor.close()
+    except Exception as e:
+        logging.warning(f"⚠️  Could not deallocate prepared statements: {e}")
+        conn.rollback()
+
+
+# (epoch second, formatted string) - rebound as one tuple so threads never
+# see a mismatched pair
+_timestamp_cache = (0, '')
+
+
+def current_timestamp() -> str:
+    """Local time as 'YYYY-MM-DD HH:MM:SS', formatted at most once per second"""
+    global _timestamp_cache
+    now = int(time.time())
+    cached_second, cached_text = _timestamp_cache
+    if now != cached_second:
+        cached_text = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+        _timestamp_cache = (now, cached_text)
+    return cached_text
+
+
 def generate_booking_id(guest_email: str, timestamp: str = None) -> str:
     """Generate a unique booking ID in format: ISL-YYYYMMDD-XXXX"""
     if timestamp is None:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = current_timestamp()
 
     date_str = datetime.now().strftime("%Y%m%d")
     hash_input = f"{guest_email}{timestamp}".encode('utf-8')
@@ -190,12 +448,6 @@ def save_booking_to_db(booking_data: dict):
     """Save booking to PostgreSQL"""
     conn = None
     try:
-        logging.info("💾 SAVING NEW BOOKING TO DATABASE")
-        logging.info(f"   Customer: {booking_data.get('guest_email')}")
-        logging.info(f"   Players: {booking_data.get('players')}")
-        logging.info(f"   Status: {booking_data.get('status')}")
-        logging.info(f"   Club: {booking_data.get('club')}")
-
         conn = get_db_connection()
         if not conn:
             logging.error("❌ No database connection")
@@ -209,60 +461,71 @@ def save_booking_to_db(booking_data: dict):
                 booking_data['timestamp']
             )
             booking_data['booking_id'] = booking_id
-            logging.info(f"   Generated booking_id: {booking_id}")
         else:
             booking_id = booking_data['booking_id']
-            logging.info(f"   Using provided booking_id: {booking_id}")
 
-        cursor.execute("""
-            INSERT INTO bookings (
-                booking_id, message_id, timestamp, guest_email, dates, date, tee_time,
-                players, total, status, note,
-                club, club_name
-            ) VALUES (
-                %(booking_id)s, %(message_id)s, %(timestamp)s, %(guest_email)s, %(dates)s, %(date)s, %(tee_time)s,
-                %(players)s, %(total)s, %(status)s, %(note)s,
-                %(club)s, %(club_name)s
-            )
-            ON CONFLICT (booking_id) DO UPDATE SET
-                status = EXCLUDED.status,
-                note = EXCLUDED.note,
-                updated_at = CURRENT_TIMESTAMP
-        """, {
-            'booking_id': booking_id,
-            'message_id': booking_data.get('message_id'),
-            'timestamp': booking_data['timestamp'],
-            'guest_email': booking_data['guest_email'],
-            'dates': Json(booking_data.get('dates', [])),
-            'date': booking_data.get('date'),
-            'tee_time': booking_data.get('tee_time'),
-            'players': booking_data['players'],
-            'total': booking_data['total'],
-            'status': booking_data['status'],
-            'note': booking_data.get('note'),
-            'club': booking_data.get('club'),
-            'club_name': booking_data.get('club_name')
-        })
+        execute_prepared(cursor, 'booking_ins', (
+            booking_id,
+            booking_data.get('message_id'),
+            booking_data['timestamp'],
+            booking_data['guest_email'],
+            Json(booking_data.get('dates', []), dumps=fast_json_text),
+            booking_data.get('date'),
+            booking_data.get('tee_time'),
+            booking_data['players'],
+            booking_data['total'],
+            booking_data['status'],
+            booking_data.get('note'),
+            booking_data.get('club'),
+            booking_data.get('club_name')
+        ))
 
         rows_affected = cursor.rowcount
         conn.commit()
         cursor.close()
-
-        logging.info(f"✅ BOOKING SAVED - ID: {booking_id}")
+        invalidate_bookings_cache()
+
+        # One record per saved booking; fields also attached as record attributes
+        logging.info(
+            f"💾 BOOKING SAVED - ID: {booking_id}, customer: {booking_data.get('guest_email')}, "
+            f"players: {booking_data.get('players')}, status: {booking_data.get('status')}, "
+            f"club: {booking_data.get('club')}",
+            extra={
+                'booking_id': booking_id,
+                'email': booking_data.get('guest_email'),
+                'players': booking_data.get('players'),
+                'status': booking_data.get('status'),
+                'club': booking_data.get('club'),
+            }
+        )
         return booking_id
 
     except Exception as e:
-        logging.error(f"❌ FAILED TO SAVE BOOKING: {e}")
-        import traceback
-        logging.error(traceback.format_exc())
+        logging.exception(f"❌ FAILED TO SAVE BOOKING {booking_data.get('booking_id')} ({booking_data.get('guest_email')}): {e}")
         if conn:
             conn.rollback()
+            forget_prepared_statements(conn)
         return False
     finally:
         if conn:
             release_db_connection(conn)
 
 
+def booking_row_to_dict(row) -> Dict:
+    """Plain dict for a BOOKING_SELECT_COLUMNS row tuple, with dates/times as strings"""
+    booking_dict = dict(zip(BOOKING_SELECT_FIELDS, row))
+
+    # Convert datetime objects to strings
+    for field in ['timestamp', 'customer_confirmed_at', 'created_at', 'updated_at']:
+        if booking_dict.get(field) and hasattr(booking_dict[field], 'strftime'):
+            booking_dict[field] = booking_dict[field].strftime('%Y-%m-%d %H:%M:%S')
+
+    if booking_dict.get('date') and hasattr(booking_dict['date'], 'strftime'):
+        booking_dict['date'] = booking_dict['date'].strftime('%Y-%m-%d')
+
+    return booking_dict
+
+
 def get_booking_by_id(booking_id: str):
     """Get a specific booking by booking_id"""
     conn = None
@@ -271,27 +534,10 @@ def get_booking_by_id(booking_id: str):
         if not conn:
             return None
 
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor()
 
-        cursor.execute("""
-            SELECT
-                booking_id as id,
-                timestamp,
-                guest_email,
-                dates,
-                date,
-                tee_time,
-                players,
-                total,
-                status,
-                note,
-                club,
-                club_name,
-                customer_confirmed_at,
-                created_at,
-                updated_at,
-                message_id,
-                confirmation_message_id
+        cursor.execute(f"""
+            SELECT {BOOKING_SELECT_COLUMNS}
             FROM bookings
             WHERE booking_id = %s
         """, (booking_id,))
@@ -300,17 +546,7 @@ def get_booking_by_id(booking_id: str):
         cursor.close()
 
         if booking:
-            booking_dict = dict(booking)
-
-            # Convert datetime objects to strings
-            for field in ['timestamp', 'customer_confirmed_at', 'created_at', 'updated_at']:
-                if booking_dict.get(field) and hasattr(booking_dict[field], 'strftime'):
-                    booking_dict[field] = booking_dict[field].strftime('%Y-%m-%d %H:%M:%S')
-
-            if booking_dict.get('date') and hasattr(booking_dict['date'], 'strftime'):
-                booking_dict['date'] = booking_dict['date'].strftime('%Y-%m-%d')
-
-            return booking_dict
+            return booking_row_to_dict(booking)
 
         return None
 
@@ -322,18 +558,15 @@ def get_booking_by_id(booking_id: str):
             release_db_connection(conn)
 
 
-def update_booking_in_db(booking_id: str, updates: dict):
-    """Update booking in PostgreSQL"""
+def update_booking_in_db(booking_id: str, updates: dict, returning: bool = False):
+    """
+    Update booking in PostgreSQL
+
+    Returns True on success, or with returning=True the updated booking (as
+    get_booking_by_id() would) from the same round-trip; False on failure
+    """
     conn = None
     try:
-        logging.info("="*60)
-        logging.info(f"💾 DATABASE UPDATE INITIATED")
-        logging.info("="*60)
-        logging.info(f"📋 Booking ID: {booking_id}")
-        logging.info(f"📝 Updates to apply:")
-        for key, value in updates.items():
-            logging.info(f"   • {key}: {value}")
-
         conn = get_db_connection()
         if not conn:
             logging.error("❌ No database connection available")
@@ -341,59 +574,47 @@ def update_booking_in_db(booking_id: str, updates: dict):
 
         cursor = conn.cursor()
 
-        set_clauses = []
-        params = {'booking_id': booking_id}
-
-        # Build update query
-        for key, value in updates.items():
-            if key in ['status', 'note', 'players', 'total', 'customer_confirmed_at',
-                      'confirmation_message_id', 'date', 'tee_time']:
-                set_clauses.append(f"{key} = %({key})s")
-                params[key] = value
+        columns = [key for key in BOOKING_UPDATE_COLUMNS if key in updates]
 
-        if not set_clauses:
+        if not columns:
             logging.warning("⚠️  No valid update fields found")
             cursor.close()
-            release_db_connection(conn)
             return False
 
-        set_clauses.append("updated_at = CURRENT_TIMESTAMP")
-
-        query = f"""
-            UPDATE bookings
-            SET {', '.join(set_clauses)}
-            WHERE booking_id = %(booking_id)s
-        """
-
-        cursor.execute(query, params)
+        name = booking_update_statement(columns, returning)
+        execute_prepared(cursor, name, (booking_id, *(updates[key] for key in columns)))
         rows_affected = cursor.rowcount
+        updated = cursor.fetchone() if returning and rows_affected else None
         conn.commit()
         cursor.close()
+        invalidate_bookings_cache()
 
         if rows_affected == 0:
             logging.error(f"❌ No rows updated! Booking ID may not exist: {booking_id}")
-            release_db_connection(conn)
             return False
 
-        logging.info(f"✅ Database updated successfully - {rows_affected} row(s) affected")
-        logging.info("="*60)
-        return True
+        logging.info(
+            f"💾 Booking {booking_id} updated ({', '.join(columns)}) - {rows_affected} row(s) affected",
+            extra={'booking_id': booking_id, 'columns': columns}
+        )
+        return booking_row_to_dict(updated) if returning else True
 
     except Exception as e:
-        logging.error("="*60)
-        logging.error(f"❌ DATABASE UPDATE FAILED")
-        logging.error("="*60)
-        logging.error(f"❌ Error: {e}")
-        import traceback
-        logging.error(traceback.format_exc())
+        logging.exception(f"❌ DATABASE UPDATE FAILED for {booking_id}: {e}")
         if conn:
             conn.rollback()
+            forget_prepared_statements(conn)
         return False
     finally:
         if conn:
             release_db_connection(conn)
 
 
+# Patterns scanned over raw inbound subject/body text (compiled once, RE2 when available)
+_RE_ISO_DATE = re2.compile(r'(\d{4}-\d{2}-\d{2})')
+_RE_HHMM = re2.compile(r'(\d{1,2}:\d{2})')
+
+
 def extract_booking_id(text: str) -> Optional[str]:
     """Extract booking ID from email text"""
     pattern = r'ISL-\d{8}-[A-F0-9]{8}'
@@ -403,6 +624,22 @@ def extract_booking_id(text: str) -> Optional[str]:
     return None
 
 
+def extract_email_address(from_field: str) -> str:
+    """Extract the bare address from a 'Name <user@example.com>' header value"""
+    i = from_field.find('<')
+    if i < 0:
+        return from_field
+    return from_field[i + 1:].rstrip('>')
+
+
+def extract_sender_name(from_field: str) -> str:
+    """Extract the display name from a 'Name <user@example.com>' header value"""
+    i = from_field.find('<')
+    if i < 0:
+        return ""
+    return from_field[:i].strip()
+
+
 def extract_message_id(headers: str) -> Optional[str]:
     """Extract Message-ID from email headers string"""
     if not headers:
@@ -414,11 +651,41 @@ def extract_message_id(headers: str) -> Optional[str]:
     return None
 
 
+# In-process LRU of message IDs known to be stored on a booking, so webhook
+# retries of the same Message-ID are answered without a DB round-trip
+_SEEN_MESSAGE_IDS_MAX = 10000
+_seen_message_ids = OrderedDict()
+_seen_message_ids_lock = Lock()
+
+
+def remember_message_id(message_id: str):
+    """Record a message_id that has been stored on a booking"""
+    if not message_id:
+        return
+    with _seen_message_ids_lock:
+        _seen_message_ids[message_id] = None
+        _seen_message_ids.move_to_end(message_id)
+        if len(_seen_message_ids) > _SEEN_MESSAGE_IDS_MAX:
+            _seen_message_ids.popitem(last=False)
+
+
+def was_message_seen_recently(message_id: str) -> bool:
+    """Check the in-process LRU for a message_id (no DB access)"""
+    with _seen_message_ids_lock:
+        if message_id in _seen_message_ids:
+            _seen_message_ids.move_to_end(message_id)
+            return True
+    return False
+
+
 def is_duplicate_message(message_id: str) -> bool:
     """Check if this message_id has already been processed"""
     if not message_id:
         return False
 
+    if was_message_seen_recently(message_id):
+        return True
+
     conn = None
     try:
         conn = get_db_connection()
@@ -435,7 +702,10 @@ def is_duplicate_message(message_id: str) -> bool:
         count = cursor.fetchone()[0]
         cursor.close()
 
-        return count > 0
+        if count > 0:
+            remember_message_id(message_id)
+            return True
+        return False
 
     except Exception as e:
         logging.error(f"❌ Error checking for duplicate message: {e}")
@@ -662,10 +932,26 @@ def init_database():
         else:
             logging.info("📋 guest_emails table exists")
 
+        # Journal of verified Stripe webhook events, written before the webhook
+        # answers 200 - the primary key dedupes Stripe retries across workers
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stripe_events (
+                event_id VARCHAR(255) PRIMARY KEY,
+                event_type VARCHAR(100) NOT NULL,
+                payload JSONB NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                received_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                claimed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                processed_at TIMESTAMP
+            );
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_stripe_events_unfinished ON stripe_events(claimed_at) WHERE status IN ('pending', 'processing');")
+
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_email ON bookings(guest_email);")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_status ON bookings(status);")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_message_id ON bookings(message_id);")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_booking_id ON bookings(booking_id);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_club_timestamp ON bookings(club, timestamp DESC, booking_id DESC);")
 
         conn.commit()
         cursor.close()
@@ -728,13 +1014,13 @@ def get_email_header():
             }}
             .info-box {{
                 background: linear-gradient(to right, #f0f9ff 0%, #e0f2fe 100%);
-                border-left: 4px solid {BRAND_COLORS['navy_primary']};
+                border-left: 4px solid {BRAND_NAVY};
                 border-radius: 8px;
                 padding: 20px;
                 margin: 20px 0;
             }}
             .button-link {{
-                background: linear-gradient(135deg, {BRAND_COLORS['navy_primary']} 0%, {BRAND_COLORS['royal_blue']} 100%);
+                background: linear-gradient(135deg, {BRAND_NAVY} 0%, {BRAND_ROYAL_BLUE} 100%);
                 color: #ffffff !important;
                 padding: 15px 40px;
                 text-decoration: none;
@@ -753,7 +1039,7 @@ def get_email_header():
                 border: 1px solid {BRAND_COLORS['border_grey']};
             }}
             .tee-table thead {{
-                background: linear-gradient(135deg, {BRAND_COLORS['navy_primary']} 0%, {BRAND_COLORS['royal_blue']} 100%);
+                background: linear-gradient(135deg, {BRAND_NAVY} 0%, {BRAND_ROYAL_BLUE} 100%);
                 color: #ffffff;
             }}
             .tee-table th {{
@@ -782,7 +1068,7 @@ def get_email_header():
                         <tr>
                             <td class="header">
                                 <img src="https://raw.githubusercontent.com/jimbobirecode/TeeMail-Assests/main/output-onlinepngtools.png" alt="Golf Club" class="header-logo" />
-                                <hr style="border: 0; height: 3px; background-color: {BRAND_COLORS['royal_blue']}; margin: 20px auto; width: 100%;" />
+                                <hr style="border: 0; height: 3px; background-color: {BRAND_ROYAL_BLUE}; margin: 20px auto; width: 100%;" />
                                 <p style="margin: 0; color: {BRAND_COLORS['text_medium']}; font-size: 16px; font-weight: 600;">
                                     Visitor Tee Time Booking
                                 </p>
@@ -800,14 +1086,14 @@ def get_email_footer():
                         </tr>
                         <tr>
                             <td class="footer">
-                                <strong style="color: {BRAND_COLORS['gold_accent']}; font-size: 18px;">
+                                <strong style="color: {BRAND_GOLD}; font-size: 18px;">
                                     Golf Club Bookings
                                 </strong>
                                 <p style="margin: 10px 0; color: #ffffff; font-size: 14px;">
                                     Tee Time Booking System
                                 </p>
                                 <p style="margin: 0; color: {BRAND_COLORS['powder_blue']}; font-size: 13px;">
-                                    📧 <a href="mailto:{CLUB_BOOKING_EMAIL}" style="color: {BRAND_COLORS['gold_accent']}; text-decoration: none;">{CLUB_BOOKING_EMAIL}</a>
+                                    📧 <a href="mailto:{CLUB_BOOKING_EMAIL}" style="color: {BRAND_GOLD}; text-decoration: none;">{CLUB_BOOKING_EMAIL}</a>
                                 </p>
                                 <p style="margin-top: 15px; color: {BRAND_COLORS['powder_blue']}; font-size: 12px;">
                                     Powered by TeeMail
@@ -823,19 +1109,88 @@ def get_email_footer():
     """
 
 
+# Header/footer only depend on module constants - build them once at import
+EMAIL_HEADER_HTML = get_email_header()
+EMAIL_FOOTER_HTML = get_email_footer()
+
+
 def create_book_button(booking_link: str, button_text: str = "Reserve Now") -> str:
     """Create HTML for Reserve Now button"""
-    return f"""
+    return join_email_fragments(BOOK_BUTTON_FRAGMENTS, (booking_link, button_text))
+
+
+# Static email markup is prebuilt with _EMAIL_FIELD marking each per-email value,
+# then split into fragments so a send is a single str.join
+_EMAIL_FIELD = '\x00field\x00'
+
+
+def join_email_fragments(fragments: List, values: tuple):
+    """
+    Interleave prebuilt static fragments with per-email values (one value per gap)
+    Works on str or bytes fragments - values must be the same type
+    """
+    parts = [fragments[0]]
+    for value, fragment in zip(values, fragments[1:]):
+        parts.append(value)
+        parts.append(fragment)
+    return (b'' if isinstance(fragments[0], bytes) else '').join(parts)
+
+
+# Book button around its booking_link and button_text slots
+BOOK_BUTTON_FRAGMENTS = f"""
         <table role="presentation" border="0" cellpadding="0" cellspacing="0" style="margin: 0 auto;">
             <tr>
-                <td style="border-radius: 8px; background: linear-gradient(135deg, {BRAND_COLORS['navy_primary']} 0%, {BRAND_COLORS['royal_blue']} 100%);">
-                    <a href="{booking_link}" style="background: transparent; color: #ffffff !important; padding: 10px 20px; text-decoration: none; border-radius: 8px; font-weight: 600; font-size: 14px; display: inline-block;">
-                        {button_text}
+                <td style="border-radius: 8px; background: linear-gradient(135deg, {BRAND_NAVY} 0%, {BRAND_ROYAL_BLUE} 100%);">
+                    <a href="{_EMAIL_FIELD}" style="background: transparent; color: #ffffff !important; padding: 10px 20px; text-decoration: none; border-radius: 8px; font-weight: 600; font-size: 14px; display: inline-block;">
+                        {_EMAIL_FIELD}
                     </a>
                 </td>
             </tr>
         </table>
-    """
+    """.split(_EMAIL_FIELD)
+
+# Inquiry email tee-time row around its time and button slots
+INQUIRY_SLOT_ROW_FRAGMENTS = f"""
+                <tr style="background-color: #f9fafb;">
+                    <td><strong style="font-size: 16px; color: {BRAND_NAVY};">{_EMAIL_FIELD}</strong></td>
+                    <td style="text-align: center;"><span style="background: #ecfdf5; color: {BRAND_COLORS['green_success']}; padding: 4px 10px; border-radius: 15px; font-size: 13px;">✓ Available</span></td>
+                    <td><span style="color: {BRAND_ROYAL_BLUE}; font-weight: 700;">€{PER_PLAYER_FEE:.0f} pp</span></td>
+                    <td style="text-align: center;">
+                        {_EMAIL_FIELD}
+                    </td>
+                </tr>
+            """.split(_EMAIL_FIELD)
+
+
+# Mailto fallback link around its subject "<date> at <time>" and body slots
+MAILTO_LINK_FRAGMENTS = (
+    f"mailto:{TRACKING_EMAIL_PREFIX}@bookings.teemail.io?subject={quote('BOOKING REQUEST - ')}",
+    "&body=",
+    "",
+)
+
+# Mailto body around its date, time, players, total and guest email slots
+# (booking ID first in the WITH_ID variant), each static piece pre-quoted
+_MAILTO_BODY = (
+    "I would like to book the following tee time:\n"
+    "\n"
+    "Booking Details:\n"
+    "{booking_id_line}"
+    f"- Date: {_EMAIL_FIELD}\n"
+    f"- Time: {_EMAIL_FIELD}\n"
+    f"- Players: {_EMAIL_FIELD}\n"
+    f"- Green Fee: €{PER_PLAYER_FEE:.0f} per player\n"
+    f"- Total: €{_EMAIL_FIELD}\n"
+    "\n"
+    f"Guest Email: {_EMAIL_FIELD}"
+)
+MAILTO_BODY_FRAGMENTS = tuple(
+    quote(fragment) for fragment in _MAILTO_BODY.replace("{booking_id_line}", "").split(_EMAIL_FIELD)
+)
+MAILTO_BODY_WITH_ID_FRAGMENTS = tuple(
+    quote(fragment)
+    for fragment in _MAILTO_BODY.replace("{booking_id_line}", f"- Booking ID: {_EMAIL_FIELD}\n").split(_EMAIL_FIELD)
+)
 
 
 def build_booking_link(date: str, time: str, players: int, guest_email: str, booking_id: str = None, club: str = None) -> str:
@@ -848,49 +1203,41 @@ def build_booking_link(date: str, time: str, players: int, guest_email: str, boo
     Parameters:
     - club: Club identifier (e.g., 'theisland', 'lahinch') - creates URL like /theisland/book
     """
+    if STRIPE_SECRET_KEY and not booking_id:
+        # Generated IDs depend on the current time, so resolve before the cache
+        booking_id = generate_booking_id(guest_email, current_timestamp())
+    return cached_booking_link(date, time, players, guest_email, booking_id, club)
+
+
+@lru_cache(maxsize=4096)
+def cached_booking_link(date: str, time: str, players: int, guest_email: str, booking_id: Optional[str], club: Optional[str]) -> str:
+    """
+    build_booking_link() once the booking ID is settled - memoized, since an
+    inquiry email links every slot and resends repeat the same links
+    """
     if STRIPE_SECRET_KEY:
         # Build Stripe checkout link
-        params = {
-            'booking_id': booking_id or generate_booking_id(guest_email, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
-            'date': date,
-            'time': time,
-            'players': players,
-            'email': guest_email
-        }
-
-        # URL encode parameters
-        query_string = '&'.join([f"{k}={quote(str(v))}" for k, v in params.items()])
+        query_string = (
+            f"booking_id={quote(str(booking_id))}&date={quote(str(date))}&time={quote(str(time))}"
+            f"&players={quote(str(players))}&email={quote(str(guest_email))}"
+        )
 
         # Use club-specific URL if club is provided
         club_path = f"/{club}" if club else ""
         return f"{BOOKING_FORM_URL}{club_path}/book?{query_string}"
     else:
-        # Fallback to mailto link if Stripe not configured
-        tracking_email = f"{TRACKING_EMAIL_PREFIX}@bookings.teemail.io"
-
-        subject = quote(f"BOOKING REQUEST - {date} at {time}")
-
-        body_lines = [
-            f"I would like to book the following tee time:",
-            f"",
-            f"Booking Details:",
-            f"- Date: {date}",
-            f"- Time: {time}",
-            f"- Players: {players}",
-            f"- Green Fee: €{PER_PLAYER_FEE:.0f} per player",
-            f"- Total: €{players * PER_PLAYER_FEE:.0f}",
-            f"",
-            f"Guest Email: {guest_email}",
-        ]
-
+        # Fallback to mailto link if Stripe not configured - the static text is
+        # quoted once at import; only the per-slot values are quoted here
+        fragments = MAILTO_BODY_WITH_ID_FRAGMENTS if booking_id else MAILTO_BODY_FRAGMENTS
+        values = (str(date), str(time), str(players), f"{players * PER_PLAYER_FEE:.0f}", str(guest_email))
         if booking_id:
-            body_lines.insert(3, f"- Booking ID: {booking_id}")
-
-        body = quote("\n".join(body_lines))
+            values = (str(booking_id),) + values
 
         # Email goes ONLY to the bot tracking email for processing
-        mailto_link = f"mailto:{tracking_email}?subject={subject}&body={body}"
-        return mailto_link
+        return join_email_fragments(MAILTO_LINK_FRAGMENTS, (
+            quote(f"{date} at {time}"),
+            join_email_fragments(fragments, tuple(quote(value) for value in values)),
+        ))
 
 
 def format_inquiry_email(results: list, player_count: int, guest_email: str, booking_id: str = None, club: str = None) -> str:
@@ -900,35 +1247,29 @@ def format_inquiry_email(results: list, player_count: int, guest_email: str, boo
     Parameters:
     - club: Club identifier (e.g., 'theisland') for generating club-specific booking URLs
     """
-    html = get_email_header()
+    # Collect the pieces and join once at the end (no quadratic str +=)
+    parts = [EMAIL_HEADER_HTML]
 
-    html += f"""
+    parts.append(f"""
         <p style="color: {BRAND_COLORS['text_dark']}; font-size: 16px; line-height: 1.8; margin: 0 0 20px 0;">
             Thank you for your enquiry. We are delighted to present the following available tee times:
         </p>
 
         <div class="info-box">
-            <h3 style="color: {BRAND_COLORS['navy_primary']}; font-size: 18px; margin: 0 0 15px 0;">
+            <h3 style="color: {BRAND_NAVY}; font-size: 18px; margin: 0 0 15px 0;">
                 👥 Booking Details
             </h3>
             <p style="margin: 5px 0;"><strong>Players:</strong> {player_count}</p>
             <p style="margin: 5px 0;"><strong>Green Fee:</strong> €{PER_PLAYER_FEE:.0f} per player</p>
-            <p style="margin: 5px 0;"><strong>Status:</strong> <span style="background: #e0f2fe; color: {BRAND_COLORS['navy_primary']}; padding: 4px 10px; border-radius: 15px; font-size: 13px;">Inquiry - Awaiting Your Request</span></p>
+            <p style="margin: 5px 0;"><strong>Status:</strong> <span style="background: #e0f2fe; color: {BRAND_NAVY}; padding: 4px 10px; border-radius: 15px; font-size: 13px;">Inquiry - Awaiting Your Request</span></p>
         </div>
-    """
-
-    # Group results by date
-    dates_list = sorted(list(set([r["date"] for r in results])))
+    """)
 
-    for date in dates_list:
-        date_results = [r for r in results if r["date"] == date]
-
-        if not date_results:
-            continue
-
-        html += f"""
+    # Group results by date - one stable sort keeps each date's slots in API order
+    for date, date_results in groupby(sorted(results, key=itemgetter("date")), key=itemgetter("date")):
+        parts.append(f"""
         <div style="margin: 30px 0;">
-            <h2 style="color: {BRAND_COLORS['navy_primary']}; font-size: 22px; font-weight: 700; margin: 0 0 15px 0; padding-bottom: 10px; border-bottom: 3px solid {BRAND_COLORS['gold_accent']};">
+            <h2 style="color: {BRAND_NAVY}; font-size: 22px; font-weight: 700; margin: 0 0 15px 0; padding-bottom: 10px; border-bottom: 3px solid {BRAND_GOLD};">
                 🗓️ {date}
             </h2>
             <table class="tee-table">
@@ -941,35 +1282,26 @@ def format_inquiry_email(results: list, player_count: int, guest_email: str, boo
                     </tr>
                 </thead>
                 <tbody>
-        """
+        """)
 
         for result in date_results:
             time = result["time"]
             booking_link = build_booking_link(date, time, player_count, guest_email, booking_id, club)
             button_html = create_book_button(booking_link, "Book Now")
 
-            html += f"""
-                <tr style="background-color: #f9fafb;">
-                    <td><strong style="font-size: 16px; color: {BRAND_COLORS['navy_primary']};">{time}</strong></td>
-                    <td style="text-align: center;"><span style="background: #ecfdf5; color: {BRAND_COLORS['green_success']}; padding: 4px 10px; border-radius: 15px; font-size: 13px;">✓ Available</span></td>
-                    <td><span style="color: {BRAND_COLORS['royal_blue']}; font-weight: 700;">€{PER_PLAYER_FEE:.0f} pp</span></td>
-                    <td style="text-align: center;">
-                        {button_html}
-                    </td>
-                </tr>
-            """
+            parts.append(join_email_fragments(INQUIRY_SLOT_ROW_FRAGMENTS, (str(time), button_html)))
 
-        html += """
+        parts.append("""
                 </tbody>
             </table>
         </div>
-        """
+        """)
 
     # Update instructions based on whether Stripe is enabled
     if STRIPE_SECRET_KEY:
-        html += f"""
+        parts.append(f"""
         <div class="info-box" style="margin-top: 30px;">
-            <h3 style="color: {BRAND_COLORS['navy_primary']}; font-size: 18px; margin: 0 0 12px 0;">
+            <h3 style="color: {BRAND_NAVY}; font-size: 18px; margin: 0 0 12px 0;">
                 💡 How to Book Your Tee Time
             </h3>
             <p style="margin: 5px 0;"><strong>Step 1:</strong> Click "Book Now" for your preferred time</p>
@@ -978,11 +1310,11 @@ def format_inquiry_email(results: list, player_count: int, guest_email: str, boo
             <p style="margin-top: 12px; font-style: italic; font-size: 14px;">✅ Secure payment processing • 💳 All major cards accepted • 🔒 SSL encrypted</p>
             <p style="margin-top: 8px; font-style: italic; font-size: 14px;">Questions? Reply to this email and we'll be happy to help.</p>
         </div>
-    """
+    """)
     else:
-        html += f"""
+        parts.append(f"""
         <div class="info-box" style="margin-top: 30px;">
-            <h3 style="color: {BRAND_COLORS['navy_primary']}; font-size: 18px; margin: 0 0 12px 0;">
+            <h3 style="color: {BRAND_NAVY}; font-size: 18px; margin: 0 0 12px 0;">
                 💡 How to Book Your Tee Time
             </h3>
             <p style="margin: 5px 0;"><strong>Step 1:</strong> Click "Book Now" for your preferred time</p>
@@ -990,24 +1322,36 @@ def format_inquiry_email(results: list, player_count: int, guest_email: str, boo
             <p style="margin: 5px 0;"><strong>Step 3:</strong> Send the email to request your tee time</p>
             <p style="margin-top: 12px; font-style: italic; font-size: 14px;">Questions? Reply to this email and we'll be happy to help.</p>
         </div>
-    """
+    """)
 
-    html += get_email_footer()
-    return html
+    parts.append(EMAIL_FOOTER_HTML)
+    return ''.join(parts)
 
 
-def format_acknowledgment_email(booking_data: Dict) -> str:
-    """Generate acknowledgment email when customer clicks Book Now"""
-    booking_id = booking_data.get('id') or booking_data.get('booking_id', 'N/A')
-    date = booking_data.get('date', 'TBD')
-    time = booking_data.get('tee_time', 'TBD')
+@lru_cache(maxsize=512)
+def format_euro(amount: float) -> str:
+    """'€1300.00' - memoised, since bookings cluster on a few green-fee totals"""
+    return f"€{amount:.2f}"
+
+
+def booking_email_fields(booking_data: Dict) -> tuple:
+    """
+    Values for the booking_id, date, time, players and total fee slots shared by
+    the acknowledgment and confirmation emails
+    """
     players = booking_data.get('players', booking_data.get('num_players', 0))
-    total_fee = players * PER_PLAYER_FEE
+    return (
+        str(booking_data.get('id') or booking_data.get('booking_id', 'N/A')),
+        str(booking_data.get('date', 'TBD')),
+        str(booking_data.get('tee_time', 'TBD')),
+        str(players),
+        format_euro(players * PER_PLAYER_FEE),
+    )
 
-    html = get_email_header()
 
-    html += f"""
-        <div style="background: linear-gradient(135deg, {BRAND_COLORS['powder_blue']} 0%, #a3b9d9 100%); color: {BRAND_COLORS['navy_primary']}; padding: 20px; border-radius: 8px; text-align: center; margin-bottom: 30px;">
+# Acknowledgment email around its booking_id, date, time, players and total fee slots
+ACKNOWLEDGMENT_EMAIL_FRAGMENTS = (EMAIL_HEADER_HTML + f"""
+        <div style="background: linear-gradient(135deg, {BRAND_COLORS['powder_blue']} 0%, #a3b9d9 100%); color: {BRAND_NAVY}; padding: 20px; border-radius: 8px; text-align: center; margin-bottom: 30px;">
             <h2 style="margin: 0; font-size: 28px; font-weight: 700;">📬 Booking Request Received</h2>
         </div>
 
@@ -1016,7 +1360,7 @@ def format_acknowledgment_email(booking_data: Dict) -> str:
         </p>
 
         <div class="info-box">
-            <h3 style="color: {BRAND_COLORS['navy_primary']}; font-size: 20px; margin: 0 0 20px 0;">
+            <h3 style="color: {BRAND_NAVY}; font-size: 20px; margin: 0 0 20px 0;">
                 📋 Your Booking Request
             </h3>
             <table width="100%" cellpadding="12" cellspacing="0" style="border-collapse: collapse; border: 1px solid {BRAND_COLORS['border_grey']}; border-radius: 8px;">
@@ -1025,7 +1369,7 @@ def format_acknowledgment_email(booking_data: Dict) -> str:
                         Booking ID
                     </td>
                     <td style="padding: 15px 12px; text-align: right; font-weight: 600; border-bottom: 1px solid {BRAND_COLORS['border_grey']};">
-                        {booking_id}
+                        {_EMAIL_FIELD}
                     </td>
                 </tr>
                 <tr style="background-color: #ffffff;">
@@ -1033,7 +1377,7 @@ def format_acknowledgment_email(booking_data: Dict) -> str:
                         <strong>📅 Date</strong>
                     </td>
                     <td style="padding: 15px 12px; text-align: right; font-weight: 700; border-bottom: 1px solid {BRAND_COLORS['border_grey']};">
-                        {date}
+                        {_EMAIL_FIELD}
                     </td>
                 </tr>
                 <tr style="background-color: {BRAND_COLORS['light_grey']};">
@@ -1041,7 +1385,7 @@ def format_acknowledgment_email(booking_data: Dict) -> str:
                         <strong>🕐 Time</strong>
                     </td>
                     <td style="padding: 15px 12px; text-align: right; font-weight: 700; border-bottom: 1px solid {BRAND_COLORS['border_grey']};">
-                        {time}
+                        {_EMAIL_FIELD}
                     </td>
                 </tr>
                 <tr style="background-color: #ffffff;">
@@ -1049,7 +1393,7 @@ def format_acknowledgment_email(booking_data: Dict) -> str:
                         <strong>👥 Players</strong>
                     </td>
                     <td style="padding: 15px 12px; text-align: right; font-weight: 700; border-bottom: 1px solid {BRAND_COLORS['border_grey']};">
-                        {players}
+                        {_EMAIL_FIELD}
                     </td>
                 </tr>
                 <tr style="background-color: #fffbeb;">
@@ -1057,15 +1401,15 @@ def format_acknowledgment_email(booking_data: Dict) -> str:
                         <strong>💶 Total Fee</strong>
                     </td>
                     <td style="padding: 18px 12px; text-align: right; color: {BRAND_COLORS['green_success']}; font-size: 22px; font-weight: 700;">
-                        €{total_fee:.2f}
+                        {_EMAIL_FIELD}
                     </td>
                 </tr>
             </table>
         </div>
 
-        <div style="background: #e0f2fe; border-left: 4px solid {BRAND_COLORS['navy_primary']}; padding: 20px; border-radius: 8px; margin: 30px 0;">
+        <div style="background: #e0f2fe; border-left: 4px solid {BRAND_NAVY}; padding: 20px; border-radius: 8px; margin: 30px 0;">
             <p style="margin: 0; font-size: 15px; line-height: 1.7;">
-                <strong style="color: {BRAND_COLORS['navy_primary']};">✅ Request Received</strong>
+                <strong style="color: {BRAND_NAVY};">✅ Request Received</strong>
             </p>
             <p style="margin: 10px 0 0 0; font-size: 14px; line-height: 1.7;">
                 We have received your booking request and our team will be in touch shortly to confirm your tee time. We'll contact you via email or phone within 24 hours.
@@ -1078,25 +1422,18 @@ def format_acknowledgment_email(booking_data: Dict) -> str:
 
         <p style="color: {BRAND_COLORS['text_medium']}; font-size: 14px; margin: 20px 0 0 0;">
             Best regards,<br>
-            <strong style="color: {BRAND_COLORS['navy_primary']};">Golf Club Bookings Team</strong>
+            <strong style="color: {BRAND_NAVY};">Golf Club Bookings Team</strong>
         </p>
-    """
-
-    html += get_email_footer()
-    return html
+    """ + EMAIL_FOOTER_HTML).split(_EMAIL_FIELD)
 
 
-def format_confirmation_email(booking_data: Dict) -> str:
-    """Generate confirmation email when booking team confirms the booking (Stage 3)"""
-    booking_id = booking_data.get('id') or booking_data.get('booking_id', 'N/A')
-    date = booking_data.get('date', 'TBD')
-    time = booking_data.get('tee_time', 'TBD')
-    players = booking_data.get('players', booking_data.get('num_players', 0))
-    total_fee = players * PER_PLAYER_FEE
+def format_acknowledgment_email(booking_data: Dict) -> str:
+    """Generate acknowledgment email when customer clicks Book Now"""
+    return join_email_fragments(ACKNOWLEDGMENT_EMAIL_FRAGMENTS, booking_email_fields(booking_data))
 
-    html = get_email_header()
 
-    html += f"""
+# Confirmation email around its booking_id, date, time, players and total fee slots
+CONFIRMATION_EMAIL_FRAGMENTS = (EMAIL_HEADER_HTML + f"""
         <div style="background: linear-gradient(135deg, {BRAND_COLORS['green_success']} 0%, #1f4d31 100%); color: {BRAND_COLORS['white']}; padding: 25px; border-radius: 8px; text-align: center; margin-bottom: 30px;">
             <h2 style="margin: 0; font-size: 28px; font-weight: 700;">✅ Booking Confirmed</h2>
         </div>
@@ -1106,7 +1443,7 @@ def format_confirmation_email(booking_data: Dict) -> str:
         </p>
 
         <div class="info-box" style="border: 2px solid {BRAND_COLORS['green_success']};">
-            <h3 style="color: {BRAND_COLORS['navy_primary']}; font-size: 20px; margin: 0 0 20px 0;">
+            <h3 style="color: {BRAND_NAVY}; font-size: 20px; margin: 0 0 20px 0;">
                 📋 Confirmed Booking Details
             </h3>
             <table width="100%" cellpadding="12" cellspacing="0" style="border-collapse: collapse; border: 1px solid {BRAND_COLORS['border_grey']}; border-radius: 8px;">
@@ -1115,23 +1452,23 @@ def format_confirmation_email(booking_data: Dict) -> str:
                         Booking ID
                     </td>
                     <td style="padding: 15px 12px; text-align: right; font-weight: 600; border-bottom: 1px solid {BRAND_COLORS['border_grey']};">
-                        {booking_id}
+                        {_EMAIL_FIELD}
                     </td>
                 </tr>
                 <tr style="background-color: #ffffff;">
                     <td style="padding: 15px 12px; border-bottom: 1px solid {BRAND_COLORS['border_grey']};">
                         <strong>📅 Date</strong>
                     </td>
-                    <td style="padding: 15px 12px; text-align: right; font-weight: 700; color: {BRAND_COLORS['navy_primary']}; border-bottom: 1px solid {BRAND_COLORS['border_grey']};">
-                        {date}
+                    <td style="padding: 15px 12px; text-align: right; font-weight: 700; color: {BRAND_NAVY}; border-bottom: 1px solid {BRAND_COLORS['border_grey']};">
+                        {_EMAIL_FIELD}
                     </td>
                 </tr>
                 <tr style="background-color: {BRAND_COLORS['light_grey']};">
                     <td style="padding: 15px 12px; border-bottom: 1px solid {BRAND_COLORS['border_grey']};">
                         <strong>🕐 Tee Time</strong>
                     </td>
-                    <td style="padding: 15px 12px; text-align: right; font-weight: 700; color: {BRAND_COLORS['navy_primary']}; border-bottom: 1px solid {BRAND_COLORS['border_grey']};">
-                        {time}
+                    <td style="padding: 15px 12px; text-align: right; font-weight: 700; color: {BRAND_NAVY}; border-bottom: 1px solid {BRAND_COLORS['border_grey']};">
+                        {_EMAIL_FIELD}
                     </td>
                 </tr>
                 <tr style="background-color: #ffffff;">
@@ -1139,22 +1476,22 @@ def format_confirmation_email(booking_data: Dict) -> str:
                         <strong>👥 Number of Players</strong>
                     </td>
                     <td style="padding: 15px 12px; text-align: right; font-weight: 700; border-bottom: 1px solid {BRAND_COLORS['border_grey']};">
-                        {players}
+                        {_EMAIL_FIELD}
                     </td>
                 </tr>
-                <tr style="background-color: #fffbeb; border: 2px solid {BRAND_COLORS['gold_accent']};">
+                <tr style="background-color: #fffbeb; border: 2px solid {BRAND_GOLD};">
                     <td style="padding: 18px 12px; font-weight: 700;">
                         <strong style="font-size: 16px;">💶 Total Amount Due</strong>
                     </td>
                     <td style="padding: 18px 12px; text-align: right; color: {BRAND_COLORS['green_success']}; font-size: 24px; font-weight: 700;">
-                        €{total_fee:.2f}
+                        {_EMAIL_FIELD}
                     </td>
                 </tr>
             </table>
         </div>
 
-        <div style="background: linear-gradient(to right, #fffbeb 0%, #fef3c7 100%); border-left: 4px solid {BRAND_COLORS['gold_accent']}; padding: 20px; border-radius: 8px; margin: 30px 0;">
-            <h3 style="margin: 0 0 15px 0; color: {BRAND_COLORS['navy_primary']};"><strong>💳 Payment Details</strong></h3>
+        <div style="background: linear-gradient(to right, #fffbeb 0%, #fef3c7 100%); border-left: 4px solid {BRAND_GOLD}; padding: 20px; border-radius: 8px; margin: 30px 0;">
+            <h3 style="margin: 0 0 15px 0; color: {BRAND_NAVY};"><strong>💳 Payment Details</strong></h3>
             <p style="margin: 0 0 10px 0; font-size: 15px; line-height: 1.7;">
                 <strong>Payment Method:</strong> Bank Transfer or Card Payment
             </p>
@@ -1169,8 +1506,8 @@ def format_confirmation_email(booking_data: Dict) -> str:
             </p>
         </div>
 
-        <div style="background: #e0f2fe; border-left: 4px solid {BRAND_COLORS['navy_primary']}; padding: 20px; border-radius: 8px; margin: 30px 0;">
-            <h3 style="margin: 0 0 10px 0; color: {BRAND_COLORS['navy_primary']};">📍 Important Information</h3>
+        <div style="background: #e0f2fe; border-left: 4px solid {BRAND_NAVY}; padding: 20px; border-radius: 8px; margin: 30px 0;">
+            <h3 style="margin: 0 0 10px 0; color: {BRAND_NAVY};">📍 Important Information</h3>
             <ul style="margin: 10px 0 0 0; padding-left: 20px; font-size: 14px; line-height: 1.8;">
                 <li>Please arrive <strong>30 minutes before</strong> your tee time</li>
                 <li>Please bring proof of handicap (if applicable)</li>
@@ -1185,28 +1522,31 @@ def format_confirmation_email(booking_data: Dict) -> str:
 
         <div style="text-align: center; margin: 30px 0; padding: 20px; background-color: {BRAND_COLORS['light_grey']}; border-radius: 8px;">
             <p style="margin: 0 0 10px 0; color: {BRAND_COLORS['text_medium']}; font-size: 14px;">Contact Us</p>
-            <p style="margin: 5px 0;"><strong style="color: {BRAND_COLORS['navy_primary']};">📧 Email:</strong> {FROM_EMAIL}</p>
+            <p style="margin: 5px 0;"><strong style="color: {BRAND_NAVY};">📧 Email:</strong> {FROM_EMAIL}</p>
         </div>
 
         <p style="color: {BRAND_COLORS['text_medium']}; font-size: 14px; margin: 20px 0 0 0;">
             Best regards,<br>
-            <strong style="color: {BRAND_COLORS['navy_primary']};">Golf Club Bookings Team</strong>
+            <strong style="color: {BRAND_NAVY};">Golf Club Bookings Team</strong>
         </p>
-    """
+    """ + EMAIL_FOOTER_HTML).split(_EMAIL_FIELD)
 
-    html += get_email_footer()
-    return html
+
+def format_confirmation_email(booking_data: Dict) -> str:
+    """Generate confirmation email when booking team confirms the booking (Stage 3)"""
+    return join_email_fragments(CONFIRMATION_EMAIL_FRAGMENTS, booking_email_fields(booking_data))
 
 
 def format_no_availability_email(player_count: int, guest_email: str = None, dates: list = None, preferred_time: str = None) -> str:
     """Generate email when no availability found - includes waitlist opt-in"""
     from urllib.parse import quote
 
-    html = get_email_header()
+    # Collect the pieces and join once at the end (no quadratic str +=)
+    parts = [EMAIL_HEADER_HTML]
 
-    html += f"""
+    parts.append(f"""
         <p style="color: {BRAND_COLORS['text_dark']}; font-size: 16px; line-height: 1.8;">
-            Thank you for your enquiry regarding tee times at <strong style="color: {BRAND_COLORS['navy_primary']};">Golf Club</strong>.
+            Thank you for your enquiry regarding tee times at <strong style="color: {BRAND_NAVY};">Golf Club</strong>.
         </p>
 
         <div style="background: #fef2f2; border-left: 4px solid #dc2626; border-radius: 8px; padding: 20px; margin: 25px 0;">
@@ -1217,7 +1557,7 @@ def format_no_availability_email(player_count: int, guest_email: str = None, dat
                 Unfortunately, we do not have availability for <strong>{player_count} player(s)</strong> on your requested dates.
             </p>
         </div>
-    """
+    """)
 
     # Add Waitlist Opt-In Section
     if dates and guest_email:
@@ -1238,7 +1578,7 @@ Thank you.""")
 
         waitlist_mailto = f"mailto:{FROM_EMAIL}?subject={waitlist_subject}&body={waitlist_body}"
 
-        html += f"""
+        parts.append(f"""
         <div style="background: linear-gradient(135deg, #1e3a8a 0%, #2563eb 100%); border-radius: 12px; padding: 25px; margin: 25px 0; text-align: center;">
             <h3 style="color: #ffffff; margin: 0 0 15px 0; font-size: 20px;">
                 <span style="margin-right: 8px;">📋</span>Join Our Waitlist
@@ -1264,51 +1604,52 @@ Thank you.""")
                 You'll receive an email as soon as we find availability
             </p>
         </div>
-        """
+        """)
 
-    html += f"""
+    parts.append(f"""
         <div class="info-box">
-            <h3 style="color: {BRAND_COLORS['navy_primary']}; font-size: 18px; margin: 0 0 12px 0;">
+            <h3 style="color: {BRAND_NAVY}; font-size: 18px; margin: 0 0 12px 0;">
                 📞 Please Contact Us
             </h3>
             <p style="margin: 5px 0;">We would be delighted to assist you in finding alternative dates:</p>
-            <p style="margin: 8px 0;"><strong>Email:</strong> <a href="mailto:{CLUB_BOOKING_EMAIL}" style="color: {BRAND_COLORS['navy_primary']};">{CLUB_BOOKING_EMAIL}</a></p>
+            <p style="margin: 8px 0;"><strong>Email:</strong> <a href="mailto:{CLUB_BOOKING_EMAIL}" style="color: {BRAND_NAVY};">{CLUB_BOOKING_EMAIL}</a></p>
         </div>
 
         <p style="color: {BRAND_COLORS['text_medium']}; font-size: 15px; line-height: 1.8; margin: 20px 0 0 0;">
             We look forward to welcoming you to our golf club.
         </p>
-    """
+    """)
 
-    html += get_email_footer()
-    return html
+    parts.append(EMAIL_FOOTER_HTML)
+    return ''.join(parts)
 
 
 def format_inquiry_received_email(parsed: Dict, guest_email: str, booking_id: str = None) -> str:
     """Generate fallback email when API unavailable or no dates provided"""
-    html = get_email_header()
+    # Collect the pieces and join once at the end (no quadratic str +=)
+    parts = [EMAIL_HEADER_HTML]
 
     player_count = parsed.get('players', 4)
     dates = parsed.get('dates', [])
 
-    html += f"""
-        <div style="background: linear-gradient(135deg, {BRAND_COLORS['powder_blue']} 0%, #a3b9d9 100%); color: {BRAND_COLORS['navy_primary']}; padding: 20px; border-radius: 8px; text-align: center; margin-bottom: 30px;">
+    parts.append(f"""
+        <div style="background: linear-gradient(135deg, {BRAND_COLORS['powder_blue']} 0%, #a3b9d9 100%); color: {BRAND_NAVY}; padding: 20px; border-radius: 8px; text-align: center; margin-bottom: 30px;">
             <h2 style="margin: 0; font-size: 28px; font-weight: 700;">📧 Inquiry Received</h2>
         </div>
 
         <p style="color: {BRAND_COLORS['text_dark']}; font-size: 16px; line-height: 1.8;">
-            Thank you for your tee time inquiry at <strong style="color: {BRAND_COLORS['navy_primary']};">Golf Club</strong>.
+            Thank you for your tee time inquiry at <strong style="color: {BRAND_NAVY};">Golf Club</strong>.
         </p>
 
         <div class="info-box">
-            <h3 style="color: {BRAND_COLORS['navy_primary']}; font-size: 20px; margin: 0 0 20px 0;">
+            <h3 style="color: {BRAND_NAVY}; font-size: 20px; margin: 0 0 20px 0;">
                 📋 Your Inquiry Details
             </h3>
             <table width="100%" cellpadding="12" cellspacing="0" style="border-collapse: collapse; border: 1px solid {BRAND_COLORS['border_grey']}; border-radius: 8px;">
-    """
+    """)
 
     if booking_id:
-        html += f"""
+        parts.append(f"""
                 <tr style="background-color: {BRAND_COLORS['light_grey']};">
                     <td style="padding: 15px 12px; font-weight: 600; border-bottom: 1px solid {BRAND_COLORS['border_grey']};">
                         Inquiry ID
@@ -1317,11 +1658,11 @@ def format_inquiry_received_email(parsed: Dict, guest_email: str, booking_id: st
                         {booking_id}
                     </td>
                 </tr>
-        """
+        """)
 
     if dates:
         dates_str = ', '.join(dates)
-        html += f"""
+        parts.append(f"""
                 <tr style="background-color: #ffffff;">
                     <td style="padding: 15px 12px; border-bottom: 1px solid {BRAND_COLORS['border_grey']};">
                         <strong>📅 Requested Dates</strong>
@@ -1330,9 +1671,9 @@ def format_inquiry_received_email(parsed: Dict, guest_email: str, booking_id: st
                         {dates_str}
                     </td>
                 </tr>
-        """
+        """)
 
-    html += f"""
+    parts.append(f"""
                 <tr style="background-color: {BRAND_COLORS['light_grey']};">
                     <td style="padding: 15px 12px; border-bottom: 1px solid {BRAND_COLORS['border_grey']};">
                         <strong>👥 Players</strong>
@@ -1345,16 +1686,16 @@ def format_inquiry_received_email(parsed: Dict, guest_email: str, booking_id: st
                     <td style="padding: 18px 12px; font-weight: 700;">
                         <strong>💶 Estimated Green Fee</strong>
                     </td>
-                    <td style="padding: 18px 12px; text-align: right; color: {BRAND_COLORS['royal_blue']}; font-size: 22px; font-weight: 700;">
-                        €{player_count * PER_PLAYER_FEE:.2f}
+                    <td style="padding: 18px 12px; text-align: right; color: {BRAND_ROYAL_BLUE}; font-size: 22px; font-weight: 700;">
+                        {format_euro(player_count * PER_PLAYER_FEE)}
                     </td>
                 </tr>
             </table>
         </div>
 
-        <div style="background: #e0f2fe; border-left: 4px solid {BRAND_COLORS['navy_primary']}; padding: 20px; border-radius: 8px; margin: 30px 0;">
+        <div style="background: #e0f2fe; border-left: 4px solid {BRAND_NAVY}; padding: 20px; border-radius: 8px; margin: 30px 0;">
             <p style="margin: 0; font-size: 15px; line-height: 1.7;">
-                <strong style="color: {BRAND_COLORS['navy_primary']};">📞 What Happens Next:</strong>
+                <strong style="color: {BRAND_NAVY};">📞 What Happens Next:</strong>
             </p>
             <p style="margin: 10px 0 0 0; font-size: 14px; line-height: 1.7;">
                 Our team has received your inquiry and will check availability for your requested dates. We'll respond within 24 hours with available tee times and booking options.
@@ -1362,11 +1703,11 @@ def format_inquiry_received_email(parsed: Dict, guest_email: str, booking_id: st
         </div>
 
         <div class="info-box">
-            <h3 style="color: {BRAND_COLORS['navy_primary']}; font-size: 18px; margin: 0 0 12px 0;">
+            <h3 style="color: {BRAND_NAVY}; font-size: 18px; margin: 0 0 12px 0;">
                 📞 Contact Us Directly
             </h3>
             <p style="margin: 5px 0;">For immediate assistance, please contact us:</p>
-            <p style="margin: 8px 0;"><strong>Email:</strong> <a href="mailto:{CLUB_BOOKING_EMAIL}" style="color: {BRAND_COLORS['navy_primary']};">{CLUB_BOOKING_EMAIL}</a></p>
+            <p style="margin: 8px 0;"><strong>Email:</strong> <a href="mailto:{CLUB_BOOKING_EMAIL}" style="color: {BRAND_NAVY};">{CLUB_BOOKING_EMAIL}</a></p>
         </div>
 
         <p style="color: {BRAND_COLORS['text_medium']}; font-size: 15px; line-height: 1.8; margin: 30px 0 0 0;">
@@ -1375,49 +1716,196 @@ def format_inquiry_received_email(parsed: Dict, guest_email: str, booking_id: st
 
         <p style="color: {BRAND_COLORS['text_medium']}; font-size: 14px; margin: 20px 0 0 0;">
             Best regards,<br>
-            <strong style="color: {BRAND_COLORS['navy_primary']};">Golf Club Bookings Team</strong>
+            <strong style="color: {BRAND_NAVY};">Golf Club Bookings Team</strong>
         </p>
-    """
+    """)
 
-    html += get_email_footer()
-    return html
+    parts.append(EMAIL_FOOTER_HTML)
+    return ''.join(parts)
 
 
 # ============================================================================
 # EMAIL SENDING FUNCTION
 # ============================================================================
 
-def send_email_sendgrid(to_email: str, subject: str, html_body: str) -> bool:
-    """Send email via SendGrid"""
-    try:
-        logging.info(f"📧 Sending email to: {to_email}")
-        logging.info(f"   Subject: {subject}")
+# Bounded pool for customer emails sent after the response has gone out
+# (payment confirmations, waitlist confirmations) - reuses threads and
+# queues bursts (e.g. Stripe replaying events) instead of spawning one each
+EMAIL_SEND_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix='email-send')
+
+
+# Keep-alive session for api.sendgrid.com - every send reuses a pooled TLS
+# connection instead of handshaking per email (pool sized for EMAIL_SEND_EXECUTOR)
+_sendgrid_http_session = requests.Session()
+_sendgrid_http_session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=16))
+_sendgrid_http_session.headers.update({
+    'Authorization': f'Bearer {SENDGRID_API_KEY}',
+    'Content-Type': 'application/json',
+    'Content-Encoding': 'gzip',
+})
+atexit.register(_sendgrid_http_session.close)
+
+
+# Circuit breaker for SendGrid: after SENDGRID_BREAKER_FAIL_MAX consecutive
+# outage-type failures (connection errors, timeouts, 5xx, 429) sends are skipped
+# for SENDGRID_BREAKER_RESET_SECONDS, so an outage doesn't cost a 30s timeout
+# per email. Callers that check sendgrid_breaker_open() first (the payment,
+# confirmation and acknowledgment emails) also skip rendering the HTML body.
+# After the reset a single send is let through as the trial (half-open); its
+# success closes the breaker, its failure re-opens it
+SENDGRID_BREAKER_FAIL_MAX = 5
+SENDGRID_BREAKER_RESET_SECONDS = 60
+_sendgrid_breaker = {'failures': 0, 'open_until': 0.0}
+_sendgrid_breaker_lock = Lock()
+
+
+def sendgrid_available() -> bool:
+    """
+    False while the SendGrid circuit breaker is open. Once the reset time has
+    passed exactly one caller gets True (the trial send); the rest keep seeing
+    the breaker open until the trial's result is recorded
+    """
+    if _sendgrid_breaker['failures'] < SENDGRID_BREAKER_FAIL_MAX:
+        return True
+    with _sendgrid_breaker_lock:
+        if _sendgrid_breaker['failures'] < SENDGRID_BREAKER_FAIL_MAX:
+            return True
+        now = time.monotonic()
+        if now < _sendgrid_breaker['open_until']:
+            return False
+        # Half-open: this caller is the trial - hold everyone else off meanwhile
+        _sendgrid_breaker['open_until'] = now + SENDGRID_BREAKER_RESET_SECONDS
+        return True
 
-        message = Mail(
-            from_email=Email(FROM_EMAIL, FROM_NAME),
-            to_emails=To(to_email),
-            subject=subject,
-            html_content=Content("text/html", html_body)
+
+def sendgrid_breaker_open() -> bool:
+    """
+    True while the breaker is open and not yet due a trial. Unlike
+    sendgrid_available() this never claims the half-open trial, so it can be
+    checked before rendering an email that send_email_sendgrid() would refuse
+    """
+    return (_sendgrid_breaker['failures'] >= SENDGRID_BREAKER_FAIL_MAX
+            and time.monotonic() < _sendgrid_breaker['open_until'])
+
+
+def record_sendgrid_result(ok: bool):
+    """Count a SendGrid success/outage failure, opening the breaker at the threshold"""
+    with _sendgrid_breaker_lock:
+        if ok:
+            _sendgrid_breaker['failures'] = 0
+            return
+        _sendgrid_breaker['failures'] += 1
+        if _sendgrid_breaker['failures'] >= SENDGRID_BREAKER_FAIL_MAX:
+            _sendgrid_breaker['open_until'] = time.monotonic() + SENDGRID_BREAKER_RESET_SECONDS
+            logging.error(f"🔌 SendGrid unreachable ({_sendgrid_breaker['failures']} failures) - "
+                          f"skipping sends for {SENDGRID_BREAKER_RESET_SECONDS}s")
+
+
+# send_email_sendgrid() outcomes. Only EMAIL_RETRYABLE ones are safe to send
+# again: the request never reached SendGrid. After a read timeout or a 5xx the
+# email may have been accepted anyway, so resending could deliver it twice
+EMAIL_SENT = 'sent'
+EMAIL_BREAKER_OPEN = 'breaker_open'
+EMAIL_UNREACHABLE = 'unreachable'
+EMAIL_FAILED = 'failed'
+EMAIL_RETRYABLE = frozenset((EMAIL_BREAKER_OPEN, EMAIL_UNREACHABLE))
+
+
+def request_never_sent(error: requests.RequestException) -> bool:
+    """True when no connection was made (DNS failure, refused, connect timeout)"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+def json_string_bytes(text: str) -> bytes:
+    """UTF-8 JSON string contents for text (escaped, without the surrounding quotes)"""
+    return fast_json_dumps(text)[1:-1]
+
+
+_SENDGRID_FROM_JSON = fast_json_dumps({'email': FROM_EMAIL, 'name': FROM_NAME})
+
+
+def sendgrid_mail_json(to_email: str, subject: str, html_json: bytes) -> bytes:
+    """v3 mail/send payload for one recipient, with the HTML body already JSON-encoded"""
+    return b''.join((
+        b'{"from":', _SENDGRID_FROM_JSON,
+        b',"personalizations":[{"to":[{"email":', fast_json_dumps(to_email), b'}]}]',
+        b',"subject":', fast_json_dumps(subject),
+        b',"content":[{"type":"text/html","value":"', html_json, b'"}]}',
+    ))
+
+
+def post_sendgrid_mail(body: bytes):
+    """
+    POST a pre-serialized v3 mail/send JSON payload, gzip-compressed (HTML
+    email compresses ~5-10x). The SendGrid client always sends plain JSON,
+    so the request is made directly. Raises on a non-2xx response. Feeds the
+    SendGrid circuit breaker
+    """
+    try:
+        response = _sendgrid_http_session.post(
+            SENDGRID_MAIL_SEND_URL,
+            data=gzip.compress(body, compresslevel=6),
+            timeout=30
         )
+    except requests.RequestException:
+        record_sendgrid_result(False)
+        raise
+    # 4xx (bad address, oversized payload) is this email's problem, not an outage
+    record_sendgrid_result(response.status_code < 500 and response.status_code != 429)
+    response.raise_for_status()
+    return response
 
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
 
-        logging.info(f"✅ Email sent successfully")
-        logging.info(f"   Status code: {response.status_code}")
-        return True
+def send_email_sendgrid(to_email: str, subject: str, html_body: Union[str, bytes]) -> str:
+    """
+    Send email via SendGrid, returning one of the EMAIL_* outcomes
+    html_body is the HTML as str, or bytes already JSON-encoded (payment_email_json)
+    """
+    if not sendgrid_available():
+        logging.warning(f"🔌 SendGrid circuit open - not sending email to {to_email}")
+        return EMAIL_BREAKER_OPEN
+
+    try:
+        html_json = html_body if isinstance(html_body, bytes) else json_string_bytes(html_body)
+        response = post_sendgrid_mail(sendgrid_mail_json(to_email, subject, html_json))
+
+        logging.info(
+            f"📧 Email sent to {to_email} - subject: {subject}, status code: {response.status_code}",
+            extra={'email': to_email, 'subject': subject, 'status_code': response.status_code}
+        )
+        return EMAIL_SENT
+
+    except requests.RequestException as e:
+        logging.exception(f"❌ Failed to send email to {to_email} ({subject}): {e}")
+        return EMAIL_UNREACHABLE if request_never_sent(e) else EMAIL_FAILED
 
     except Exception as e:
-        logging.error(f"❌ Failed to send email: {e}")
-        import traceback
-        logging.error(traceback.format_exc())
-        return False
+        logging.exception(f"❌ Failed to send email to {to_email} ({subject}): {e}")
+        return EMAIL_FAILED
 
 
 # ============================================================================
 # BACKGROUND PROCESSING FUNCTIONS
 # ============================================================================
 
+# Bounded pool for the inbound-email work done after the webhook has returned
+# (availability lookups, DB updates, customer emails) - reuses threads and
+# queues bursts instead of starting a thread per inbound email
+INBOUND_PROCESS_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix='inbound')
+
+# Keep-alive session for the Core availability API - the initial check and
+# every job poll reuse a pooled connection instead of reconnecting per request
+# (pool sized for INBOUND_PROCESS_EXECUTOR)
+_core_api_http_session = requests.Session()
+_core_api_adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=8)
+_core_api_http_session.mount('https://', _core_api_adapter)
+_core_api_http_session.mount('http://', _core_api_adapter)
+atexit.register(_core_api_http_session.close)
+
+
 def process_staff_confirmation_async(booking_id: str, booking: Dict):
     """
     Process staff confirmation in background thread - sends confirmation email
@@ -1429,7 +1917,9 @@ def process_staff_confirmation_async(booking_id: str, booking: Dict):
         customer_email = booking.get('guest_email')
 
         if customer_email:
-            if not was_confirmation_sent(booking_id):
+            if sendgrid_breaker_open():
+                logging.warning(f"   🔌 SendGrid circuit open - confirmation email for {booking_id} not sent")
+            elif not was_confirmation_sent(booking_id):
                 # Send confirmation email with payment details
                 logging.info(f"   Sending confirmation email to {customer_email}...")
                 html_email = format_confirmation_email(booking)
@@ -1437,7 +1927,7 @@ def process_staff_confirmation_async(booking_id: str, booking: Dict):
                 send_email_sendgrid(customer_email, subject_line, html_email)
 
                 # Update note to reflect confirmation email sent
-                conf_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                conf_timestamp = current_timestamp()
                 existing_note = booking.get('note', '')
                 update_booking_in_db(booking_id, {
                     'note': f"{existing_note}\nConfirmation email sent on {conf_timestamp}"
@@ -1452,9 +1942,7 @@ def process_staff_confirmation_async(booking_id: str, booking: Dict):
         logging.info(f"✅ Background processing completed for staff confirmation {booking_id}")
 
     except Exception as e:
-        logging.error(f"❌ Background processing error for staff confirmation {booking_id}: {e}")
-        import traceback
-        logging.error(traceback.format_exc())
+        logging.exception(f"❌ Background processing error for staff confirmation {booking_id}: {e}")
 
         try:
             existing_note = booking.get('note', '')
@@ -1473,7 +1961,9 @@ def process_booking_request_async(booking_id: str, sender_email: str, timestamp:
     try:
         logging.info(f"🔄 Background processing started for booking request {booking_id}")
 
-        if not was_acknowledgment_sent(booking_id):
+        if sendgrid_breaker_open():
+            logging.warning(f"   🔌 SendGrid circuit open - acknowledgment email for {booking_id} not sent")
+        elif not was_acknowledgment_sent(booking_id):
             # Get fresh booking data
             booking_data = get_booking_by_id(booking_id)
 
@@ -1485,7 +1975,7 @@ def process_booking_request_async(booking_id: str, sender_email: str, timestamp:
                 send_email_sendgrid(sender_email, subject_line, html_email)
 
                 # Update note to reflect acknowledgment sent
-                ack_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                ack_timestamp = current_timestamp()
                 update_booking_in_db(booking_id, {
                     'note': f"Customer sent booking request on {timestamp}\nAcknowledgment email sent on {ack_timestamp}"
                 })
@@ -1499,9 +1989,7 @@ def process_booking_request_async(booking_id: str, sender_email: str, timestamp:
         logging.info(f"✅ Background processing completed for booking request {booking_id}")
 
     except Exception as e:
-        logging.error(f"❌ Background processing error for booking request {booking_id}: {e}")
-        import traceback
-        logging.error(traceback.format_exc())
+        logging.exception(f"❌ Background processing error for booking request {booking_id}: {e}")
 
         try:
             existing_note = f"Customer sent booking request on {timestamp}"
@@ -1534,7 +2022,7 @@ def process_inquiry_async(sender_email: str, parsed: Dict, booking_id: str, date
                 logging.info(f"   📦 Payload: {payload}")
 
                 # Make initial API call
-                response = requests.post(
+                response = _core_api_http_session.post(
                     api_url,
                     json=payload,
                     timeout=10  # Short timeout for initial request
@@ -1564,7 +2052,7 @@ def process_inquiry_async(sender_email: str, parsed: Dict, booking_id: str, date
                         time.sleep(2)  # Wait 2 seconds between polls
 
                         try:
-                            job_response = requests.get(job_url, timeout=5)
+                            job_response = _core_api_http_session.get(job_url, timeout=5)
                             job_result = job_response.json()
                             job_status = job_result.get('status')
 
@@ -1683,9 +2171,7 @@ def process_inquiry_async(sender_email: str, parsed: Dict, booking_id: str, date
         logging.info(f"✅ Background processing completed for booking {booking_id}")
 
     except Exception as e:
-        logging.error(f"❌ Background processing error for {booking_id}: {e}")
-        import traceback
-        logging.error(traceback.format_exc())
+        logging.exception(f"❌ Background processing error for {booking_id}: {e}")
 
         # Try to update booking with error status
         try:
@@ -2079,8 +2565,13 @@ def generate_waitlist_id(guest_email: str, timestamp: str) -> str:
     return f"WL-{date_str}-{hash_value}"
 
 
+# 'john.smith_jr' -> 'john smith jr' (single pass instead of chained replace())
+_EMAIL_LOCAL_PART_TO_NAME = str.maketrans('._', '  ')
+
+
 def add_to_waitlist(guest_email: str, dates: list, preferred_time: str, players: int, waitlist_id: str) -> bool:
     """Add customer to waitlist database"""
+    conn = None
     try:
         logging.info(f"🔄 Adding to waitlist: {waitlist_id} | Email: {guest_email} | Dates: {dates} | Players: {players}")
 
@@ -2092,24 +2583,14 @@ def add_to_waitlist(guest_email: str, dates: list, preferred_time: str, players:
         cursor = conn.cursor()
 
         # Get guest name from email or previous bookings
-        guest_name = guest_email.split('@')[0].replace('.', ' ').replace('_', ' ').title()
+        guest_name = guest_email.partition('@')[0].translate(_EMAIL_LOCAL_PART_TO_NAME).title()
 
         # Use first date as requested_date
         requested_date = dates[0] if dates else datetime.now().strftime('%Y-%m-%d')
 
         logging.info(f"   Inserting into waitlist table: date={requested_date}, time={preferred_time or 'Flexible'}, players={players}")
 
-        cursor.execute("""
-            INSERT INTO waitlist (
-                waitlist_id, guest_email, guest_name, requested_date,
-                preferred_time, time_flexibility, players, golf_course,
-                status, priority, club, created_at, updated_at
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW()
-            )
-            ON CONFLICT (waitlist_id) DO NOTHING
-            RETURNING id
-        """, (
+        execute_prepared(cursor, 'waitlist_ins', (
             waitlist_id,
             guest_email,
             guest_name,
@@ -2126,7 +2607,6 @@ def add_to_waitlist(guest_email: str, dates: list, preferred_time: str, players:
         result = cursor.fetchone()
         conn.commit()
         cursor.close()
-        release_db_connection(conn)
 
         if result:
             logging.info(f"✅ Added to waitlist: {waitlist_id} (DB id: {result[0]}) for {guest_email}")
@@ -2138,7 +2618,13 @@ def add_to_waitlist(guest_email: str, dates: list, preferred_time: str, players:
     except Exception as e:
         logging.error(f"❌ Error adding to waitlist: {e}")
         logging.exception("Full error:")
+        if conn:
+            conn.rollback()
+            forget_prepared_statements(conn)
         return False
+    finally:
+        if conn:
+            release_db_connection(conn)
 
 
 def send_waitlist_confirmation_email(guest_email: str, waitlist_id: str, dates: list, preferred_time: str, players: int):
@@ -2146,7 +2632,7 @@ def send_waitlist_confirmation_email(guest_email: str, waitlist_id: str, dates:
     dates_str = ', '.join(dates) if dates else 'Your requested dates'
     time_str = preferred_time or 'Flexible'
 
-    html = get_email_header()
+    html = EMAIL_HEADER_HTML
 
     html += f"""
         <div style="background: linear-gradient(135deg, #10b981 0%, #059669 100%); color: white; padding: 25px; border-radius: 12px; text-align: center; margin-bottom: 30px;">
@@ -2155,11 +2641,11 @@ def send_waitlist_confirmation_email(guest_email: str, waitlist_id: str, dates:
         </div>
 
         <p style="color: {BRAND_COLORS['text_dark']}; font-size: 16px; line-height: 1.8;">
-            Thank you for joining our waitlist at <strong style="color: {BRAND_COLORS['navy_primary']};">Golf Club</strong>.
+            Thank you for joining our waitlist at <strong style="color: {BRAND_NAVY};">Golf Club</strong>.
         </p>
 
         <div style="background: {BRAND_COLORS['light_grey']}; border-radius: 8px; padding: 20px; margin: 25px 0;">
-            <h3 style="color: {BRAND_COLORS['navy_primary']}; font-size: 18px; margin: 0 0 15px 0;">
+            <h3 style="color: {BRAND_NAVY}; font-size: 18px; margin: 0 0 15px 0;">
                 📋 Your Waitlist Details
             </h3>
             <table width="100%" cellpadding="8" cellspacing="0" style="border-collapse: collapse;">
@@ -2195,24 +2681,21 @@ def send_waitlist_confirmation_email(guest_email: str, waitlist_id: str, dates:
 
         <p style="color: {BRAND_COLORS['text_medium']}; font-size: 15px; line-height: 1.8;">
             If you have any questions or need to update your waitlist request, please contact us at
-            <a href="mailto:{CLUB_BOOKING_EMAIL}" style="color: {BRAND_COLORS['navy_primary']};">{CLUB_BOOKING_EMAIL}</a>.
+            <a href="mailto:{CLUB_BOOKING_EMAIL}" style="color: {BRAND_NAVY};">{CLUB_BOOKING_EMAIL}</a>.
         </p>
     """
 
-    html += get_email_footer()
+    html += EMAIL_FOOTER_HTML
 
     send_email_sendgrid(guest_email, "Waitlist Confirmation - Golf Club", html)
     logging.info(f"✅ Waitlist confirmation email sent to {guest_email}")
 
 
-def process_waitlist_optin(from_email: str, subject: str, body: str, message_id: str) -> tuple:
-    """Process a waitlist opt-in email and add customer to waitlist"""
+def process_waitlist_optin(guest_email: str, subject: str, body: str, message_id: str) -> tuple:
+    """Process a waitlist opt-in email and add customer to waitlist
 
-    # Extract clean email
-    if '<' in from_email:
-        guest_email = from_email.split('<')[1].strip('>')
-    else:
-        guest_email = from_email
+    guest_email must already be a bare address (see extract_email_address)
+    """
 
     # Parse waitlist details from subject
     parsed = parse_waitlist_optin_subject(subject)
@@ -2229,7 +2712,7 @@ def process_waitlist_optin(from_email: str, subject: str, body: str, message_id:
             parsed['preferred_time'] = body_time.group(1).strip()
 
     # Generate waitlist ID
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    timestamp = current_timestamp()
     waitlist_id = generate_waitlist_id(guest_email, timestamp)
 
     # Add to waitlist
@@ -2243,12 +2726,10 @@ def process_waitlist_optin(from_email: str, subject: str, body: str, message_id:
 
     if success:
         # Send confirmation email in background
-        thread = Thread(
-            target=send_waitlist_confirmation_email,
-            args=(guest_email, waitlist_id, parsed['dates'], parsed['preferred_time'], parsed['players'])
+        EMAIL_SEND_EXECUTOR.submit(
+            send_waitlist_confirmation_email,
+            guest_email, waitlist_id, parsed['dates'], parsed['preferred_time'], parsed['players']
         )
-        thread.daemon = True
-        thread.start()
 
         return ('waitlist_added', waitlist_id)
     else:
@@ -2259,14 +2740,87 @@ def process_waitlist_optin(from_email: str, subject: str, body: str, message_id:
 # EMAIL LOGGING FUNCTIONS
 # ============================================================================
 
-def log_inbound_email_to_db(message_id: str, from_email: str, to_email: str, subject: str,
-                            body_text: str, body_html: str, headers: str, email_type: str = None,
-                            booking_id: str = None, waitlist_id: str = None) -> bool:
-    """
-    Log inbound email to guest_emails table with full content and metadata
+# inbound_emails writes run off the webhook response path. A single worker
+# keeps them in submission order, so the INSERT for a message always lands
+# before the processing-status UPDATEs queued after it.
+EMAIL_STORAGE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='email-storage')
 
-    Args:
-        message_id: Unique email message ID
+
+def _run_email_storage_task(func, kwargs: dict):
+    """Run a queued email storage write, logging instead of raising"""
+    try:
+        func(**kwargs)
+    except Exception as e:
+        logging.error(f"❌ Email storage task {func.__name__} failed: {e}")
+
+
+# Status updates queued while the storage worker is busy are collected into one
+# batch and written together (one connection, one executemany). A batch is
+# closed whenever a save is queued, so a status never runs ahead of its INSERT.
+_email_status_batch = None
+_email_status_batch_lock = Lock()
+
+
+def _flush_email_status_batch(batch: list):
+    """Write a collected batch of processing status updates"""
+    global _email_status_batch
+    with _email_status_batch_lock:
+        if _email_status_batch is batch:
+            _email_status_batch = None
+    update_email_processing_statuses(batch)
+
+
+def queue_inbound_email_save(**kwargs):
+    """Queue save_inbound_email() on the email storage executor"""
+    global _email_status_batch
+    with _email_status_batch_lock:
+        _email_status_batch = None
+        EMAIL_STORAGE_EXECUTOR.submit(_run_email_storage_task, save_inbound_email, kwargs)
+
+
+def queue_email_processing_status(**kwargs):
+    """Queue a processing status update (update_email_processing_status() arguments) behind the pending save"""
+    global _email_status_batch
+    with _email_status_batch_lock:
+        if _email_status_batch is None:
+            _email_status_batch = []
+            EMAIL_STORAGE_EXECUTOR.submit(
+                _run_email_storage_task, _flush_email_status_batch, {'batch': _email_status_batch}
+            )
+        _email_status_batch.append(kwargs)
+
+
+def link_inbound_email_to_waitlist(message_id: str, waitlist_id: str):
+    """Tag a stored inbound email as a waitlist opt-in"""
+    conn = get_db_connection()
+    if not conn:
+        return
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE inbound_emails
+            SET email_type = 'waitlist',
+                waitlist_id = %s
+            WHERE message_id = %s
+        """, (waitlist_id, message_id))
+        conn.commit()
+        cursor.close()
+        logging.info(f"✅ Email linked to waitlist entry: {waitlist_id}")
+    except Exception as e:
+        logging.error(f"❌ Failed to update email for waitlist: {e}")
+        conn.rollback()
+    finally:
+        release_db_connection(conn)
+
+
+def log_inbound_email_to_db(message_id: str, from_email: str, to_email: str, subject: str,
+                            body_text: str, body_html: str, headers: str, email_type: str = None,
+                            booking_id: str = None, waitlist_id: str = None) -> bool:
+    """
+    Log inbound email to guest_emails table with full content and metadata
+
+    Args:
+        message_id: Unique email message ID
         from_email: Sender email address
         to_email: Recipient email address (our booking email)
         subject: Email subject line
@@ -2326,7 +2880,7 @@ def log_inbound_email_to_db(message_id: str, from_email: str, to_email: str, sub
             subject,
             body_text,
             body_html,
-            json.dumps(details),
+            fast_json_text(details),
             email_type,
             booking_id,
             waitlist_id
@@ -2335,7 +2889,6 @@ def log_inbound_email_to_db(message_id: str, from_email: str, to_email: str, sub
         result = cursor.fetchone()
         conn.commit()
         cursor.close()
-        release_db_connection(conn)
 
         if result:
             logging.info(f"📧 Email logged to database (message_id: {message_id})")
@@ -2348,25 +2901,37 @@ def log_inbound_email_to_db(message_id: str, from_email: str, to_email: str, sub
         logging.error(f"❌ Failed to log email to database: {e}")
         if conn:
             conn.rollback()
-            release_db_connection(conn)
         return False
+    finally:
+        if conn:
+            release_db_connection(conn)
 
 
 # ============================================================================
 # WEBHOOK ENDPOINTS
 # ============================================================================
 
-@app.route('/health', methods=['GET'])
-def health():
-    """Health check"""
-    db_status = "connected" if db_pool else "disconnected"
+def json_response(payload, status: int = 200) -> Response:
+    """JSON response serialized with fast_json_dumps (lighter than Flask's jsonify)"""
+    return Response(fast_json_dumps(payload), status=status, mimetype='application/json')
+
 
-    return jsonify({
+# /health bodies, serialized once - keyed by whether the DB pool is up
+HEALTH_BODIES = {
+    connected: fast_json_dumps({
         'status': 'healthy',
         'service': 'Golf Club Email Bot - Inquiry → Requested Flow',
-        'database': db_status,
+        'database': 'connected' if connected else 'disconnected',
         'flow': 'Inquiry → Requested'
     })
+    for connected in (True, False)
+}
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Health check"""
+    return Response(HEALTH_BODIES[db_pool is not None], mimetype='application/json')
 
 
 @app.route('/webhook/inbound', methods=['POST'])
@@ -2395,69 +2960,68 @@ def handle_inbound_email():
     start_time = time.time()
 
     try:
-        from_email = request.form.get('from', '')
-        to_email = request.form.get('to', '')
-        subject = request.form.get('subject', '')
-        text_body = request.form.get('text', '')
-        html_body = request.form.get('html', '')
-        headers = request.form.get('headers', '')
+        form = request.form  # resolve the request proxy once
+        from_email = form.get('from', '')
+        to_email = form.get('to', '')
+        subject = form.get('subject', '')
+        text_body = form.get('text', '')
+        html_body = form.get('html', '')
+        headers = form.get('headers', '')
 
         body = text_body if text_body else html_body
         message_id = extract_message_id(headers)
 
-        logging.info("="*80)
-        logging.info(f"📨 INBOUND WEBHOOK")
-        logging.info(f"From: {from_email}")
-        logging.info(f"To: {to_email}")
-        logging.info(f"Subject: {subject}")
-        logging.info(f"Body (first 200 chars): {body[:200] if body else 'EMPTY'}")
-        logging.info(f"Message-ID: {message_id}")
-        logging.info("="*80)
+        # One record per email; the body preview is only built at DEBUG
+        logging.info(
+            f"📨 INBOUND WEBHOOK - from: {from_email}, to: {to_email}, "
+            f"subject: {subject}, Message-ID: {message_id}",
+            extra={
+                'from_email': from_email,
+                'to_email': to_email,
+                'subject': subject,
+                'message_id': message_id,
+            }
+        )
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"Body (first 200 chars): {body[:200] if body else 'EMPTY'}")
 
-        # Save email to database immediately
-        try:
-            save_inbound_email(
-                message_id=message_id,
-                from_email=from_email,
-                to_email=to_email,
-                subject=subject,
-                text_body=text_body,
-                html_body=html_body,
-                headers=headers
-            )
-            logging.info(f"✅ Email saved to database (message_id: {message_id})")
-        except Exception as e:
-            logging.error(f"❌ Failed to save email to database: {e}")
+        # Save email to database in the background (keeps the write off the response path)
+        queue_inbound_email_save(
+            message_id=message_id,
+            from_email=from_email,
+            to_email=to_email,
+            subject=subject,
+            text_body=text_body,
+            html_body=html_body,
+            headers=headers
+        )
 
         # CRITICAL: Check for duplicate FIRST (prevents retries from processing)
         if message_id and is_duplicate_message(message_id):
             elapsed = time.time() - start_time
             logging.warning(f"⚠️  DUPLICATE MESSAGE - SKIPPING (responded in {elapsed:.2f}s)")
-            return jsonify({'status': 'duplicate', 'message_id': message_id}), 200
+            return json_response({'status': 'duplicate', 'message_id': message_id}, 200)
 
         # Extract clean email
-        if '<' in from_email:
-            sender_email = from_email.split('<')[1].strip('>')
-        else:
-            sender_email = from_email
+        sender_email = extract_email_address(from_email)
 
         if not sender_email or '@' not in sender_email:
             elapsed = time.time() - start_time
             logging.warning(f"⚠️  Invalid email (responded in {elapsed:.2f}s)")
-            return jsonify({'status': 'invalid_email'}), 400
+            return json_response({'status': 'invalid_email'}, 400)
 
         if not body or len(body.strip()) < 10:
             elapsed = time.time() - start_time
             logging.warning(f"⚠️  Empty body (responded in {elapsed:.2f}s)")
-            return jsonify({'status': 'empty_body'}), 200
+            return json_response({'status': 'empty_body'}, 200)
 
         # Parse basic info with enhanced NLP
-        sender_name = from_email.split('<')[0].strip() if '<' in from_email else ""
+        sender_name = extract_sender_name(from_email)
         parsed = parse_email_enhanced(subject, body, sender_email, sender_name)
 
         # LOG EMAIL TO DATABASE (do this early before flow detection)
         # Get recipient email (to_email)
-        to_email = request.form.get('to', CLUB_BOOKING_EMAIL)
+        to_email = form.get('to', CLUB_BOOKING_EMAIL)
 
         # Determine email type based on flow detection
         email_type = 'unknown'
@@ -2511,7 +3075,7 @@ def handle_inbound_email():
                     # Update booking to "Confirmed" IMMEDIATELY
                     logging.info(f"   Updating booking {booking_id} to 'Confirmed'")
 
-                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    timestamp = current_timestamp()
                     existing_note = booking.get('note', '')
                     new_note = f"{existing_note}\nBooking confirmed by team on {timestamp}"
 
@@ -2520,44 +3084,35 @@ def handle_inbound_email():
                         'note': new_note
                     }
 
-                    update_booking_in_db(booking_id, updates)
+                    # The UPDATE returns the refreshed booking for the email
+                    updated_booking = update_booking_in_db(booking_id, updates, returning=True)
 
                     # Update email processing status
-                    try:
-                        update_email_processing_status(
-                            message_id=message_id,
-                            status='processed',
-                            booking_id=booking_id
-                        )
-                    except Exception as e:
-                        logging.error(f"❌ Failed to update email processing status: {e}")
+                    queue_email_processing_status(
+                        message_id=message_id,
+                        status='processed',
+                        booking_id=booking_id
+                    )
 
                     elapsed = time.time() - start_time
                     logging.info(f"✅ Booking confirmed in DB (responded in {elapsed:.2f}s)")
 
-                    # Start background thread for email sending
-                    # Refresh booking data after status update
-                    updated_booking = get_booking_by_id(booking_id)
+                    # Hand email sending to the background pool
                     if updated_booking:
-                        thread = Thread(
-                            target=process_staff_confirmation_async,
-                            args=(booking_id, updated_booking)
-                        )
-                        thread.daemon = True
-                        thread.start()
-                        logging.info(f"🔄 Background thread started for confirmation email {booking_id}")
+                        INBOUND_PROCESS_EXECUTOR.submit(process_staff_confirmation_async, booking_id, updated_booking)
+                        logging.info(f"🔄 Queued background confirmation email {booking_id}")
 
                     # Return 200 immediately (before email is sent)
-                    return jsonify({'status': 'confirmed', 'booking_id': booking_id}), 200
+                    return json_response({'status': 'confirmed', 'booking_id': booking_id}, 200)
                 else:
                     elapsed = time.time() - start_time
                     status = booking.get('status') if booking else 'not found'
                     logging.warning(f"   Booking {booking_id} cannot be confirmed (current status: {status}) (responded in {elapsed:.2f}s)")
-                    return jsonify({'status': 'invalid_status', 'current_status': status}), 200
+                    return json_response({'status': 'invalid_status', 'current_status': status}, 200)
             else:
                 elapsed = time.time() - start_time
                 logging.warning(f"   Confirmation request but no booking ID found (responded in {elapsed:.2f}s)")
-                return jsonify({'status': 'no_booking_id'}), 200
+                return json_response({'status': 'no_booking_id'}, 200)
 
         # Case 1: BOOKING REQUEST (customer clicked "Book Now")
         elif is_booking_request(subject, body):
@@ -2573,57 +3128,50 @@ def handle_inbound_email():
                 if booking and booking.get('status') == 'Requested' and booking.get('confirmation_message_id'):
                     elapsed = time.time() - start_time
                     logging.warning(f"   ⚠️  Already processed (responded in {elapsed:.2f}s)")
-                    return jsonify({'status': 'already_requested', 'booking_id': booking_id}), 200
+                    return json_response({'status': 'already_requested', 'booking_id': booking_id}, 200)
 
                 # Update existing booking to "Requested" IMMEDIATELY
                 logging.info(f"   Updating booking {booking_id} to 'Requested'")
 
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                timestamp = current_timestamp()
                 updates = {
                     'status': 'Requested',
                     'note': f"Customer sent booking request on {timestamp}",
                     'confirmation_message_id': message_id
                 }
 
-                # Extract date and time if present
-                date_match = re.search(r'(\d{4}-\d{2}-\d{2})', subject + body)
-                time_match = re.search(r'(\d{1,2}:\d{2})', subject + body)
+                # Extract date and time if present (subject first - avoids copying the body)
+                date_match = _RE_ISO_DATE.search(subject) or _RE_ISO_DATE.search(body)
+                time_match = _RE_HHMM.search(subject) or _RE_HHMM.search(body)
 
                 if date_match:
                     updates['date'] = date_match.group(1)
                 if time_match:
                     updates['tee_time'] = time_match.group(1)
 
-                update_booking_in_db(booking_id, updates)
+                if update_booking_in_db(booking_id, updates):
+                    remember_message_id(message_id)
 
                 # Update email processing status
-                try:
-                    update_email_processing_status(
-                        message_id=message_id,
-                        status='processed',
-                        booking_id=booking_id
-                    )
-                except Exception as e:
-                    logging.error(f"❌ Failed to update email processing status: {e}")
+                queue_email_processing_status(
+                    message_id=message_id,
+                    status='processed',
+                    booking_id=booking_id
+                )
 
                 elapsed = time.time() - start_time
                 logging.info(f"✅ Booking request saved to DB (responded in {elapsed:.2f}s)")
 
-                # Start background thread for email sending
-                thread = Thread(
-                    target=process_booking_request_async,
-                    args=(booking_id, sender_email, timestamp)
-                )
-                thread.daemon = True
-                thread.start()
-                logging.info(f"🔄 Background thread started for acknowledgment email {booking_id}")
+                # Hand email sending to the background pool
+                INBOUND_PROCESS_EXECUTOR.submit(process_booking_request_async, booking_id, sender_email, timestamp)
+                logging.info(f"🔄 Queued background acknowledgment email {booking_id}")
 
                 # Return 200 immediately (before email is sent)
-                return jsonify({'status': 'requested', 'booking_id': booking_id}), 200
+                return json_response({'status': 'requested', 'booking_id': booking_id}, 200)
             else:
                 elapsed = time.time() - start_time
                 logging.warning(f"   Booking request but no booking ID found (responded in {elapsed:.2f}s)")
-                return jsonify({'status': 'no_booking_id'}), 200
+                return json_response({'status': 'no_booking_id'}, 200)
 
         # Case 2: CUSTOMER REPLY (replying to acknowledgment)
         elif is_customer_reply(subject, body):
@@ -2637,7 +3185,7 @@ def handle_inbound_email():
 
                 booking = get_booking_by_id(booking_id)
                 if booking and booking.get('status') == 'Requested':
-                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    timestamp = current_timestamp()
                     existing_note = booking.get('note', '')
                     new_note = f"{existing_note}\nCustomer replied again on {timestamp}"
 
@@ -2646,18 +3194,15 @@ def handle_inbound_email():
                     })
 
                     # Update email processing status
-                    try:
-                        update_email_processing_status(
-                            message_id=message_id,
-                            status='processed',
-                            booking_id=booking_id
-                        )
-                    except Exception as e:
-                        logging.error(f"❌ Failed to update email processing status: {e}")
+                    queue_email_processing_status(
+                        message_id=message_id,
+                        status='processed',
+                        booking_id=booking_id
+                    )
 
                     elapsed = time.time() - start_time
                     logging.info(f"✅ Reply processed (responded in {elapsed:.2f}s)")
-                    return jsonify({'status': 'reply_received', 'booking_id': booking_id}), 200
+                    return json_response({'status': 'reply_received', 'booking_id': booking_id}, 200)
 
             logging.info("   Reply but no matching booking found - treating as new inquiry")
 
@@ -2670,37 +3215,25 @@ def handle_inbound_email():
 
             # Update email processing status with waitlist_id
             if status == 'waitlist_added' and waitlist_id:
-                try:
-                    update_email_processing_status(
-                        message_id=message_id,
-                        status='processed',
-                        booking_id=waitlist_id  # Store waitlist_id as booking_id for tracking
-                    )
+                queue_email_processing_status(
+                    message_id=message_id,
+                    status='processed',
+                    booking_id=waitlist_id  # Store waitlist_id as booking_id for tracking
+                )
 
-                    # Also update inbound_emails with email_type='waitlist'
-                    conn = get_db_connection()
-                    if conn:
-                        cursor = conn.cursor()
-                        cursor.execute("""
-                            UPDATE inbound_emails
-                            SET email_type = 'waitlist',
-                                waitlist_id = %s
-                            WHERE message_id = %s
-                        """, (waitlist_id, message_id))
-                        conn.commit()
-                        cursor.close()
-                        release_db_connection(conn)
-                        logging.info(f"✅ Email linked to waitlist entry: {waitlist_id}")
-                except Exception as e:
-                    logging.error(f"❌ Failed to update email for waitlist: {e}")
+                # Also update inbound_emails with email_type='waitlist'
+                EMAIL_STORAGE_EXECUTOR.submit(
+                    _run_email_storage_task, link_inbound_email_to_waitlist,
+                    {'message_id': message_id, 'waitlist_id': waitlist_id}
+                )
 
             elapsed = time.time() - start_time
             if status == 'waitlist_added':
                 logging.info(f"✅ Customer added to waitlist: {waitlist_id} (responded in {elapsed:.2f}s)")
-                return jsonify({'status': 'waitlist_added', 'waitlist_id': waitlist_id}), 200
+                return json_response({'status': 'waitlist_added', 'waitlist_id': waitlist_id}, 200)
             else:
                 logging.error(f"❌ Failed to add to waitlist (responded in {elapsed:.2f}s)")
-                return jsonify({'status': 'waitlist_error'}), 500
+                return json_response({'status': 'waitlist_error'}, 500)
 
         # Case 3: NEW INQUIRY (default)
         logging.info("📧 DETECTED: NEW INQUIRY")
@@ -2710,9 +3243,9 @@ def handle_inbound_email():
         if existing_booking_id:
             elapsed = time.time() - start_time
             logging.warning(f"⚠️  Duplicate inquiry (responded in {elapsed:.2f}s)")
-            return jsonify({'status': 'duplicate_inquiry', 'existing_booking_id': existing_booking_id}), 200
+            return json_response({'status': 'duplicate_inquiry', 'existing_booking_id': existing_booking_id}, 200)
 
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = current_timestamp()
         booking_id = generate_booking_id(sender_email, timestamp)
 
         # Create booking with "Processing" status initially
@@ -2733,43 +3266,39 @@ def handle_inbound_email():
         }
 
         # Save to database IMMEDIATELY
-        save_booking_to_db(new_entry)
+        if save_booking_to_db(new_entry):
+            remember_message_id(message_id)
 
         # Update email processing status
-        try:
-            update_email_processing_status(
-                message_id=message_id,
-                status='processed',
-                booking_id=booking_id,
-                parsed_data=parsed
-            )
-        except Exception as e:
-            logging.error(f"❌ Failed to update email processing status: {e}")
+        queue_email_processing_status(
+            message_id=message_id,
+            status='processed',
+            booking_id=booking_id,
+            parsed_data=parsed
+        )
 
         elapsed = time.time() - start_time
         logging.info(f"✅ Inquiry saved to DB (responded in {elapsed:.2f}s)")
 
-        # Start background processing thread (API call + email sending)
-        thread = Thread(
-            target=process_inquiry_async,
-            args=(sender_email, parsed, booking_id, parsed['dates'], parsed['players'])
+        # Hand the API call + email sending to the background pool
+        INBOUND_PROCESS_EXECUTOR.submit(
+            process_inquiry_async,
+            sender_email, parsed, booking_id, parsed['dates'], parsed['players']
         )
-        thread.daemon = True
-        thread.start()
 
-        logging.info(f"🔄 Background thread started for booking {booking_id}")
+        logging.info(f"🔄 Queued background processing for booking {booking_id}")
 
         # Return 200 immediately (before API call completes)
-        return jsonify({
+        return json_response({
             'status': 'inquiry_accepted',
             'booking_id': booking_id,
             'processing': 'background'
-        }), 200
+        }, 200)
 
     except Exception as e:
         elapsed = time.time() - start_time
         logging.exception(f"❌ ERROR (responded in {elapsed:.2f}s):")
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+        return json_response({'status': 'error', 'message': str(e)}, 500)
     finally:
         # Always log response time
         elapsed = time.time() - start_time
@@ -2779,34 +3308,152 @@ def handle_inbound_email():
             logging.info(f"⏱️  Response time: {elapsed:.2f}s")
 
 
-@app.route('/api/bookings', methods=['GET'])
-def api_get_bookings():
-    """API endpoint for dashboard to read bookings"""
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'error': 'No database connection'}), 500
+# Every booking for the club, newest first, as one JSON text cell
+BOOKINGS_ALL_SQL = """
+    SELECT json_build_object(
+        'success', true,
+        'bookings', COALESCE(json_agg(b ORDER BY b.timestamp DESC), '[]'::json),
+        'count', COUNT(*)
+    )::text
+    FROM bookings b
+    WHERE b.club = %s
+"""
+
+# Largest page /api/bookings will return when a limit is requested
+BOOKINGS_PAGE_MAX = 500
+
+# Keyset page of bookings, newest first; next_cursor is the last row's
+# "timestamp|booking_id" when the page is full (served by idx_bookings_club_timestamp)
+BOOKINGS_PAGE_SQL = """
+    WITH page AS (
+        SELECT * FROM bookings b
+        WHERE b.club = %s{after}
+        ORDER BY b.timestamp DESC, b.booking_id DESC
+        LIMIT %s
+    )
+    SELECT json_build_object(
+        'success', true,
+        'bookings', COALESCE(json_agg(p ORDER BY p.timestamp DESC, p.booking_id DESC), '[]'::json),
+        'count', COUNT(*),
+        'next_cursor', CASE WHEN COUNT(*) = %s THEN
+            (array_agg(p.timestamp::text || '|' || p.booking_id ORDER BY p.timestamp, p.booking_id))[1]
+        END
+    )::text
+    FROM page p
+"""
+BOOKINGS_FIRST_PAGE_SQL = BOOKINGS_PAGE_SQL.format(after='')
+BOOKINGS_NEXT_PAGE_SQL = BOOKINGS_PAGE_SQL.format(after=' AND (b.timestamp, b.booking_id) < (%s, %s)')
+
+# The full listing is cached briefly so dashboard polling doesn't rerun it per
+# poll. Writes through this app bump 'generation', which retires the cached
+# body at once; the TTL bounds staleness from writes made elsewhere. The cache
+# is per gunicorn worker process: a write only retires this worker's copy, so
+# with WEB_CONCURRENCY > 1 the other workers can serve a listing up to
+# BOOKINGS_CACHE_TTL seconds old after an update
+BOOKINGS_CACHE_TTL = float(os.getenv("BOOKINGS_CACHE_TTL", "2"))
+_bookings_cache = {'generation': 0, 'body_generation': -1, 'at': 0.0, 'body': None}
+_bookings_cache_lock = Lock()
+
+
+def invalidate_bookings_cache():
+    """
+    Retire this worker's cached /api/bookings listing (call after writing to
+    bookings). Waits for any in-flight refresh, which then isn't reused
+    """
+    with _bookings_cache_lock:
+        _bookings_cache['generation'] += 1
 
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("""
-            SELECT * FROM bookings
-            WHERE club = %s
-            ORDER BY timestamp DESC
-        """, (DATABASE_CLUB_ID,))
 
-        bookings = cursor.fetchall()
+def fetch_bookings_json(sql: str, params: tuple) -> Optional[str]:
+    """Run a bookings query returning one JSON text cell; None without a DB connection"""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        body = cursor.fetchone()[0]
         cursor.close()
+        return body
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        # Always hand the connection back, even when the query fails
         release_db_connection(conn)
 
-        return jsonify({
-            'success': True,
-            'bookings': [dict(b) for b in bookings],
-            'count': len(bookings)
-        })
+
+def cached_bookings_listing() -> Optional[str]:
+    """
+    The full /api/bookings body, re-queried at most every BOOKINGS_CACHE_TTL
+    seconds - concurrent pollers wait for the one in-flight refresh
+    """
+    with _bookings_cache_lock:
+        if (_bookings_cache['body'] is not None
+                and _bookings_cache['body_generation'] == _bookings_cache['generation']
+                and time.monotonic() - _bookings_cache['at'] < BOOKINGS_CACHE_TTL):
+            return _bookings_cache['body']
+
+        generation = _bookings_cache['generation']
+        body = fetch_bookings_json(BOOKINGS_ALL_SQL, (DATABASE_CLUB_ID,))
+        if body is not None:
+            _bookings_cache.update(body=body, body_generation=generation, at=time.monotonic())
+        return body
+
+
+def parse_bookings_cursor(before: str) -> Optional[tuple]:
+    """
+    (timestamp, booking_id) from a "timestamp|booking_id" next_cursor, or None
+    if malformed - checked here so a bad timestamp is a 400 rather than a
+    Postgres error
+    """
+    before_timestamp, _, before_id = before.partition('|')
+    try:
+        datetime.fromisoformat(before_timestamp)
+    except ValueError:
+        return None
+    return (before_timestamp, before_id) if before_id else None
+
+
+@app.route('/api/bookings', methods=['GET'])
+def api_get_bookings():
+    """
+    API endpoint for dashboard to read bookings
+
+    Without query parameters returns every booking for the club. With
+    ?limit=N (max 500) returns one page, newest first, plus next_cursor;
+    pass it back as ?before=<next_cursor> for the following page
+    """
+    try:
+        limit = request.args.get('limit', type=int)
+        before = request.args.get('before')
+        if limit is not None and limit <= 0:
+            return json_response({'success': False, 'error': 'limit must be a positive integer'}, 400)
+        before_key = parse_bookings_cursor(before) if before else None
+        if before and before_key is None:
+            return json_response({'success': False, 'error': 'Invalid before cursor'}, 400)
+
+        # The whole response document is built in Postgres and fetched as one
+        # text cell - no per-row tuple/dict conversion or re-encoding in Python
+        if limit is None and not before:
+            body = cached_bookings_listing()
+        else:
+            limit = min(limit or BOOKINGS_PAGE_MAX, BOOKINGS_PAGE_MAX)
+            if before:
+                body = fetch_bookings_json(
+                    BOOKINGS_NEXT_PAGE_SQL, (DATABASE_CLUB_ID, *before_key, limit, limit)
+                )
+            else:
+                body = fetch_bookings_json(BOOKINGS_FIRST_PAGE_SQL, (DATABASE_CLUB_ID, limit, limit))
+
+        if body is None:
+            return json_response({'success': False, 'error': 'No database connection'}, 500)
+
+        return Response(body, mimetype='application/json')
 
     except Exception as e:
         logging.error(f"❌ Error: {e}")
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return json_response({'success': False, 'error': str(e)}, 500)
 
 
 @app.route('/api/bookings/<booking_id>', methods=['PUT'])
@@ -2816,18 +3463,123 @@ def api_update_booking(booking_id):
         data = request.json
 
         if update_booking_in_db(booking_id, data):
-            return jsonify({'success': True})
+            return json_response({'success': True})
         else:
-            return jsonify({'success': False}), 500
+            return json_response({'success': False}, 500)
 
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return json_response({'success': False, 'error': str(e)}, 500)
 
 
 # ============================================================================
 # STRIPE PAYMENT ENDPOINTS
 # ============================================================================
 
+# Stripe account capabilities that gate the Direct Debit payment method types
+DIRECT_DEBIT_CAPABILITIES = [
+    ('sepa_debit', 'sepa_debit_payments', 'SEPA'),
+    ('bacs_debit', 'bacs_debit_payments', 'BACS'),
+]
+
+# Stripe payment method type -> payment type label used in notes and emails
+DIRECT_DEBIT_PAYMENT_TYPES = {method: label for method, _, label in DIRECT_DEBIT_CAPABILITIES}
+
+# Payment type -> who the Direct Debit scheme is for (pending email copy)
+DIRECT_DEBIT_DESCRIPTIONS = {
+    'BACS': 'UK bank transfer',
+    'SEPA': 'European bank transfer',
+}
+
+ENABLED_PAYMENT_METHODS_TTL = 3600  # seconds
+
+_enabled_payment_methods_cache = {'methods': None, 'expires': 0}
+
+
+def get_enabled_payment_methods() -> list:
+    """
+    Get the checkout payment_method_types enabled on the Stripe account
+
+    Looked up once via the account capabilities and cached for
+    ENABLED_PAYMENT_METHODS_TTL, instead of probing Session.create with
+    each combination. If the lookup fails, all methods are returned
+    (uncached) and checkout falls back to card-only on rejection.
+    """
+    now = time.time()
+    if _enabled_payment_methods_cache['methods'] is not None and now < _enabled_payment_methods_cache['expires']:
+        return _enabled_payment_methods_cache['methods']
+
+    try:
+        capabilities = stripe.Account.retrieve().get('capabilities') or {}
+    except stripe.error.StripeError as e:
+        logging.warning(f"⚠️ Could not retrieve Stripe account capabilities: {str(e)}")
+        return ['card'] + [method for method, _, _ in DIRECT_DEBIT_CAPABILITIES]
+
+    methods = ['card']
+    disabled = []
+    for method, capability, label in DIRECT_DEBIT_CAPABILITIES:
+        if capabilities.get(capability) == 'active':
+            methods.append(method)
+        else:
+            disabled.append(label)
+
+    if disabled:
+        logging.warning(f"⚠️ Stripe payment methods not enabled: {', '.join(disabled)}")
+        logging.warning(f"   Enable at: https://dashboard.stripe.com/account/payments/settings")
+    logging.info(f"✅ Stripe payment methods: {', '.join(methods)}")
+
+    _enabled_payment_methods_cache['methods'] = methods
+    _enabled_payment_methods_cache['expires'] = now + ENABLED_PAYMENT_METHODS_TTL
+    return methods
+
+
+CHECKOUT_PRODUCT_NAME = f'Golf Booking - {FROM_NAME}'
+
+
+def checkout_unit_amount(total) -> int:
+    """Booking total (euros, as number or string) to Stripe cents without float truncation"""
+    return int((Decimal(str(total)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def checkout_description(date: str, tee_time: Optional[str], players, *extra_lines: str) -> str:
+    """Line item description: date/tee time, players, then any extra detail lines"""
+    if tee_time:
+        lines = [f'Date: {date}, Tee Time: {tee_time}', f'Players: {players}']
+    else:
+        lines = [f'Date: {date}', f'Players: {players}']
+    lines.extend(line for line in extra_lines if line)
+    return '\n'.join(lines)
+
+
+def build_checkout_line_items(description: str, unit_amount: int) -> list:
+    """Single green-fee line item for a checkout session (amount in cents)"""
+    return [{
+        'price_data': {
+            'currency': 'eur',
+            'product_data': {
+                'name': CHECKOUT_PRODUCT_NAME,
+                'description': description,
+                'images': [STRIPE_PRODUCT_IMAGE_URL],
+            },
+            'unit_amount': unit_amount,
+        },
+        'quantity': 1,
+    }]
+
+
+def checkout_idempotency_key(booking_id: str, request_fields: dict) -> str:
+    """
+    Idempotency key for stripe.checkout.Session.create
+
+    Derived from the booking ID plus everything sent to Stripe, so a retried
+    submission gets the existing session back while a changed one (e.g. edited
+    booking form) still creates a new session instead of failing
+    """
+    digest = hashlib.sha256(
+        json.dumps(request_fields, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()[:16]
+    return f"checkout-{booking_id}-{digest}"
+
+
 @app.route('/api/create-checkout-session', methods=['POST'])
 def create_checkout_session():
     """
@@ -2845,7 +3597,7 @@ def create_checkout_session():
     """
     try:
         if not STRIPE_SECRET_KEY:
-            return jsonify({'error': 'Stripe not configured'}), 500
+            return json_response({'error': 'Stripe not configured'}, 500)
 
         data = request.json
         booking_id = data.get('booking_id')
@@ -2856,23 +3608,15 @@ def create_checkout_session():
         guest_email = data.get('guest_email')
 
         if not all([booking_id, date, players, total, guest_email]):
-            return jsonify({'error': 'Missing required fields'}), 400
+            return json_response({'error': 'Missing required fields'}, 400)
 
         # Create Stripe checkout session with BACS and SEPA Direct Debit support
         session = stripe.checkout.Session.create(
             payment_method_types=['card', 'bacs_debit', 'sepa_debit'],  # Support card, BACS, and SEPA
-            line_items=[{
-                'price_data': {
-                    'currency': 'eur',
-                    'product_data': {
-                        'name': f'Golf Booking - {FROM_NAME}',
-                        'description': f'Date: {date}{f", Tee Time: {tee_time}" if tee_time else ""}\nPlayers: {players}',
-                        'images': ['https://theisland.ie/wp-content/uploads/2024/01/island-logo.png'],
-                    },
-                    'unit_amount': int(float(total) * 100),  # Convert to cents
-                },
-                'quantity': 1,
-            }],
+            line_items=build_checkout_line_items(
+                checkout_description(date, tee_time, players),
+                checkout_unit_amount(total)
+            ),
             mode='payment',
             success_url=STRIPE_SUCCESS_URL + f'?booking_id={booking_id}',
             cancel_url=STRIPE_CANCEL_URL + f'?booking_id={booking_id}',
@@ -2884,18 +3628,19 @@ def create_checkout_session():
                 'players': str(players),
                 'club': DATABASE_CLUB_ID,
             },
+            idempotency_key=checkout_idempotency_key(booking_id, data),
         )
 
         logging.info(f"✅ Created Stripe checkout session for booking {booking_id}: {session.id}")
 
-        return jsonify({
+        return json_response({
             'sessionId': session.id,
             'url': session.url
         })
 
     except Exception as e:
         logging.error(f"❌ Error creating Stripe checkout session: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 
 @app.route('/<club>/book', methods=['GET'])
@@ -2961,135 +3706,95 @@ def submit_booking_form(club=None):
     """
     try:
         if not STRIPE_SECRET_KEY:
-            return jsonify({'success': False, 'error': 'Stripe payment system is not configured'}), 500
+            return json_response({'success': False, 'error': 'Stripe payment system is not configured'}, 500)
 
         # Get form data
-        booking_id = request.form.get('booking_id')
-        date = request.form.get('date')
-        tee_time = request.form.get('tee_time')
-        players = request.form.get('players')
-        total = request.form.get('total')
-        guest_email = request.form.get('guest_email')
+        form = request.form  # resolve the request proxy once
+        booking_id = form.get('booking_id')
+        date = form.get('date')
+        tee_time = form.get('tee_time')
+        players = form.get('players')
+        total = form.get('total')
+        guest_email = form.get('guest_email')
 
         # Get club from form or URL path
-        club_id = request.form.get('club_id') or club or DATABASE_CLUB_ID
+        club_id = form.get('club_id') or club or DATABASE_CLUB_ID
 
         # Get booking form fields
-        lead_name = request.form.get('lead_name')
-        caddie_requirements = request.form.get('caddie_requirements', '')
-        fb_requirements = request.form.get('fb_requirements', '')
-        special_requests = request.form.get('special_requests', '')
+        lead_name = form.get('lead_name')
+        caddie_requirements = form.get('caddie_requirements', '')
+        fb_requirements = form.get('fb_requirements', '')
+        special_requests = form.get('special_requests', '')
 
         if not all([booking_id, date, tee_time, players, guest_email, lead_name]):
-            return jsonify({'success': False, 'error': 'Missing required booking information'}), 400
+            return json_response({'success': False, 'error': 'Missing required booking information'}, 400)
 
         # Convert to appropriate types
         players = int(players)
         total = float(total)
 
         # Create description with all booking details
-        description_lines = [
-            f'Date: {date}, Tee Time: {tee_time}',
-            f'Players: {players}',
-            f'Lead Guest: {lead_name}'
-        ]
-
-        if caddie_requirements:
-            description_lines.append(f'Caddies: {caddie_requirements}')
+        description = checkout_description(
+            date, tee_time, players,
+            f'Lead Guest: {lead_name}',
+            f'Caddies: {caddie_requirements}' if caddie_requirements else ''
+        )
 
-        description = '\n'.join(description_lines)
+        # Booking metadata - built once, shared by the session and the payment intent
+        booking_metadata = {
+            'booking_id': booking_id,
+            'date': date,
+            'tee_time': tee_time,
+            'players': str(players),
+            'lead_name': lead_name,
+            'caddie_requirements': caddie_requirements[:500] if caddie_requirements else '',  # Stripe metadata limit
+            'fb_requirements': fb_requirements[:500] if fb_requirements else '',
+            'special_requests': special_requests[:500] if special_requests else '',
+        }
 
         # Common session parameters with extended metadata
         session_params = {
-            'line_items': [{
-                'price_data': {
-                    'currency': 'eur',
-                    'product_data': {
-                        'name': f'Golf Booking - {FROM_NAME}',
-                        'description': description,
-                        'images': ['https://theisland.ie/wp-content/uploads/2024/01/island-logo.png'],
-                    },
-                    'unit_amount': int(total * 100),  # Convert to cents
-                },
-                'quantity': 1,
-            }],
+            'line_items': build_checkout_line_items(description, checkout_unit_amount(total)),
             'mode': 'payment',
             'success_url': STRIPE_SUCCESS_URL + f'?booking_id={booking_id}',
             'cancel_url': STRIPE_CANCEL_URL + f'?booking_id={booking_id}',
             'customer_email': guest_email,
-            'metadata': {
-                'booking_id': booking_id,
-                'date': date,
-                'tee_time': tee_time,
-                'players': str(players),
-                'club': club_id,
-                'lead_name': lead_name,
-                'caddie_requirements': caddie_requirements[:500] if caddie_requirements else '',  # Stripe metadata limit
-                'fb_requirements': fb_requirements[:500] if fb_requirements else '',
-                'special_requests': special_requests[:500] if special_requests else '',
-            },
+            'metadata': {**booking_metadata, 'club': club_id},
             'payment_intent_data': {
-                'metadata': {
-                    'booking_id': booking_id,
-                    'date': date,
-                    'tee_time': tee_time,
-                    'players': str(players),
-                    'lead_name': lead_name,
-                    'caddie_requirements': caddie_requirements[:500] if caddie_requirements else '',
-                    'fb_requirements': fb_requirements[:500] if fb_requirements else '',
-                    'special_requests': special_requests[:500] if special_requests else '',
-                }
+                'metadata': booking_metadata
             }
         }
 
-        # Try payment methods in order of preference
-        payment_method_attempts = [
-            (['card', 'sepa_debit', 'bacs_debit'], 'Card + SEPA + BACS'),
-            (['card', 'sepa_debit'], 'Card + SEPA only'),
-            (['card', 'bacs_debit'], 'Card + BACS only'),
-            (['card'], 'Card only'),
-        ]
+        # Use the payment methods enabled on the account (cached capability lookup)
+        payment_methods = get_enabled_payment_methods()
 
-        session = None
-        for payment_methods, description_text in payment_method_attempts:
-            try:
-                session = stripe.checkout.Session.create(
-                    payment_method_types=payment_methods,
-                    **session_params
-                )
-                # Success! Log which payment methods are active
-                if len(payment_methods) < 3:
-                    disabled = []
-                    if 'sepa_debit' not in payment_methods:
-                        disabled.append('SEPA')
-                    if 'bacs_debit' not in payment_methods:
-                        disabled.append('BACS')
-                    logging.warning(f"⚠️ Using {description_text} ({', '.join(disabled)} not enabled)")
-                    logging.warning(f"   Enable at: https://dashboard.stripe.com/account/payments/settings")
-                else:
-                    logging.info(f"✅ Using {description_text}")
-                break
-            except stripe.error.InvalidRequestError as e:
-                # This payment method combination didn't work, try next
-                if 'payment method type' in str(e).lower():
-                    if payment_methods == ['card']:
-                        # Even card-only failed, re-raise the error
-                        logging.error(f"❌ All payment methods failed: {str(e)}")
-                        raise
-                    # Try next combination
-                    continue
-                else:
-                    # Different error, re-raise it
-                    raise
-
-        if not session:
-            raise Exception("Failed to create Stripe checkout session with any payment method combination")
+        try:
+            session = stripe.checkout.Session.create(
+                payment_method_types=payment_methods,
+                idempotency_key=checkout_idempotency_key(
+                    booking_id, {**session_params, 'payment_method_types': payment_methods}
+                ),
+                **session_params
+            )
+        except stripe.error.InvalidRequestError as e:
+            # Safety net: capabilities were stale or unavailable - retry card-only once
+            if 'payment method type' not in str(e).lower() or payment_methods == ['card']:
+                raise
+            logging.warning(f"⚠️ Payment methods {payment_methods} rejected, falling back to card only: {str(e)}")
+            _enabled_payment_methods_cache['expires'] = 0
+            session = stripe.checkout.Session.create(
+                payment_method_types=['card'],
+                idempotency_key=checkout_idempotency_key(
+                    booking_id, {**session_params, 'payment_method_types': ['card']}
+                ),
+                **session_params
+            )
 
         logging.info(f"✅ Created Stripe checkout session for booking {booking_id}: {session.id}")
         logging.info(f"   Lead: {lead_name}, Caddies: {caddie_requirements or 'None'}")
 
         # Return success with checkout URL
-        return jsonify({
+        return json_response({
             'success': True,
             'checkout_url': session.url,
             'session_id': session.id
@@ -3097,738 +3802,1061 @@ def submit_booking_form(club=None):
 
     except Exception as e:
         logging.error(f"❌ Error creating Stripe checkout from booking form: {str(e)}")
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return json_response({'success': False, 'error': str(e)}, 500)
 
 
-@app.route('/webhook/stripe', methods=['POST'])
-def stripe_webhook():
+# Event types process_stripe_event() acts on; everything else is acknowledged
+# without being queued
+HANDLED_STRIPE_EVENT_TYPES = frozenset({
+    'checkout.session.completed',
+    'charge.succeeded',
+    'charge.failed',
+})
+
+# Verified Stripe events waiting for processing (see stripe_event_worker)
+stripe_event_queue = queue.Queue()
+
+# Journaled events still unfinished after this long were dropped by a previous
+# process (deploy or worker restart) and are replayed on startup
+STRIPE_EVENT_REPLAY_AGE_SECONDS = 120
+
+# How long a stopping worker waits for stripe_event_queue to empty - kept
+# under gunicorn's graceful_timeout (30s)
+STRIPE_EVENT_DRAIN_SECONDS = 20
+
+# Recently accepted Stripe event IDs - only used when there is no database;
+# otherwise the stripe_events primary key dedupes (see record_stripe_event)
+_STRIPE_EVENT_IDS_MAX = 10000
+_accepted_stripe_event_ids = OrderedDict()
+_accepted_stripe_event_ids_lock = Lock()
+
+
+def accept_stripe_event_id(event_id: str) -> bool:
+    """Record a Stripe event ID in this process; returns False if it was already accepted"""
+    if not event_id:
+        return True
+    with _accepted_stripe_event_ids_lock:
+        if event_id in _accepted_stripe_event_ids:
+            return False
+        _accepted_stripe_event_ids[event_id] = None
+        if len(_accepted_stripe_event_ids) > _STRIPE_EVENT_IDS_MAX:
+            _accepted_stripe_event_ids.popitem(last=False)
+    return True
+
+
+def execute_stripe_event_sql(sql: str, params: tuple) -> Optional[int]:
+    """Run one stripe_events statement in its own transaction; rowcount, or None without a DB connection"""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        rowcount = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        return rowcount
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db_connection(conn)
+
+
+def record_stripe_event(event_id: str, event_type: str, payload: str) -> Optional[bool]:
     """
-    Handle Stripe webhook events
-    Primary event: checkout.session.completed
+    Journal a verified Stripe event (raw JSON payload) as 'pending' in stripe_events
+    True if it's new, False if the event ID is already journaled (a Stripe retry,
+    possibly delivered to the other worker), None without a database connection.
+    Database errors propagate so the webhook answers 500 and Stripe redelivers
     """
-    payload = request.data
-    sig_header = request.headers.get('Stripe-Signature')
+    rowcount = execute_stripe_event_sql("""
+        INSERT INTO stripe_events (event_id, event_type, payload)
+        VALUES (%s, %s, %s::jsonb)
+        ON CONFLICT (event_id) DO NOTHING
+    """, (event_id, event_type, payload))
+    return None if rowcount is None else rowcount == 1
 
-    try:
-        if STRIPE_WEBHOOK_SECRET:
-            # Verify webhook signature
-            event = stripe.Webhook.construct_event(
-                payload, sig_header, STRIPE_WEBHOOK_SECRET
-            )
-        else:
-            # No signature verification (not recommended for production)
-            event = json.loads(payload)
 
-        logging.info(f"📨 Received Stripe webhook: {event['type']}")
+def claim_stripe_event(event_id: Optional[str]) -> bool:
+    """
+    Move a journaled event from 'pending' to 'processing' before applying it;
+    False if another worker already claimed or finished it. Events without an
+    ID or a journal row are always processed, as are events whose claim fails
+    on a database error (a late duplicate beats a paid booking left unconfirmed)
+    """
+    if not event_id:
+        return True
+    try:
+        rowcount = execute_stripe_event_sql("""
+            UPDATE stripe_events
+            SET status = 'processing', claimed_at = NOW()
+            WHERE event_id = %s AND status = 'pending'
+        """, (event_id,))
+    except Exception as e:
+        logging.error(f"❌ Could not claim Stripe event {event_id}: {e}")
+        return True
+    return rowcount != 0
 
-        # Handle successful payment checkout
-        if event['type'] == 'checkout.session.completed':
-            session = event['data']['object']
-
-            # Extract booking information from metadata
-            booking_id = session['metadata'].get('booking_id')
-            date = session['metadata'].get('date')
-            tee_time = session['metadata'].get('tee_time')
-            players = session['metadata'].get('players')
-            guest_email = session['customer_email']
-            amount_paid = session['amount_total'] / 100  # Convert from cents
-            payment_method_types = session.get('payment_method_types', [])
-
-            # Extract booking form data from metadata
-            lead_name = session['metadata'].get('lead_name', '')
-            caddie_requirements = session['metadata'].get('caddie_requirements', '')
-            fb_requirements = session['metadata'].get('fb_requirements', '')
-            special_requests = session['metadata'].get('special_requests', '')
-
-            logging.info(f"💳 Payment checkout completed for booking {booking_id}")
-            logging.info(f"   Amount: €{amount_paid}")
-            logging.info(f"   Customer: {guest_email}")
-            logging.info(f"   Payment methods: {payment_method_types}")
-
-            # Check if Direct Debit (BACS or SEPA) was used
-            if 'bacs_debit' in payment_method_types or 'sepa_debit' in payment_method_types:
-                payment_type = 'SEPA' if 'sepa_debit' in payment_method_types else 'BACS'
-
-                # Detect test mode (session ID starts with cs_test_ or sk_test_)
-                is_test_mode = session['id'].startswith('cs_test_') or (STRIPE_SECRET_KEY and STRIPE_SECRET_KEY.startswith('sk_test_'))
-
-                if is_test_mode:
-                    # TEST MODE: Instant confirmation for easier testing
-                    logging.info(f"🧪 TEST MODE: {payment_type} Direct Debit - marking as confirmed immediately")
-
-                    update_data = {
-                        'status': 'Confirmed',
-                        'tee_time': tee_time,
-                        'lead_name': lead_name,
-                        'caddie_requirements': caddie_requirements,
-                        'fb_requirements': fb_requirements,
-                        'special_requests': special_requests,
-                        'note': f"Payment confirmed via Stripe ({payment_type} Direct Debit - TEST MODE) on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\nAmount paid: €{amount_paid}\nStripe Session ID: {session['id']}"
-                    }
 
-                    if update_booking_in_db(booking_id, update_data):
-                        logging.info(f"✅ Updated booking {booking_id} to Confirmed status (test mode)")
+def finish_stripe_event(event_id: Optional[str], status: str):
+    """Mark a claimed Stripe event 'processed' or 'failed' in the journal"""
+    if not event_id:
+        return
+    try:
+        execute_stripe_event_sql("""
+            UPDATE stripe_events
+            SET status = %s, processed_at = NOW()
+            WHERE event_id = %s
+        """, (status, event_id))
+    except Exception as e:
+        logging.error(f"❌ Could not mark Stripe event {event_id} {status}: {e}")
 
-                        # Send instant confirmation email (same as card payment)
-                        Thread(
-                            target=send_payment_confirmation_email,
-                            args=(booking_id, guest_email, date, tee_time, players, amount_paid)
-                        ).start()
-                    else:
-                        logging.error(f"❌ Failed to update booking {booking_id}")
 
-                else:
-                    # LIVE MODE: Mark as pending - payment will clear in 3-5 days
-                    logging.info(f"⏳ {payment_type} Direct Debit payment pending for booking {booking_id}")
-
-                    update_data = {
-                        'status': f'Pending {payment_type}',
-                        'tee_time': tee_time,
-                        'lead_name': lead_name,
-                        'caddie_requirements': caddie_requirements,
-                        'fb_requirements': fb_requirements,
-                        'special_requests': special_requests,
-                        'note': f"{payment_type} Direct Debit payment initiated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\nAmount: €{amount_paid}\nStatus: Pending (clears in 3-5 business days)\nStripe Session ID: {session['id']}"
-                    }
+def process_stripe_event(event):
+    """
+    Apply a verified Stripe event: update the booking and send customer emails
+    Runs on the Stripe event worker thread, after the webhook has returned 200
+    """
+    # One timestamp per event for all booking notes ('YYYY-MM-DD HH:MM:SS')
+    event_time = current_timestamp()
+
+    # Handle successful payment checkout
+    if event['type'] == 'checkout.session.completed':
+        session = event['data']['object']
+
+        # Extract booking information from metadata
+        booking_id = session['metadata'].get('booking_id')
+        date = session['metadata'].get('date')
+        tee_time = session['metadata'].get('tee_time')
+        players = session['metadata'].get('players')
+        guest_email = session['customer_email']
+        amount_paid = session['amount_total'] / 100  # Convert from cents
+        payment_method_types = session.get('payment_method_types', [])
+
+        # Extract booking form data from metadata
+        lead_name = session['metadata'].get('lead_name', '')
+        caddie_requirements = session['metadata'].get('caddie_requirements', '')
+        fb_requirements = session['metadata'].get('fb_requirements', '')
+        special_requests = session['metadata'].get('special_requests', '')
+
+        # One record per event (a single handler lock/format pass); fields are
+        # also attached as record attributes for structured log handlers
+        logging.info(
+            f"💳 Payment checkout completed for booking {booking_id} - "
+            f"amount: €{amount_paid}, customer: {guest_email}, payment methods: {payment_method_types}",
+            extra={
+                'booking_id': booking_id,
+                'amount': amount_paid,
+                'email': guest_email,
+                'payment_methods': payment_method_types,
+            }
+        )
 
-                    if update_booking_in_db(booking_id, update_data):
-                        logging.info(f"✅ Updated booking {booking_id} to Pending {payment_type} status")
+        # Check if Direct Debit (BACS or SEPA) was used
+        if 'bacs_debit' in payment_method_types or 'sepa_debit' in payment_method_types:
+            payment_type = 'SEPA' if 'sepa_debit' in payment_method_types else 'BACS'
 
-                        # Send "pending confirmation" email
-                        Thread(
-                            target=send_direct_debit_pending_email,
-                            args=(booking_id, guest_email, date, tee_time, players, amount_paid, payment_type)
-                        ).start()
-                    else:
-                        logging.error(f"❌ Failed to update booking {booking_id}")
+            # Detect test mode (session ID starts with cs_test_ or sk_test_)
+            is_test_mode = session['id'].startswith('cs_test_') or STRIPE_TEST_MODE
 
-            else:
-                # Card payment: Instant confirmation
-                logging.info(f"✅ Card payment confirmed for booking {booking_id}")
+            if is_test_mode:
+                # TEST MODE: Instant confirmation for easier testing
+                logging.info(f"🧪 TEST MODE: {payment_type} Direct Debit - marking as confirmed immediately")
 
                 update_data = {
                     'status': 'Confirmed',
-                    'tee_time': tee_time,  # Save the tee time to database
+                    'tee_time': tee_time,
                     'lead_name': lead_name,
                     'caddie_requirements': caddie_requirements,
                     'fb_requirements': fb_requirements,
                     'special_requests': special_requests,
-                    'note': f"Payment confirmed via Stripe (Card) on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\nAmount paid: €{amount_paid}\nStripe Session ID: {session['id']}"
+                    'note': f"Payment confirmed via Stripe ({payment_type} Direct Debit - TEST MODE) on {event_time}\nAmount paid: €{amount_paid}\nStripe Session ID: {session['id']}"
                 }
 
                 if update_booking_in_db(booking_id, update_data):
-                    logging.info(f"✅ Updated booking {booking_id} to Confirmed status")
+                    logging.info(f"✅ Updated booking {booking_id} to Confirmed status (test mode)")
 
-                    # Send confirmation email in background
-                    Thread(
-                        target=send_payment_confirmation_email,
-                        args=(booking_id, guest_email, date, tee_time, players, amount_paid)
-                    ).start()
+                    # Send instant confirmation email (same as card payment)
+                    EMAIL_SEND_EXECUTOR.submit(send_payment_confirmation_email, booking_id, guest_email, date, tee_time, players, amount_paid)
+                else:
+                    logging.error(f"❌ Failed to update booking {booking_id}")
+
+            else:
+                # LIVE MODE: Mark as pending - payment will clear in 3-5 days
+                logging.info(f"⏳ {payment_type} Direct Debit payment pending for booking {booking_id}")
 
+                update_data = {
+                    'status': f'Pending {payment_type}',
+                    'tee_time': tee_time,
+                    'lead_name': lead_name,
+                    'caddie_requirements': caddie_requirements,
+                    'fb_requirements': fb_requirements,
+                    'special_requests': special_requests,
+                    'note': f"{payment_type} Direct Debit payment initiated on {event_time}\nAmount: €{amount_paid}\nStatus: Pending (clears in 3-5 business days)\nStripe Session ID: {session['id']}"
+                }
+
+                if update_booking_in_db(booking_id, update_data):
+                    logging.info(f"✅ Updated booking {booking_id} to Pending {payment_type} status")
+
+                    # Send "pending confirmation" email
+                    EMAIL_SEND_EXECUTOR.submit(send_direct_debit_pending_email, booking_id, guest_email, date, tee_time, players, amount_paid, payment_type)
                 else:
                     logging.error(f"❌ Failed to update booking {booking_id}")
 
-        # Handle Direct Debit payment clearing (3-5 days after checkout)
-        elif event['type'] == 'charge.succeeded':
-            charge = event['data']['object']
-            payment_method_details = charge.get('payment_method_details', {})
-            payment_method_type = payment_method_details.get('type')
-
-            # Only process if this is a Direct Debit payment (BACS or SEPA)
-            if payment_method_type in ['bacs_debit', 'sepa_debit']:
-                payment_type = 'SEPA' if payment_method_type == 'sepa_debit' else 'BACS'
-
-                # Get the payment intent to access metadata
-                payment_intent_id = charge.get('payment_intent')
-
-                if payment_intent_id:
-                    try:
-                        # Retrieve payment intent which has our booking metadata
-                        payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
-
-                        # Extract booking details from payment intent metadata
-                        booking_id = payment_intent.metadata.get('booking_id')
-                        date = payment_intent.metadata.get('date')
-                        tee_time = payment_intent.metadata.get('tee_time')
-                        players = payment_intent.metadata.get('players')
-                        amount_paid = charge['amount'] / 100
-
-                        # Extract booking form data from payment intent metadata
-                        lead_name = payment_intent.metadata.get('lead_name', '')
-                        caddie_requirements = payment_intent.metadata.get('caddie_requirements', '')
-                        fb_requirements = payment_intent.metadata.get('fb_requirements', '')
-                        special_requests = payment_intent.metadata.get('special_requests', '')
-
-                        if booking_id:
-                            logging.info(f"✅ {payment_type} Direct Debit payment cleared for booking {booking_id}")
-
-                            # Get customer email from charge
-                            receipt_email = charge.get('receipt_email') or charge.get('billing_details', {}).get('email')
-
-                            # Update booking to "Confirmed" status with booking form data
-                            update_data = {
-                                'status': 'Confirmed',
-                                'lead_name': lead_name,
-                                'caddie_requirements': caddie_requirements,
-                                'fb_requirements': fb_requirements,
-                                'special_requests': special_requests,
-                                'note': f"{payment_type} Direct Debit payment cleared on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\nAmount paid: €{amount_paid}\nStripe Charge ID: {charge['id']}"
-                            }
-
-                            if update_booking_in_db(booking_id, update_data):
-                                logging.info(f"✅ Updated booking {booking_id} to Confirmed status ({payment_type} cleared)")
-
-                                # Send final confirmation email if we have customer email
-                                if receipt_email:
-                                    Thread(
-                                        target=send_direct_debit_confirmed_email,
-                                        args=(booking_id, receipt_email, date, tee_time, players, amount_paid, payment_type)
-                                    ).start()
-                                else:
-                                    logging.warning(f"⚠️ No customer email found for {payment_type} confirmation (booking {booking_id})")
+        else:
+            # Card payment: Instant confirmation
+            logging.info(f"✅ Card payment confirmed for booking {booking_id}")
+
+            update_data = {
+                'status': 'Confirmed',
+                'tee_time': tee_time,  # Save the tee time to database
+                'lead_name': lead_name,
+                'caddie_requirements': caddie_requirements,
+                'fb_requirements': fb_requirements,
+                'special_requests': special_requests,
+                'note': f"Payment confirmed via Stripe (Card) on {event_time}\nAmount paid: €{amount_paid}\nStripe Session ID: {session['id']}"
+            }
+
+            if update_booking_in_db(booking_id, update_data):
+                logging.info(f"✅ Updated booking {booking_id} to Confirmed status")
+
+                # Send confirmation email in background
+                EMAIL_SEND_EXECUTOR.submit(send_payment_confirmation_email, booking_id, guest_email, date, tee_time, players, amount_paid)
+
+            else:
+                logging.error(f"❌ Failed to update booking {booking_id}")
+
+    # Handle Direct Debit payment clearing (3-5 days after checkout)
+    elif event['type'] == 'charge.succeeded':
+        charge = event['data']['object']
+        payment_method_details = charge.get('payment_method_details', {})
+        payment_method_type = payment_method_details.get('type')
+
+        # Only process if this is a Direct Debit payment (BACS or SEPA)
+        payment_type = DIRECT_DEBIT_PAYMENT_TYPES.get(payment_method_type)
+        if payment_type:
+
+            # Get the payment intent to access metadata
+            payment_intent_id = charge.get('payment_intent')
+
+            if payment_intent_id:
+                try:
+                    # Booking metadata (payment_intent_data.metadata) is copied onto the
+                    # charge - only fetch the payment intent if it's missing there
+                    metadata = charge.get('metadata') or {}
+                    if not metadata.get('booking_id'):
+                        metadata = stripe.PaymentIntent.retrieve(payment_intent_id).metadata
+
+                    # Extract booking details from payment intent metadata
+                    booking_id = metadata.get('booking_id')
+                    date = metadata.get('date')
+                    tee_time = metadata.get('tee_time')
+                    players = metadata.get('players')
+                    amount_paid = charge['amount'] / 100
+
+                    # Extract booking form data from payment intent metadata
+                    lead_name = metadata.get('lead_name', '')
+                    caddie_requirements = metadata.get('caddie_requirements', '')
+                    fb_requirements = metadata.get('fb_requirements', '')
+                    special_requests = metadata.get('special_requests', '')
+
+                    if booking_id:
+                        logging.info(f"✅ {payment_type} Direct Debit payment cleared for booking {booking_id}")
+
+                        # Get customer email from charge
+                        receipt_email = charge.get('receipt_email') or charge.get('billing_details', {}).get('email')
+
+                        # Update booking to "Confirmed" status with booking form data
+                        update_data = {
+                            'status': 'Confirmed',
+                            'lead_name': lead_name,
+                            'caddie_requirements': caddie_requirements,
+                            'fb_requirements': fb_requirements,
+                            'special_requests': special_requests,
+                            'note': f"{payment_type} Direct Debit payment cleared on {event_time}\nAmount paid: €{amount_paid}\nStripe Charge ID: {charge['id']}"
+                        }
+
+                        if update_booking_in_db(booking_id, update_data):
+                            logging.info(f"✅ Updated booking {booking_id} to Confirmed status ({payment_type} cleared)")
+
+                            # Send final confirmation email if we have customer email
+                            if receipt_email:
+                                EMAIL_SEND_EXECUTOR.submit(send_direct_debit_confirmed_email, booking_id, receipt_email, date, tee_time, players, amount_paid, payment_type)
                             else:
-                                logging.error(f"❌ Failed to update booking {booking_id} after {payment_type} clearing")
+                                logging.warning(f"⚠️ No customer email found for {payment_type} confirmation (booking {booking_id})")
                         else:
-                            logging.warning(f"⚠️ No booking_id found in payment intent metadata for charge {charge['id']}")
-                    except Exception as e:
-                        logging.error(f"❌ Error processing {payment_type} clearing: {str(e)}")
-
-        # Handle failed charges (optional)
-        elif event['type'] == 'charge.failed':
-            charge = event['data']['object']
-            payment_method_details = charge.get('payment_method_details', {})
-            payment_method_type = payment_method_details.get('type')
-
-            if payment_method_type in ['bacs_debit', 'sepa_debit']:
-                payment_type = 'SEPA' if payment_method_type == 'sepa_debit' else 'BACS'
-                logging.warning(f"⚠️ {payment_type} Direct Debit payment failed: {charge.get('id')}")
-
-        return jsonify({'status': 'success'}), 200
-
-    except ValueError as e:
-        logging.error(f"❌ Invalid Stripe webhook payload: {str(e)}")
-        return jsonify({'error': 'Invalid payload'}), 400
-    except stripe.error.SignatureVerificationError as e:
-        logging.error(f"❌ Invalid Stripe webhook signature: {str(e)}")
-        return jsonify({'error': 'Invalid signature'}), 400
-    except Exception as e:
-        logging.error(f"❌ Error processing Stripe webhook: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+                            logging.error(f"❌ Failed to update booking {booking_id} after {payment_type} clearing")
+                    else:
+                        logging.warning(f"⚠️ No booking_id found in payment intent metadata for charge {charge['id']}")
+                except Exception as e:
+                    logging.error(f"❌ Error processing {payment_type} clearing: {str(e)}")
 
+    # Handle failed charges (optional)
+    elif event['type'] == 'charge.failed':
+        charge = event['data']['object']
+        payment_method_details = charge.get('payment_method_details', {})
+        payment_method_type = payment_method_details.get('type')
 
-@app.route('/booking-success', methods=['GET'])
-def booking_success():
-    """
-    Success page after Stripe payment completion
-    Shows confirmation message and booking details
-    """
-    booking_id = request.args.get('booking_id', 'Unknown')
+        payment_type = DIRECT_DEBIT_PAYMENT_TYPES.get(payment_method_type)
+        if payment_type:
+            logging.warning(f"⚠️ {payment_type} Direct Debit payment failed: {charge.get('id')}")
 
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Booking Confirmed - {FROM_NAME}</title>
-        <style>
-            body {{
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                margin: 0;
-                padding: 20px;
-                min-height: 100vh;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-            }}
-            .container {{
-                background: white;
-                border-radius: 16px;
-                box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-                max-width: 600px;
-                padding: 50px 40px;
-                text-align: center;
-            }}
-            .success-icon {{
-                width: 80px;
-                height: 80px;
-                background: linear-gradient(135deg, #10b981 0%, #059669 100%);
-                border-radius: 50%;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                margin: 0 auto 30px;
-                animation: scaleIn 0.5s ease-out;
-            }}
-            @keyframes scaleIn {{
-                from {{ transform: scale(0); }}
-                to {{ transform: scale(1); }}
-            }}
-            .checkmark {{
-                color: white;
-                font-size: 48px;
-                font-weight: bold;
-            }}
-            h1 {{
-                color: #1f2937;
-                margin: 0 0 15px 0;
-                font-size: 32px;
-            }}
-            p {{
-                color: #6b7280;
-                font-size: 16px;
-                line-height: 1.6;
-                margin: 0 0 30px 0;
-            }}
-            .booking-id {{
-                background: #f3f4f6;
-                border-radius: 8px;
-                padding: 20px;
-                margin: 30px 0;
-            }}
-            .booking-id strong {{
-                color: #1f2937;
-                font-size: 18px;
-            }}
-            .booking-id code {{
-                display: block;
-                font-size: 20px;
-                color: #667eea;
-                font-weight: bold;
-                margin-top: 10px;
-                font-family: 'Courier New', monospace;
-            }}
-            .info-box {{
-                background: #eff6ff;
-                border-left: 4px solid #3b82f6;
-                border-radius: 8px;
-                padding: 20px;
-                text-align: left;
-                margin: 20px 0;
-            }}
-            .info-box h3 {{
-                margin: 0 0 15px 0;
-                color: #1f2937;
-                font-size: 18px;
-            }}
-            .info-box ul {{
-                margin: 0;
-                padding-left: 20px;
-            }}
-            .info-box li {{
-                margin: 8px 0;
-                color: #374151;
-            }}
-            .button {{
-                display: inline-block;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                text-decoration: none;
-                padding: 14px 32px;
-                border-radius: 8px;
-                font-weight: 600;
-                margin-top: 20px;
-                transition: transform 0.2s;
-            }}
-            .button:hover {{
-                transform: translateY(-2px);
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="success-icon">
-                <div class="checkmark">✓</div>
-            </div>
 
-            <h1>Payment Confirmed!</h1>
-            <p>Thank you for your booking. Your payment has been successfully processed.</p>
+def stripe_event_worker():
+    """Consume verified Stripe events from stripe_event_queue forever"""
+    while True:
+        event = stripe_event_queue.get()
+        event_id = event.get('id')
+        try:
+            if not claim_stripe_event(event_id):
+                logging.info(f"⏭️  Stripe event {event_id} already claimed - skipping")
+                continue
+            process_stripe_event(event)
+            finish_stripe_event(event_id, 'processed')
+        except Exception as e:
+            logging.error(f"❌ Error processing Stripe webhook {event.get('type')}: {str(e)}")
+            finish_stripe_event(event_id, 'failed')
+        finally:
+            stripe_event_queue.task_done()
 
-            <div class="booking-id">
-                <strong>Your Booking Reference:</strong>
-                <code>{booking_id}</code>
-            </div>
 
-            <div class="info-box">
-                <h3>📧 What's Next?</h3>
-                <ul>
-                    <li>Check your email for confirmation details</li>
-                    <li>Save your booking reference for your records</li>
-                    <li>Arrive 30 minutes before your tee time</li>
-                    <li>Bring this confirmation with you</li>
-                </ul>
-            </div>
+def replay_unfinished_stripe_events() -> int:
+    """
+    Re-queue journaled Stripe events a previous process acknowledged but never
+    finished. Rows are taken back to 'pending' with a fresh claimed_at in one
+    UPDATE, so workers starting together never queue the same event twice
+    """
+    conn = get_db_connection()
+    if not conn:
+        return 0
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE stripe_events
+            SET status = 'pending', claimed_at = NOW()
+            WHERE status IN ('pending', 'processing')
+            AND claimed_at < NOW() - make_interval(secs => %s)
+            RETURNING payload
+        """, (STRIPE_EVENT_REPLAY_AGE_SECONDS,))
+        events = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+        cursor.close()
+    except Exception as e:
+        logging.error(f"❌ Could not replay unfinished Stripe events: {e}")
+        conn.rollback()
+        return 0
+    finally:
+        release_db_connection(conn)
 
-            <p style="margin-top: 30px; font-size: 14px;">
-                If you have any questions, please reply to your confirmation email.
-            </p>
+    for event in events:
+        stripe_event_queue.put(event)
+    if events:
+        logging.warning(f"🔁 Replaying {len(events)} unfinished Stripe event(s)")
+    return len(events)
 
-            <a href="https://theisland.ie" class="button">Return to Homepage</a>
-        </div>
-    </body>
-    </html>
+
+def drain_stripe_event_queue(timeout: float = STRIPE_EVENT_DRAIN_SECONDS) -> bool:
     """
+    Wait up to timeout seconds for queued Stripe events to be processed -
+    called from gunicorn's worker_exit hook. Anything still queued remains
+    unfinished in stripe_events and is replayed by the next process
+    """
+    with stripe_event_queue.all_tasks_done:
+        drained = stripe_event_queue.all_tasks_done.wait_for(
+            lambda: not stripe_event_queue.unfinished_tasks, timeout
+        )
+    if not drained:
+        logging.warning(f"⚠️  {stripe_event_queue.unfinished_tasks} Stripe event(s) still queued at shutdown - "
+                        f"left for replay")
+    return drained
 
-    return html
 
+STRIPE_WEBHOOK_PATH = '/webhook/stripe'
 
-@app.route('/booking-cancelled', methods=['GET'])
-def booking_cancelled():
+
+def stripe_signature_middleware(wsgi_app):
     """
-    Cancellation page when user cancels Stripe payment
+    WSGI middleware for Stripe webhook deliveries
+
+    Verifies the Stripe-Signature header and parses the payload before Flask
+    builds a request, so forged or malformed POSTs are rejected with a 400
+    without routing. The parsed event is passed on as environ['stripe.event']
     """
-    booking_id = request.args.get('booking_id', 'Unknown')
+    def middleware(environ, start_response):
+        if environ.get('PATH_INFO') != STRIPE_WEBHOOK_PATH or environ.get('REQUEST_METHOD') != 'POST':
+            return wsgi_app(environ, start_response)
 
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Booking Cancelled - {FROM_NAME}</title>
-        <style>
-            body {{
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-                background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%);
-                margin: 0;
-                padding: 20px;
-                min-height: 100vh;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-            }}
-            .container {{
-                background: white;
-                border-radius: 16px;
-                box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-                max-width: 600px;
-                padding: 50px 40px;
-                text-align: center;
-            }}
-            .icon {{
-                width: 80px;
-                height: 80px;
-                background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%);
-                border-radius: 50%;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                margin: 0 auto 30px;
-            }}
-            .icon-text {{
-                color: white;
-                font-size: 48px;
-            }}
-            h1 {{
-                color: #1f2937;
-                margin: 0 0 15px 0;
-                font-size: 32px;
-            }}
-            p {{
-                color: #6b7280;
-                font-size: 16px;
-                line-height: 1.6;
-                margin: 0 0 30px 0;
-            }}
-            .info-box {{
-                background: #fef3c7;
-                border-left: 4px solid #f59e0b;
-                border-radius: 8px;
-                padding: 20px;
-                text-align: left;
-                margin: 20px 0;
-            }}
-            .info-box p {{
-                margin: 8px 0;
-                color: #374151;
-            }}
-            .button {{
-                display: inline-block;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                text-decoration: none;
-                padding: 14px 32px;
-                border-radius: 8px;
-                font-weight: 600;
-                margin: 10px;
-                transition: transform 0.2s;
-            }}
-            .button:hover {{
-                transform: translateY(-2px);
-            }}
-            .button-secondary {{
-                background: linear-gradient(135deg, #6b7280 0%, #4b5563 100%);
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="icon">
-                <div class="icon-text">⚠</div>
-            </div>
+        try:
+            content_length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        payload = environ['wsgi.input'].read(content_length) if content_length > 0 else b''
 
-            <h1>Booking Cancelled</h1>
-            <p>Your payment was cancelled and no charges were made to your card.</p>
+        try:
+            if STRIPE_WEBHOOK_SECRET:
+                # Verify webhook signature only - the event is handled as plain JSON,
+                # so there's no need to hydrate a full stripe.Event object
+                stripe.WebhookSignature.verify_header(
+                    payload.decode('utf-8'), environ.get('HTTP_STRIPE_SIGNATURE'),
+                    STRIPE_WEBHOOK_SECRET, stripe.Webhook.DEFAULT_TOLERANCE
+                )
+            # else: no signature verification (not recommended for production)
 
-            <div class="info-box">
-                <p><strong>📋 What happened?</strong></p>
-                <p>You clicked the back button or closed the payment page before completing your booking.</p>
-                <p style="margin-top: 15px;"><strong>💡 Want to try again?</strong></p>
-                <p>Check your email for available tee times and click "Book Now" to complete your booking.</p>
-            </div>
+            event = fast_json_loads(payload)
+            if not isinstance(event, dict):
+                raise ValueError("Stripe event payload is not a JSON object")
 
-            <p style="margin-top: 30px;">
-                If you're experiencing issues or have questions, please reply to your inquiry email and we'll be happy to help.
-            </p>
+        except ValueError as e:
+            logging.error(f"❌ Invalid Stripe webhook payload: {str(e)}")
+            return json_response({'error': 'Invalid payload'}, 400)(environ, start_response)
+        except stripe.error.SignatureVerificationError as e:
+            logging.error(f"❌ Invalid Stripe webhook signature: {str(e)}")
+            return json_response({'error': 'Invalid signature'}, 400)(environ, start_response)
 
-            <div style="margin-top: 30px;">
-                <a href="mailto:{CLUB_BOOKING_EMAIL}" class="button">Contact Us</a>
-                <a href="https://theisland.ie" class="button button-secondary">Return to Homepage</a>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+        # The body has been consumed - hand Flask a fresh stream alongside the event
+        environ['wsgi.input'] = io.BytesIO(payload)
+        environ['CONTENT_LENGTH'] = str(len(payload))
+        environ['stripe.event'] = event
+
+        return wsgi_app(environ, start_response)
 
-    return html
+    return middleware
 
 
-def send_payment_confirmation_email(booking_id: str, guest_email: str, date: str, tee_time: str, players: int, amount_paid: float):
+@app.route(STRIPE_WEBHOOK_PATH, methods=['POST'])
+def stripe_webhook():
     """
-    Send confirmation email after successful payment
+    Handle Stripe webhook events
+    Primary event: checkout.session.completed
+
+    The signature is checked by stripe_signature_middleware before the request
+    reaches Flask. This only journals (dedupes) and enqueues the event;
+    process_stripe_event() does the work on the event worker so Stripe gets
+    its 200 straight away
     """
     try:
-        # Format tee time display
-        tee_time_display = f" at {tee_time}" if tee_time else ""
+        event = request.environ['stripe.event']
 
-        # Create email body
-        subject = f"✅ Payment Confirmed - Booking {booking_id}"
+        if event.get('type') not in HANDLED_STRIPE_EVENT_TYPES:
+            return json_response({'status': 'ignored'}, 200)
 
-        html_body = f"""
-        {get_email_header()}
+        logging.info(f"📨 Received Stripe webhook: {event['type']}")
 
-        <div style="max-width: 600px; margin: 0 auto; background: white; padding: 40px 30px;">
-            <div style="text-align: center; margin-bottom: 30px;">
-                <div style="display: inline-block; background: linear-gradient(135deg, #10b981 0%, #059669 100%);
-                            color: white; padding: 15px 30px; border-radius: 50px; font-size: 24px; font-weight: bold;">
-                    ✅ Payment Confirmed!
-                </div>
-            </div>
+        event_id = event.get('id')
+        recorded = record_stripe_event(event_id, event['type'], request.get_data(as_text=True)) if event_id else None
+        if recorded is None:
+            # No database (or no event ID) - fall back to this worker's in-memory dedup
+            recorded = accept_stripe_event_id(event_id)
+        if not recorded:
+            logging.warning(f"⚠️  Duplicate Stripe event {event_id} - skipping")
+            return json_response({'status': 'duplicate'}, 200)
 
-            <h2 style="color: {BRAND_COLORS['navy_primary']}; margin-bottom: 20px;">Thank you for your payment!</h2>
+        # Acknowledge immediately - DB updates and emails run on the event worker
+        stripe_event_queue.put(event)
 
-            <p>We're delighted to confirm that your payment has been received and your booking is now confirmed.</p>
+        return json_response({'status': 'queued'}, 200)
 
-            <div style="background: linear-gradient(to right, #f0fdf4 0%, #dcfce7 100%);
-                        border-left: 4px solid #10b981; padding: 20px; border-radius: 8px; margin: 30px 0;">
-                <h3 style="margin: 0 0 15px 0; color: {BRAND_COLORS['navy_primary']};"><strong>📅 Booking Details</strong></h3>
-                <p style="margin: 5px 0;"><strong>Booking ID:</strong> {booking_id}</p>
-                <p style="margin: 5px 0;"><strong>Date:</strong> {date}{tee_time_display}</p>
-                <p style="margin: 5px 0;"><strong>Players:</strong> {players}</p>
-                <p style="margin: 5px 0;"><strong>Amount Paid:</strong> €{amount_paid:.2f}</p>
-            </div>
+    except Exception as e:
+        logging.error(f"❌ Error processing Stripe webhook: {str(e)}")
+        return json_response({'error': str(e)}, 500)
+
+
+app.wsgi_app = stripe_signature_middleware(app.wsgi_app)
+
+
+# Payment result pages are static apart from the booking reference, so render
+# them once at import and splice the (escaped) reference in per request
+_BOOKING_REF_PLACEHOLDER = '\x00booking_id\x00'
+
+BOOKING_SUCCESS_PAGE_HEAD, BOOKING_SUCCESS_PAGE_TAIL = f"""
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Booking Confirmed - {FROM_NAME}</title>
+    <style>
+        body {{
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            margin: 0;
+            padding: 20px;
+            min-height: 100vh;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+        }}
+        .container {{
+            background: white;
+            border-radius: 16px;
+            box-shadow: 0 20px 60px rgba(0,0,0,0.3);
+            max-width: 600px;
+            padding: 50px 40px;
+            text-align: center;
+        }}
+        .success-icon {{
+            width: 80px;
+            height: 80px;
+            background: linear-gradient(135deg, #10b981 0%, #059669 100%);
+            border-radius: 50%;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            margin: 0 auto 30px;
+            animation: scaleIn 0.5s ease-out;
+        }}
+        @keyframes scaleIn {{
+            from {{ transform: scale(0); }}
+            to {{ transform: scale(1); }}
+        }}
+        .checkmark {{
+            color: white;
+            font-size: 48px;
+            font-weight: bold;
+        }}
+        h1 {{
+            color: #1f2937;
+            margin: 0 0 15px 0;
+            font-size: 32px;
+        }}
+        p {{
+            color: #6b7280;
+            font-size: 16px;
+            line-height: 1.6;
+            margin: 0 0 30px 0;
+        }}
+        .booking-id {{
+            background: #f3f4f6;
+            border-radius: 8px;
+            padding: 20px;
+            margin: 30px 0;
+        }}
+        .booking-id strong {{
+            color: #1f2937;
+            font-size: 18px;
+        }}
+        .booking-id code {{
+            display: block;
+            font-size: 20px;
+            color: #667eea;
+            font-weight: bold;
+            margin-top: 10px;
+            font-family: 'Courier New', monospace;
+        }}
+        .info-box {{
+            background: #eff6ff;
+            border-left: 4px solid #3b82f6;
+            border-radius: 8px;
+            padding: 20px;
+            text-align: left;
+            margin: 20px 0;
+        }}
+        .info-box h3 {{
+            margin: 0 0 15px 0;
+            color: #1f2937;
+            font-size: 18px;
+        }}
+        .info-box ul {{
+            margin: 0;
+            padding-left: 20px;
+        }}
+        .info-box li {{
+            margin: 8px 0;
+            color: #374151;
+        }}
+        .button {{
+            display: inline-block;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            text-decoration: none;
+            padding: 14px 32px;
+            border-radius: 8px;
+            font-weight: 600;
+            margin-top: 20px;
+            transition: transform 0.2s;
+        }}
+        .button:hover {{
+            transform: translateY(-2px);
+        }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="success-icon">
+            <div class="checkmark">✓</div>
+        </div>
 
-            <div style="background: linear-gradient(to right, #eff6ff 0%, #dbeafe 100%);
-                        border-left: 4px solid {BRAND_COLORS['royal_blue']};
-                        padding: 20px; border-radius: 8px; margin: 30px 0;">
-                <h3 style="margin: 0 0 15px 0; color: {BRAND_COLORS['navy_primary']};"><strong>📋 What's Next?</strong></h3>
-                <ul style="margin: 10px 0; padding-left: 20px;">
-                    <li style="margin: 8px 0;">You'll receive a detailed confirmation email with all the information you need</li>
-                    <li style="margin: 8px 0;">Please arrive 30 minutes before your tee time</li>
-                    <li style="margin: 8px 0;">Bring your booking confirmation (this email)</li>
-                    <li style="margin: 8px 0;">Don't forget your golf clubs and suitable attire</li>
-                </ul>
-            </div>
+        <h1>Payment Confirmed!</h1>
+        <p>Thank you for your booking. Your payment has been successfully processed.</p>
 
-            <div style="background: linear-gradient(to right, #fef3c7 0%, #fde68a 100%);
-                        border-left: 4px solid {BRAND_COLORS['gold_accent']};
-                        padding: 20px; border-radius: 8px; margin: 30px 0;">
-                <h3 style="margin: 0 0 15px 0; color: {BRAND_COLORS['navy_primary']};"><strong>ℹ️ Important Information</strong></h3>
-                <p style="margin: 5px 0;">If you need to modify or cancel your booking, please contact us as soon as possible.</p>
-                <p style="margin: 5px 0;">Our cancellation policy: Cancellations must be made at least 48 hours in advance for a full refund.</p>
-            </div>
+        <div class="booking-id">
+            <strong>Your Booking Reference:</strong>
+            <code>{_BOOKING_REF_PLACEHOLDER}</code>
+        </div>
+
+        <div class="info-box">
+            <h3>📧 What's Next?</h3>
+            <ul>
+                <li>Check your email for confirmation details</li>
+                <li>Save your booking reference for your records</li>
+                <li>Arrive 30 minutes before your tee time</li>
+                <li>Bring this confirmation with you</li>
+            </ul>
+        </div>
 
-            <p style="margin-top: 30px;">We look forward to welcoming you to {FROM_NAME}!</p>
+        <p style="margin-top: 30px; font-size: 14px;">
+            If you have any questions, please reply to your confirmation email.
+        </p>
 
-            <p style="margin-top: 20px;">If you have any questions, please don't hesitate to reply to this email.</p>
+        <a href="https://theisland.ie" class="button">Return to Homepage</a>
+    </div>
+</body>
+</html>
+""".split(_BOOKING_REF_PLACEHOLDER)
+
+BOOKING_CANCELLED_PAGE = f"""
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Booking Cancelled - {FROM_NAME}</title>
+    <style>
+        body {{
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
+            background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%);
+            margin: 0;
+            padding: 20px;
+            min-height: 100vh;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+        }}
+        .container {{
+            background: white;
+            border-radius: 16px;
+            box-shadow: 0 20px 60px rgba(0,0,0,0.3);
+            max-width: 600px;
+            padding: 50px 40px;
+            text-align: center;
+        }}
+        .icon {{
+            width: 80px;
+            height: 80px;
+            background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%);
+            border-radius: 50%;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            margin: 0 auto 30px;
+        }}
+        .icon-text {{
+            color: white;
+            font-size: 48px;
+        }}
+        h1 {{
+            color: #1f2937;
+            margin: 0 0 15px 0;
+            font-size: 32px;
+        }}
+        p {{
+            color: #6b7280;
+            font-size: 16px;
+            line-height: 1.6;
+            margin: 0 0 30px 0;
+        }}
+        .info-box {{
+            background: #fef3c7;
+            border-left: 4px solid #f59e0b;
+            border-radius: 8px;
+            padding: 20px;
+            text-align: left;
+            margin: 20px 0;
+        }}
+        .info-box p {{
+            margin: 8px 0;
+            color: #374151;
+        }}
+        .button {{
+            display: inline-block;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            text-decoration: none;
+            padding: 14px 32px;
+            border-radius: 8px;
+            font-weight: 600;
+            margin: 10px;
+            transition: transform 0.2s;
+        }}
+        .button:hover {{
+            transform: translateY(-2px);
+        }}
+        .button-secondary {{
+            background: linear-gradient(135deg, #6b7280 0%, #4b5563 100%);
+        }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="icon">
+            <div class="icon-text">⚠</div>
         </div>
 
-        {get_email_footer()}
-        """
+        <h1>Booking Cancelled</h1>
+        <p>Your payment was cancelled and no charges were made to your card.</p>
 
-        # Send email
-        if send_email_sendgrid(guest_email, subject, html_body):
-            logging.info(f"✅ Sent payment confirmation email to {guest_email}")
-        else:
-            logging.error(f"❌ Failed to send payment confirmation email to {guest_email}")
+        <div class="info-box">
+            <p><strong>📋 What happened?</strong></p>
+            <p>You clicked the back button or closed the payment page before completing your booking.</p>
+            <p style="margin-top: 15px;"><strong>💡 Want to try again?</strong></p>
+            <p>Check your email for available tee times and click "Book Now" to complete your booking.</p>
+        </div>
 
-    except Exception as e:
-        logging.error(f"❌ Error sending payment confirmation email: {str(e)}")
+        <p style="margin-top: 30px;">
+            If you're experiencing issues or have questions, please reply to your inquiry email and we'll be happy to help.
+        </p>
 
+        <div style="margin-top: 30px;">
+            <a href="mailto:{CLUB_BOOKING_EMAIL}" class="button">Contact Us</a>
+            <a href="https://theisland.ie" class="button button-secondary">Return to Homepage</a>
+        </div>
+    </div>
+</body>
+</html>
+"""
 
-def send_direct_debit_pending_email(booking_id: str, guest_email: str, date: str, tee_time: str, players: int, amount: float, payment_type: str = 'SEPA'):
-    """
-    Send email for Direct Debit pending confirmation
-    Direct Debit payments (BACS/SEPA) take 3-5 business days to clear
+PAYMENT_PAGE_HEADERS = {
+    'Content-Type': 'text/html; charset=utf-8',
+    'Cache-Control': 'public, max-age=300',
+    'Vary': 'Accept-Encoding',
+}
 
-    Args:
-        payment_type: Either 'BACS' (UK) or 'SEPA' (Europe)
-    """
-    try:
-        # Format tee time display
-        tee_time_display = f" at {tee_time}" if tee_time else ""
+GZIP_PAYMENT_PAGE_HEADERS = {**PAYMENT_PAGE_HEADERS, 'Content-Encoding': 'gzip'}
 
-        # Payment method description
-        payment_desc = "UK bank transfer" if payment_type == 'BACS' else "European bank transfer"
+# The cancel page never changes, so compress it once at import
+BOOKING_CANCELLED_PAGE_GZ = gzip.compress(BOOKING_CANCELLED_PAGE.encode('utf-8'), compresslevel=9)
 
-        # Create email body
-        subject = f"⏳ Booking Request Received - {booking_id}"
+# Likewise the success page around the booking reference. Per request only the
+# escaped reference is compressed, as its own gzip member - concatenated members
+# decode as a single stream (RFC 1952)
+BOOKING_SUCCESS_PAGE_HEAD_GZ = gzip.compress(BOOKING_SUCCESS_PAGE_HEAD.encode('utf-8'), compresslevel=9)
+BOOKING_SUCCESS_PAGE_TAIL_GZ = gzip.compress(BOOKING_SUCCESS_PAGE_TAIL.encode('utf-8'), compresslevel=9)
 
-        html_body = f"""
-        {get_email_header()}
 
-        <div style="max-width: 600px; margin: 0 auto; background: white; padding: 40px 30px;">
-            <div style="text-align: center; margin-bottom: 30px;">
-                <div style="display: inline-block; background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%);
-                            color: white; padding: 15px 30px; border-radius: 50px; font-size: 24px; font-weight: bold;">
-                    ⏳ Payment Pending
-                </div>
-            </div>
+def payment_page_response(html: str, html_gz: bytes):
+    """Return a payment result page, as the pre-compressed html_gz when the client accepts gzip"""
+    # Quality lookup, so "gzip;q=0" counts as refused
+    if request.accept_encodings['gzip']:
+        return html_gz, 200, GZIP_PAYMENT_PAGE_HEADERS
+    return html, 200, PAYMENT_PAGE_HEADERS
 
-            <h2 style="color: {BRAND_COLORS['navy_primary']}; margin-bottom: 20px;">Thank you for your booking!</h2>
 
-            <p>We've received your booking request and your {payment_type} Direct Debit payment is being processed.</p>
+@app.route('/booking-success', methods=['GET'])
+def booking_success():
+    """
+    Success page after Stripe payment completion
+    Shows confirmation message and booking details
+    """
+    booking_id = request.args.get('booking_id', 'Unknown')
 
-            <div style="background: #fff3cd; padding: 20px; margin: 25px 0; border-left: 4px solid #ffc107; border-radius: 8px;">
-                <h3 style="margin: 0 0 10px 0; color: {BRAND_COLORS['navy_primary']};"><strong>⏳ Payment Processing</strong></h3>
-                <p style="margin: 5px 0;">Your {payment_type} Direct Debit payment is being processed. This typically takes <strong>3-5 business days</strong> to clear.</p>
-                <p style="margin: 5px 0;">We'll send you a confirmation email once your payment clears.</p>
-            </div>
+    booking_ref = escape_html(booking_id)
+    html = BOOKING_SUCCESS_PAGE_HEAD + booking_ref + BOOKING_SUCCESS_PAGE_TAIL
+    html_gz = BOOKING_SUCCESS_PAGE_HEAD_GZ + gzip.compress(booking_ref.encode('utf-8')) + BOOKING_SUCCESS_PAGE_TAIL_GZ
 
-            <div style="background: linear-gradient(to right, #f0fdf4 0%, #dcfce7 100%);
-                        border-left: 4px solid #10b981; padding: 20px; border-radius: 8px; margin: 30px 0;">
-                <h3 style="margin: 0 0 15px 0; color: {BRAND_COLORS['navy_primary']};"><strong>📅 Booking Details</strong></h3>
-                <p style="margin: 5px 0;"><strong>Booking ID:</strong> {booking_id}</p>
-                <p style="margin: 5px 0;"><strong>Date:</strong> {date}{tee_time_display}</p>
-                <p style="margin: 5px 0;"><strong>Players:</strong> {players}</p>
-                <p style="margin: 5px 0;"><strong>Amount:</strong> €{amount:.2f}</p>
-                <p style="margin: 5px 0;"><strong>Status:</strong> Pending ({payment_type} clearing)</p>
-            </div>
+    return payment_page_response(html, html_gz)
 
-            <div style="background: linear-gradient(to right, #eff6ff 0%, #dbeafe 100%);
-                        border-left: 4px solid {BRAND_COLORS['royal_blue']};
-                        padding: 20px; border-radius: 8px; margin: 30px 0;">
-                <h3 style="margin: 0 0 15px 0; color: {BRAND_COLORS['navy_primary']};"><strong>📋 What Happens Next?</strong></h3>
-                <ul style="margin: 10px 0; padding-left: 20px;">
-                    <li style="margin: 8px 0;">Your payment will clear in 3-5 business days</li>
-                    <li style="margin: 8px 0;">We'll send you a confirmation email once payment is confirmed</li>
-                    <li style="margin: 8px 0;">Your tee time is reserved pending payment confirmation</li>
-                    <li style="margin: 8px 0;">No further action is required from you</li>
-                </ul>
-            </div>
 
-            <div style="background: linear-gradient(to right, #fef3c7 0%, #fde68a 100%);
-                        border-left: 4px solid {BRAND_COLORS['gold_accent']};
-                        padding: 20px; border-radius: 8px; margin: 30px 0;">
-                <h3 style="margin: 0 0 15px 0; color: {BRAND_COLORS['navy_primary']};"><strong>ℹ️ {payment_type} Direct Debit Information</strong></h3>
-                <p style="margin: 5px 0;">{payment_type} Direct Debit is a secure and cost-effective payment method for {payment_desc}s.</p>
-                <p style="margin: 5px 0;">Your payment is protected by the Direct Debit Guarantee.</p>
-            </div>
+@app.route('/booking-cancelled', methods=['GET'])
+def booking_cancelled():
+    """
+    Cancellation page when user cancels Stripe payment
+    """
+    return payment_page_response(BOOKING_CANCELLED_PAGE, BOOKING_CANCELLED_PAGE_GZ)
+
 
-            <p style="margin-top: 30px;">Thank you for choosing {FROM_NAME}. We look forward to welcoming you!</p>
+# Post-payment emails: one shared layout (payment confirmed) plus child templates
+# overriding only the blocks that differ, compiled once by Jinja2 (header/footer
+# and brand colors are template globals)
+PAYMENT_EMAIL_BASE_TEMPLATE = """
+{{ header }}
 
-            <p style="margin-top: 20px;">If you have any questions, please don't hesitate to reply to this email.</p>
+<div style="max-width: 600px; margin: 0 auto; background: white; padding: 40px 30px;">
+    <div style="text-align: center; margin-bottom: 30px;">
+        <div style="display: inline-block; background: linear-gradient(135deg, {% block badge_colors %}#10b981 0%, #059669 100%{% endblock %});
+                    color: white; padding: 15px 30px; border-radius: 50px; font-size: 24px; font-weight: bold;">
+            {% block badge %}✅ Payment Confirmed!{% endblock %}
         </div>
+    </div>
+
+    <h2 style="color: {{ brand.navy_primary }}; margin-bottom: 20px;">{% block headline %}Thank you for your payment!{% endblock %}</h2>
+
+    <p>{% block intro %}We're delighted to confirm that your payment has been received and your booking is now confirmed.{% endblock %}</p>
+{% block notice %}{% endblock %}
+    <div style="background: linear-gradient(to right, #f0fdf4 0%, #dcfce7 100%);
+                border-left: 4px solid #10b981; padding: 20px; border-radius: 8px; margin: 30px 0;">
+        <h3 style="margin: 0 0 15px 0; color: {{ brand.navy_primary }};"><strong>{% block details_title %}📅 Booking Details{% endblock %}</strong></h3>
+        <p style="margin: 5px 0;"><strong>Booking ID:</strong> {{ booking_id }}</p>
+        <p style="margin: 5px 0;"><strong>Date:</strong> {{ when }}</p>
+        <p style="margin: 5px 0;"><strong>Players:</strong> {{ players }}</p>
+        {% block amount %}<p style="margin: 5px 0;"><strong>Amount Paid:</strong> {{ amount }}</p>{% endblock %}
+    </div>
+
+    <div style="background: linear-gradient(to right, #eff6ff 0%, #dbeafe 100%);
+                border-left: 4px solid {{ brand.royal_blue }};
+                padding: 20px; border-radius: 8px; margin: 30px 0;">
+        <h3 style="margin: 0 0 15px 0; color: {{ brand.navy_primary }};"><strong>{% block next_title %}📋 What's Next?{% endblock %}</strong></h3>
+        <ul style="margin: 10px 0; padding-left: 20px;">
+            {% block next_steps %}
+            <li style="margin: 8px 0;">{% block first_step %}You'll receive a detailed confirmation email with all the information you need{% endblock %}</li>
+            <li style="margin: 8px 0;">Please arrive 30 minutes before your tee time</li>
+            <li style="margin: 8px 0;">Bring your booking confirmation (this email)</li>
+            <li style="margin: 8px 0;">Don't forget your golf clubs and suitable attire</li>
+            {% endblock %}
+        </ul>
+    </div>
+
+    <div style="background: linear-gradient(to right, #fef3c7 0%, #fde68a 100%);
+                border-left: 4px solid {{ brand.gold_accent }};
+                padding: 20px; border-radius: 8px; margin: 30px 0;">
+        {% block info %}
+        <h3 style="margin: 0 0 15px 0; color: {{ brand.navy_primary }};"><strong>ℹ️ Important Information</strong></h3>
+        <p style="margin: 5px 0;">If you need to modify or cancel your booking, please contact us as soon as possible.</p>
+        <p style="margin: 5px 0;">Our cancellation policy: Cancellations must be made at least 48 hours in advance for a full refund.</p>
+        {% endblock %}
+    </div>
+
+    <p style="margin-top: 30px;">{% block closing %}We look forward to welcoming you to {{ from_name }}!{% endblock %}</p>
+
+    <p style="margin-top: 20px;">If you have any questions, please don't hesitate to reply to this email.</p>
+</div>
+
+{{ footer }}
+"""
 
-        {get_email_footer()}
-        """
+DD_PENDING_EMAIL_TEMPLATE = """{% extends 'payment_confirmed' %}
+{% block badge_colors %}#f59e0b 0%, #d97706 100%{% endblock %}
+{% block badge %}⏳ Payment Pending{% endblock %}
+{% block headline %}Thank you for your booking!{% endblock %}
+{% block intro %}We've received your booking request and your {{ payment_type }} Direct Debit payment is being processed.{% endblock %}
+{% block notice %}
+    <div style="background: #fff3cd; padding: 20px; margin: 25px 0; border-left: 4px solid #ffc107; border-radius: 8px;">
+        <h3 style="margin: 0 0 10px 0; color: {{ brand.navy_primary }};"><strong>⏳ Payment Processing</strong></h3>
+        <p style="margin: 5px 0;">Your {{ payment_type }} Direct Debit payment is being processed. This typically takes <strong>3-5 business days</strong> to clear.</p>
+        <p style="margin: 5px 0;">We'll send you a confirmation email once your payment clears.</p>
+    </div>
+{% endblock %}
+{% block amount %}<p style="margin: 5px 0;"><strong>Amount:</strong> {{ amount }}</p>
+        <p style="margin: 5px 0;"><strong>Status:</strong> Pending ({{ payment_type }} clearing)</p>{% endblock %}
+{% block next_title %}📋 What Happens Next?{% endblock %}
+{% block next_steps %}
+            <li style="margin: 8px 0;">Your payment will clear in 3-5 business days</li>
+            <li style="margin: 8px 0;">We'll send you a confirmation email once payment is confirmed</li>
+            <li style="margin: 8px 0;">Your tee time is reserved pending payment confirmation</li>
+            <li style="margin: 8px 0;">No further action is required from you</li>
+{% endblock %}
+{% block info %}
+        <h3 style="margin: 0 0 15px 0; color: {{ brand.navy_primary }};"><strong>ℹ️ {{ payment_type }} Direct Debit Information</strong></h3>
+        <p style="margin: 5px 0;">{{ payment_type }} Direct Debit is a secure and cost-effective payment method for {{ payment_desc }}s.</p>
+        <p style="margin: 5px 0;">Your payment is protected by the Direct Debit Guarantee.</p>
+{% endblock %}
+{% block closing %}Thank you for choosing {{ from_name }}. We look forward to welcoming you!{% endblock %}
+"""
 
-        # Send email
-        if send_email_sendgrid(guest_email, subject, html_body):
-            logging.info(f"✅ Sent {payment_type} Direct Debit pending email to {guest_email}")
-        else:
-            logging.error(f"❌ Failed to send {payment_type} Direct Debit pending email to {guest_email}")
+DD_CONFIRMED_EMAIL_TEMPLATE = """{% extends 'payment_confirmed' %}
+{% block badge %}✅ {{ payment_type }} Payment Cleared!{% endblock %}
+{% block headline %}Your payment has been confirmed!{% endblock %}
+{% block intro %}Great news! Your {{ payment_type }} Direct Debit payment has cleared and your booking is now fully confirmed.{% endblock %}
+{% block details_title %}📅 Confirmed Booking Details{% endblock %}
+{% block amount %}<p style="margin: 5px 0;"><strong>Amount Paid:</strong> {{ amount }} ({{ payment_type }} Direct Debit)</p>
+        <p style="margin: 5px 0;"><strong>Status:</strong> ✅ Confirmed</p>{% endblock %}
+{% block first_step %}Your tee time is now fully confirmed{% endblock %}
+"""
 
-    except Exception as e:
-        logging.error(f"❌ Error sending {payment_type} Direct Debit pending email: {str(e)}")
+payment_email_env = jinja2.Environment(
+    loader=jinja2.DictLoader({
+        'payment_confirmed': PAYMENT_EMAIL_BASE_TEMPLATE,
+        'dd_pending': DD_PENDING_EMAIL_TEMPLATE,
+        'dd_confirmed': DD_CONFIRMED_EMAIL_TEMPLATE,
+    }),
+    autoescape=True,
+    auto_reload=False,
+    cache_size=-1,
+)
+payment_email_env.globals.update(
+    header=Markup(EMAIL_HEADER_HTML),
+    footer=Markup(EMAIL_FOOTER_HTML),
+    brand=BRAND_COLORS,
+    from_name=FROM_NAME,
+)
 
+PAYMENT_EMAIL_TEMPLATES = {
+    name: payment_email_env.get_template(name)
+    for name in ('payment_confirmed', 'dd_pending', 'dd_confirmed')
+}
 
-def send_direct_debit_confirmed_email(booking_id: str, guest_email: str, date: str, tee_time: str, players: int, amount_paid: float, payment_type: str = 'SEPA'):
+
+@lru_cache(maxsize=8)
+def payment_email_fragments(name: str, payment_type: Optional[str] = None) -> tuple:
     """
-    Send final confirmation email after Direct Debit payment clears (3-5 days after checkout)
+    Render a payment email once per (template, payment_type) with _EMAIL_FIELD
+    in place of the booking fields, split into fragments for join_email_fragments()
+    Field order: booking_id, when (date + tee time), players, amount
+    """
+    html = PAYMENT_EMAIL_TEMPLATES[name].render(
+        booking_id=Markup(_EMAIL_FIELD), when=Markup(_EMAIL_FIELD),
+        players=Markup(_EMAIL_FIELD), amount=Markup(_EMAIL_FIELD),
+        payment_type=payment_type,
+        payment_desc=DIRECT_DEBIT_DESCRIPTIONS.get(payment_type, DIRECT_DEBIT_DESCRIPTIONS['SEPA'])
+    )
+    return tuple(html.split(_EMAIL_FIELD))
 
-    Args:
-        payment_type: Either 'BACS' (UK) or 'SEPA' (Europe)
+
+@lru_cache(maxsize=8)
+def payment_email_json_fragments(name: str, payment_type: Optional[str] = None) -> tuple:
+    """payment_email_fragments() encoded once as JSON-escaped UTF-8, ready for the SendGrid payload"""
+    return tuple(json_string_bytes(fragment) for fragment in payment_email_fragments(name, payment_type))
+
+
+@lru_cache(maxsize=2048)
+def payment_email_json_tail(name: str, payment_type: Optional[str], date: str,
+                            tee_time: Optional[str], players, amount: float) -> bytes:
     """
-    try:
-        # Format tee time display
-        tee_time_display = f" at {tee_time}" if tee_time else ""
+    Encoded body after the booking ID slot (date/tee time, players, amount and the
+    rest of the markup) - shared by every booking with the same slot and price
+    """
+    when = f"{date} at {tee_time}" if tee_time else str(date)
+    values = (escape_html(when), escape_html(str(players)), format_euro(amount))
+    return join_email_fragments(
+        payment_email_json_fragments(name, payment_type)[1:],
+        tuple(json_string_bytes(value) for value in values)
+    )
 
-        # Create email body
-        subject = f"✅ Payment Confirmed ({payment_type} Cleared) - {booking_id}"
 
-        html_body = f"""
-        {get_email_header()}
+def payment_email_json(name: str, payment_type: Optional[str], booking_id: str, date: str,
+                       tee_time: Optional[str], players, amount: float) -> bytes:
+    """Pre-encoded HTML body for send_email_sendgrid() - only the booking ID is encoded per email"""
+    return b''.join((
+        payment_email_json_fragments(name, payment_type)[0],
+        json_string_bytes(escape_html(str(booking_id))),
+        payment_email_json_tail(name, payment_type, date, tee_time, players, amount),
+    ))
 
-        <div style="max-width: 600px; margin: 0 auto; background: white; padding: 40px 30px;">
-            <div style="text-align: center; margin-bottom: 30px;">
-                <div style="display: inline-block; background: linear-gradient(135deg, #10b981 0%, #059669 100%);
-                            color: white; padding: 15px 30px; border-radius: 50px; font-size: 24px; font-weight: bold;">
-                    ✅ {payment_type} Payment Cleared!
-                </div>
-            </div>
 
-            <h2 style="color: {BRAND_COLORS['navy_primary']}; margin-bottom: 20px;">Your payment has been confirmed!</h2>
+# Post-payment emails that never reached SendGrid (open breaker, no connection)
+# are retried on EMAIL_SEND_EXECUTOR, waiting a little longer before each attempt
+PAYMENT_EMAIL_MAX_ATTEMPTS = 5
+PAYMENT_EMAIL_RETRY_SECONDS = SENDGRID_BREAKER_RESET_SECONDS
 
-            <p>Great news! Your {payment_type} Direct Debit payment has cleared and your booking is now fully confirmed.</p>
 
-            <div style="background: linear-gradient(to right, #f0fdf4 0%, #dcfce7 100%);
-                        border-left: 4px solid #10b981; padding: 20px; border-radius: 8px; margin: 30px 0;">
-                <h3 style="margin: 0 0 15px 0; color: {BRAND_COLORS['navy_primary']};"><strong>📅 Confirmed Booking Details</strong></h3>
-                <p style="margin: 5px 0;"><strong>Booking ID:</strong> {booking_id}</p>
-                <p style="margin: 5px 0;"><strong>Date:</strong> {date}{tee_time_display}</p>
-                <p style="margin: 5px 0;"><strong>Players:</strong> {players}</p>
-                <p style="margin: 5px 0;"><strong>Amount Paid:</strong> €{amount_paid:.2f} ({payment_type} Direct Debit)</p>
-                <p style="margin: 5px 0;"><strong>Status:</strong> ✅ Confirmed</p>
-            </div>
+def log_email_errors(label: str):
+    """
+    Decorator for the post-payment email senders (which return the
+    send_email_sendgrid() outcome): a send that never reached SendGrid - refused
+    by the open breaker or unable to connect - is retried up to
+    PAYMENT_EMAIL_MAX_ATTEMPTS times instead of being dropped, since the customer
+    has already paid. Rejections and ambiguous failures (5xx, read timeouts) are
+    not retried, as SendGrid may have accepted the email. While the breaker is
+    open the sender isn't called at all, so the email isn't rendered.
+
+    Errors are logged rather than raised - they run on EMAIL_SEND_EXECUTOR, where
+    an exception would otherwise vanish into an unread Future. The wrapper
+    returns the first attempt's outcome. Pending retries live in memory and
+    don't survive a restart
+    """
+    def decorator(func):
+        def attempt(number: int, args: tuple, kwargs: dict) -> str:
+            if sendgrid_breaker_open():
+                logging.warning(f"🔌 SendGrid circuit open - {label} email not sent")
+                outcome = EMAIL_BREAKER_OPEN
+            else:
+                try:
+                    outcome = func(*args, **kwargs)
+                except Exception as e:
+                    logging.error(f"❌ Error sending {label} email: {str(e)}")
+                    return EMAIL_FAILED
+
+            if outcome not in EMAIL_RETRYABLE:
+                return outcome
+            if number >= PAYMENT_EMAIL_MAX_ATTEMPTS:
+                logging.error(f"❌ Giving up on {label} email after {number} attempts")
+                return outcome
+            delay = PAYMENT_EMAIL_RETRY_SECONDS * number
+            logging.warning(f"🔁 Retrying {label} email in {delay}s (attempt {number + 1}/{PAYMENT_EMAIL_MAX_ATTEMPTS})")
+            retry = Timer(delay, EMAIL_SEND_EXECUTOR.submit, (attempt, number + 1, args, kwargs))
+            retry.daemon = True
+            retry.start()
+            return outcome
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return attempt(1, args, kwargs)
+        return wrapper
+    return decorator
+
+
+@log_email_errors("payment confirmation")
+def send_payment_confirmation_email(booking_id: str, guest_email: str, date: str, tee_time: str, players: int, amount_paid: float) -> str:
+    """
+    Send confirmation email after successful payment
+    """
+    # Create email body
+    subject = f"✅ Payment Confirmed - Booking {booking_id}"
 
-            <div style="background: linear-gradient(to right, #eff6ff 0%, #dbeafe 100%);
-                        border-left: 4px solid {BRAND_COLORS['royal_blue']};
-                        padding: 20px; border-radius: 8px; margin: 30px 0;">
-                <h3 style="margin: 0 0 15px 0; color: {BRAND_COLORS['navy_primary']};"><strong>📋 What's Next?</strong></h3>
-                <ul style="margin: 10px 0; padding-left: 20px;">
-                    <li style="margin: 8px 0;">Your tee time is now fully confirmed</li>
-                    <li style="margin: 8px 0;">Please arrive 30 minutes before your tee time</li>
-                    <li style="margin: 8px 0;">Bring your booking confirmation (this email)</li>
-                    <li style="margin: 8px 0;">Don't forget your golf clubs and suitable attire</li>
-                </ul>
-            </div>
+    html_body = payment_email_json('payment_confirmed', None, booking_id, date, tee_time, players, amount_paid)
 
-            <div style="background: linear-gradient(to right, #fef3c7 0%, #fde68a 100%);
-                        border-left: 4px solid {BRAND_COLORS['gold_accent']};
-                        padding: 20px; border-radius: 8px; margin: 30px 0;">
-                <h3 style="margin: 0 0 15px 0; color: {BRAND_COLORS['navy_primary']};"><strong>ℹ️ Important Information</strong></h3>
-                <p style="margin: 5px 0;">If you need to modify or cancel your booking, please contact us as soon as possible.</p>
-                <p style="margin: 5px 0;">Our cancellation policy: Cancellations must be made at least 48 hours in advance for a full refund.</p>
-            </div>
+    # Send email
+    outcome = send_email_sendgrid(guest_email, subject, html_body)
+    if outcome == EMAIL_SENT:
+        logging.info(f"✅ Sent payment confirmation email to {guest_email}")
+    else:
+        logging.error(f"❌ Failed to send payment confirmation email to {guest_email}")
+    return outcome
 
-            <p style="margin-top: 30px;">We look forward to welcoming you to {FROM_NAME}!</p>
 
-            <p style="margin-top: 20px;">If you have any questions, please don't hesitate to reply to this email.</p>
-        </div>
+@log_email_errors("Direct Debit pending")
+def send_direct_debit_pending_email(booking_id: str, guest_email: str, date: str, tee_time: str, players: int, amount: float, payment_type: str = 'SEPA') -> str:
+    """
+    Send email for Direct Debit pending confirmation
+    Direct Debit payments (BACS/SEPA) take 3-5 business days to clear
 
-        {get_email_footer()}
-        """
+    Args:
+        payment_type: Either 'BACS' (UK) or 'SEPA' (Europe)
+    """
+    # Create email body
+    subject = f"⏳ Booking Request Received - {booking_id}"
 
-        # Send email
-        if send_email_sendgrid(guest_email, subject, html_body):
-            logging.info(f"✅ Sent {payment_type} Direct Debit confirmed email to {guest_email}")
-        else:
-            logging.error(f"❌ Failed to send {payment_type} Direct Debit confirmed email to {guest_email}")
+    html_body = payment_email_json('dd_pending', payment_type, booking_id, date, tee_time, players, amount)
 
-    except Exception as e:
-        logging.error(f"❌ Error sending {payment_type} Direct Debit confirmed email: {str(e)}")
+    # Send email
+    outcome = send_email_sendgrid(guest_email, subject, html_body)
+    if outcome == EMAIL_SENT:
+        logging.info(f"✅ Sent {payment_type} Direct Debit pending email to {guest_email}")
+    else:
+        logging.error(f"❌ Failed to send {payment_type} Direct Debit pending email to {guest_email}")
+    return outcome
+
+
+@log_email_errors("Direct Debit confirmed")
+def send_direct_debit_confirmed_email(booking_id: str, guest_email: str, date: str, tee_time: str, players: int, amount_paid: float, payment_type: str = 'SEPA') -> str:
+    """
+    Send final confirmation email after Direct Debit payment clears (3-5 days after checkout)
+
+    Args:
+        payment_type: Either 'BACS' (UK) or 'SEPA' (Europe)
+    """
+    # Create email body
+    subject = f"✅ Payment Confirmed ({payment_type} Cleared) - {booking_id}"
+
+    html_body = payment_email_json('dd_confirmed', payment_type, booking_id, date, tee_time, players, amount_paid)
+
+    # Send email
+    outcome = send_email_sendgrid(guest_email, subject, html_body)
+    if outcome == EMAIL_SENT:
+        logging.info(f"✅ Sent {payment_type} Direct Debit confirmed email to {guest_email}")
+    else:
+        logging.error(f"❌ Failed to send {payment_type} Direct Debit confirmed email to {guest_email}")
+    return outcome
 
 
 # ============================================================================
@@ -3848,12 +4876,25 @@ if init_db_pool():
     init_database()
     logging.info("✅ Database ready")
 
+Thread(target=stripe_event_worker, name='stripe-events', daemon=True).start()
+if __name__ != '__main__':
+    # Run as a script this process only execs gunicorn (below), whose workers
+    # import the module and replay for themselves
+    replay_unfinished_stripe_events()
+
 logging.info(f"📧 SendGrid: {FROM_EMAIL}")
+if not SENDGRID_API_KEY:
+    # Checked once here rather than per send - every mail/send would just 401
+    logging.error("❌ SENDGRID_API_KEY not set - outgoing emails will fail")
 logging.info(f"📬 Club Booking Email: {CLUB_BOOKING_EMAIL}")
 logging.info(f"📮 Tracking Email: {TRACKING_EMAIL_PREFIX}@bookings.teemail.io")
 logging.info(f"🏌️  Database Club ID: {DATABASE_CLUB_ID}")
 logging.info(f"🏌️  Default Course ID: {DEFAULT_COURSE_ID}")
 logging.info(f"🔗 Core API: {CORE_API_URL}")
+if RE2_AVAILABLE:
+    logging.info("🔍 Inbound email patterns: RE2 (linear-time)")
+else:
+    logging.warning("⚠️  re2 not installed - inbound email patterns use the stdlib re engine")
 if STRIPE_SECRET_KEY:
     logging.info(f"💳 Stripe: ENABLED (key: {STRIPE_SECRET_KEY[:7]}...)")
     logging.info(f"📍 Success URL: {STRIPE_SUCCESS_URL}")
@@ -3865,5 +4906,6 @@ logging.info("="*80)
 
 
 if __name__ == '__main__':
-    port = int(os.getenv('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
+    # Same as app.py (gunicorn with gunicorn.conf.py), on port 5000
+    os.environ.setdefault('PORT', '5000')
+    os.execv(sys.executable, [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')])
@@ -0,0 +1,16 @@
+-- Migration: Add stripe_events table
+-- Date: 2026-10-17
+-- Purpose: Journal verified Stripe webhook events before acknowledging them, so
+--          retries are deduplicated across workers and unprocessed events survive restarts
+
+CREATE TABLE IF NOT EXISTS stripe_events (
+    event_id VARCHAR(255) PRIMARY KEY, -- Stripe event ID; dedupes retries across workers
+    event_type VARCHAR(100) NOT NULL,
+    payload JSONB NOT NULL, -- Raw verified event payload
+    status VARCHAR(20) NOT NULL DEFAULT 'pending', -- pending, processing, processed, failed
+    received_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    claimed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    processed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_stripe_events_unfinished ON stripe_events(claimed_at) WHERE status IN ('pending', 'processing');
@@ -135,3 +135,16 @@ CREATE INDEX IF NOT EXISTS idx_guest_emails_waitlist_id ON guest_emails(waitlist
 CREATE INDEX IF NOT EXISTS idx_guest_emails_received_at ON guest_emails(received_at DESC);
 CREATE INDEX IF NOT EXISTS idx_guest_emails_email_type ON guest_emails(email_type);
 CREATE INDEX IF NOT EXISTS idx_guest_emails_processed ON guest_emails(processed);
+
+-- Journal of verified Stripe webhook events (written before the webhook answers 200)
+CREATE TABLE IF NOT EXISTS stripe_events (
+    event_id VARCHAR(255) PRIMARY KEY, -- Stripe event ID; dedupes retries across workers
+    event_type VARCHAR(100) NOT NULL,
+    payload JSONB NOT NULL, -- Raw verified event payload
+    status VARCHAR(20) NOT NULL DEFAULT 'pending', -- pending, processing, processed, failed
+    received_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    claimed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    processed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_stripe_events_unfinished ON stripe_events(claimed_at) WHERE status IN ('pending', 'processing');
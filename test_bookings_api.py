@@ -0,0 +1,141 @@
+"""
+Tests for GET /api/bookings: keyset pagination (?limit / ?before cursor
+validation and query parameters) and the short-TTL cache on the full listing
+with its write-through invalidation.
+
+No database needed - fetch_bookings_json is replaced by a recorder that
+returns canned JSON bodies.
+
+Run: pytest test_bookings_api.py
+"""
+
+import json
+from contextlib import contextmanager
+from unittest import mock
+
+import island_email_bot as bot
+
+
+@contextmanager
+def bookings_harness(body='{"success":true,"bookings":[],"count":0}', ttl=60):
+    """Record every bookings query; yields (test client, list of (sql, params))"""
+    queries = []
+
+    def fetch(sql, params):
+        queries.append((sql, params))
+        return body
+
+    with mock.patch.object(bot, 'fetch_bookings_json', fetch), \
+            mock.patch.object(bot, 'BOOKINGS_CACHE_TTL', ttl), \
+            mock.patch.dict(bot._bookings_cache, {'generation': 0, 'body_generation': -1, 'at': 0.0, 'body': None}):
+        yield bot.app.test_client(), queries
+
+
+def test_full_listing_uses_all_bookings_query():
+    with bookings_harness() as (client, queries):
+        response = client.get('/api/bookings')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert json.loads(response.data)['success'] is True
+    assert queries == [(bot.BOOKINGS_ALL_SQL, (bot.DATABASE_CLUB_ID,))]
+
+
+def test_first_page_passes_limit():
+    with bookings_harness() as (client, queries):
+        client.get('/api/bookings?limit=25')
+    assert queries == [(bot.BOOKINGS_FIRST_PAGE_SQL, (bot.DATABASE_CLUB_ID, 25, 25))]
+
+
+def test_limit_capped_at_page_max():
+    with bookings_harness() as (client, queries):
+        client.get(f'/api/bookings?limit={bot.BOOKINGS_PAGE_MAX * 10}')
+    limit = bot.BOOKINGS_PAGE_MAX
+    assert queries == [(bot.BOOKINGS_FIRST_PAGE_SQL, (bot.DATABASE_CLUB_ID, limit, limit))]
+
+
+def test_next_page_splits_cursor():
+    with bookings_harness() as (client, queries):
+        client.get('/api/bookings?limit=10&before=2026-01-02 09:00:00|ISL-20260102-ABC')
+    assert queries == [(
+        bot.BOOKINGS_NEXT_PAGE_SQL,
+        (bot.DATABASE_CLUB_ID, '2026-01-02 09:00:00', 'ISL-20260102-ABC', 10, 10),
+    )]
+
+
+def test_cursor_without_limit_uses_page_max():
+    with bookings_harness() as (client, queries):
+        client.get('/api/bookings?before=2026-01-02 09:00:00|ISL-1')
+    limit = bot.BOOKINGS_PAGE_MAX
+    assert queries == [(bot.BOOKINGS_NEXT_PAGE_SQL, (bot.DATABASE_CLUB_ID, '2026-01-02 09:00:00', 'ISL-1', limit, limit))]
+
+
+def test_next_page_sql_is_keyset_not_offset():
+    assert '(b.timestamp, b.booking_id) < (%s, %s)' in bot.BOOKINGS_NEXT_PAGE_SQL
+    assert 'OFFSET' not in bot.BOOKINGS_NEXT_PAGE_SQL.upper()
+    assert '(b.timestamp, b.booking_id) <' not in bot.BOOKINGS_FIRST_PAGE_SQL
+
+
+def test_invalid_parameters_rejected():
+    with bookings_harness() as (client, queries):
+        bad_limit = client.get('/api/bookings?limit=0')
+        bad_cursor = client.get('/api/bookings?before=not-a-cursor')
+        bad_timestamp = client.get('/api/bookings?before=garbage|ISL-1')
+        missing_id = client.get('/api/bookings?before=2026-01-02 09:00:00|')
+    assert bad_limit.status_code == 400
+    assert bad_cursor.status_code == 400
+    assert bad_timestamp.status_code == 400
+    assert json.loads(bad_timestamp.data)['error'] == 'Invalid before cursor'
+    assert missing_id.status_code == 400
+    assert queries == []
+
+
+def test_cursor_accepts_postgres_timestamp_text():
+    # timestamp::text as it comes back in next_cursor, with fractional seconds
+    with bookings_harness() as (client, queries):
+        response = client.get('/api/bookings?before=2026-01-02 09:00:00.123456|ISL-1')
+    assert response.status_code == 200
+    assert queries[0][1][1:3] == ('2026-01-02 09:00:00.123456', 'ISL-1')
+
+
+def test_no_database_answers_500():
+    with bookings_harness(body=None) as (client, queries):
+        response = client.get('/api/bookings?limit=5')
+    assert response.status_code == 500
+    assert json.loads(response.data)['error'] == 'No database connection'
+
+
+def test_full_listing_cached_within_ttl():
+    with bookings_harness() as (client, queries):
+        client.get('/api/bookings')
+        client.get('/api/bookings')
+    assert len(queries) == 1
+
+
+def test_pages_are_not_cached():
+    with bookings_harness() as (client, queries):
+        client.get('/api/bookings?limit=5')
+        client.get('/api/bookings?limit=5')
+    assert len(queries) == 2
+
+
+def test_expired_cache_requeried():
+    with bookings_harness(ttl=0) as (client, queries):
+        client.get('/api/bookings')
+        client.get('/api/bookings')
+    assert len(queries) == 2
+
+
+def test_write_invalidates_cached_listing():
+    with bookings_harness() as (client, queries):
+        client.get('/api/bookings')
+        bot.invalidate_bookings_cache()
+        client.get('/api/bookings')
+        client.get('/api/bookings')
+    assert len(queries) == 2
+
+
+def test_failed_fetch_not_cached():
+    with bookings_harness(body=None) as (client, queries):
+        client.get('/api/bookings')
+        client.get('/api/bookings')
+    assert len(queries) == 2
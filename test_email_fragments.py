@@ -0,0 +1,134 @@
+"""
+Tests for the fragment-joined email bodies: payment emails pre-encoded as
+JSON bytes, the mailto / Stripe booking links, book buttons and the inquiry
+email's per-slot rows. Each is checked against a straightforward rendering
+of the same content, and for escaping of guest-supplied values.
+
+Run: pytest test_email_fragments.py
+"""
+
+import json
+from unittest import mock
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from markupsafe import Markup
+
+import island_email_bot as bot
+
+
+def decode_json_body(body: bytes) -> str:
+    """The HTML inside a JSON-encoded string body from payment_email_json()"""
+    return json.loads(b'"' + body + b'"')
+
+
+def reference_payment_email(name, payment_type, booking_id, when, players, amount):
+    """Render the payment template directly, with the same escaped values"""
+    return bot.PAYMENT_EMAIL_TEMPLATES[name].render(
+        booking_id=Markup(bot.escape_html(booking_id)),
+        when=Markup(bot.escape_html(when)),
+        players=Markup(bot.escape_html(str(players))),
+        amount=Markup(bot.format_euro(amount)),
+        payment_type=payment_type,
+        payment_desc=bot.DIRECT_DEBIT_DESCRIPTIONS.get(payment_type, bot.DIRECT_DEBIT_DESCRIPTIONS['SEPA']),
+    )
+
+
+def test_payment_emails_match_direct_render():
+    for name, payment_type in (('payment_confirmed', None), ('dd_pending', 'BACS'), ('dd_confirmed', 'SEPA')):
+        body = bot.payment_email_json(name, payment_type, 'ISL-20260501-AB12', '2026-05-01', '09:10', 4, 1234.5)
+        expected = reference_payment_email(name, payment_type, 'ISL-20260501-AB12', '2026-05-01 at 09:10', 4, 1234.5)
+        assert decode_json_body(body) == expected, name
+
+
+def test_payment_email_without_tee_time():
+    body = bot.payment_email_json('payment_confirmed', None, 'ISL-1', '2026-05-01', None, 2, 650)
+    expected = reference_payment_email('payment_confirmed', None, 'ISL-1', '2026-05-01', 2, 650)
+    assert decode_json_body(body) == expected
+
+
+def test_payment_email_escapes_booking_id():
+    html = decode_json_body(bot.payment_email_json('payment_confirmed', None, '<script>"x"</script>', '2026-05-01', '09:10', 4, 10))
+    assert '<script>' not in html
+    assert '&lt;script&gt;' in html
+    assert '\x00' not in html
+
+
+def test_payment_email_is_valid_sendgrid_json():
+    body = bot.payment_email_json('dd_pending', 'SEPA', 'ISL-"quoted"\n', '2026-05-01', '09:10', 4, 10)
+    payload = json.loads(bot.sendgrid_mail_json('guest@example.com', 'Subject "x"', body))
+    assert payload['personalizations'] == [{'to': [{'email': 'guest@example.com'}]}]
+    assert payload['subject'] == 'Subject "x"'
+    assert payload['content'][0]['value'] == decode_json_body(body)
+
+
+def test_mailto_link_round_trips():
+    with mock.patch.object(bot, 'STRIPE_SECRET_KEY', None):
+        bot.cached_booking_link.cache_clear()
+        link = bot.build_booking_link('2026-05-01', '09:10', 3, 'guest+golf@example.com', 'ISL-1')
+
+    address, _, query = link.partition('?')
+    assert address == f"mailto:{bot.TRACKING_EMAIL_PREFIX}@bookings.teemail.io"
+    subject_part, _, body_part = query.partition('&body=')
+    assert unquote(subject_part) == 'subject=BOOKING REQUEST - 2026-05-01 at 09:10'
+    assert unquote(body_part) == (
+        "I would like to book the following tee time:\n"
+        "\n"
+        "Booking Details:\n"
+        "- Booking ID: ISL-1\n"
+        "- Date: 2026-05-01\n"
+        "- Time: 09:10\n"
+        "- Players: 3\n"
+        f"- Green Fee: €{bot.PER_PLAYER_FEE:.0f} per player\n"
+        f"- Total: €{3 * bot.PER_PLAYER_FEE:.0f}\n"
+        "\n"
+        "Guest Email: guest+golf@example.com"
+    )
+
+
+def test_mailto_link_without_booking_id():
+    with mock.patch.object(bot, 'STRIPE_SECRET_KEY', None):
+        bot.cached_booking_link.cache_clear()
+        link = bot.build_booking_link('2026-05-01', '09:10', 2, 'guest@example.com')
+    body = unquote(link.partition('&body=')[2])
+    assert 'Booking ID' not in body
+    assert '- Players: 2\n' in body
+
+
+def test_stripe_link_query_string():
+    with mock.patch.object(bot, 'STRIPE_SECRET_KEY', 'sk_test_dummy'):
+        bot.cached_booking_link.cache_clear()
+        link = bot.build_booking_link('2026-05-01', '09:10', 4, 'a&b@example.com', 'ISL-1', 'theisland')
+    bot.cached_booking_link.cache_clear()
+
+    parts = urlsplit(link)
+    assert f"{parts.scheme}://{parts.netloc}{parts.path}" == f"{bot.BOOKING_FORM_URL}/theisland/book"
+    assert parse_qs(parts.query) == {
+        'booking_id': ['ISL-1'], 'date': ['2026-05-01'], 'time': ['09:10'],
+        'players': ['4'], 'email': ['a&b@example.com'],
+    }
+
+
+def test_book_button_fills_both_slots():
+    html = bot.create_book_button('https://example.com/book?x=1', 'Book Now')
+    assert 'href="https://example.com/book?x=1"' in html
+    assert 'Book Now' in html
+    assert '\x00' not in html
+
+
+def test_inquiry_email_rows_grouped_by_date():
+    results = [
+        {'date': '2026-05-02', 'time': '10:00'},
+        {'date': '2026-05-01', 'time': '09:10'},
+        {'date': '2026-05-02', 'time': '08:30'},
+    ]
+    with mock.patch.object(bot, 'STRIPE_SECRET_KEY', None):
+        bot.cached_booking_link.cache_clear()
+        html = bot.format_inquiry_email(results, 4, 'guest@example.com', 'ISL-1')
+
+    assert '\x00' not in html
+    # Dates in order; each date's slots keep the API order
+    positions = [html.index(marker) for marker in ('🗓️ 2026-05-01', '09:10', '🗓️ 2026-05-02', '10:00', '08:30')]
+    assert positions == sorted(positions)
+    assert html.count('✓ Available') == 3
+    assert html.count('Book Now') >= 3
+    assert html.startswith(bot.EMAIL_HEADER_HTML)
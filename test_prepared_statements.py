@@ -0,0 +1,144 @@
+"""
+Tests for the server-side prepared statement cache: booking_update_statement
+name reuse, PREPARE-once-per-connection in execute_prepared, re-preparing on
+a new (reconnected) connection, and DEALLOCATE ALL after a failed transaction.
+
+No database needed - connections and cursors are recording fakes.
+
+Run: pytest test_prepared_statements.py
+"""
+
+from unittest import mock
+
+import island_email_bot as bot
+
+
+class RecordingConnection:
+    """Fake connection; every statement run through its cursors lands in .statements"""
+
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, **kwargs):
+        return RecordingCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class RecordingCursor:
+    rowcount = 1
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql, params=None):
+        self.connection.statements.append(' '.join(sql.split()))
+
+    def fetchone(self):
+        return None
+
+    def close(self):
+        pass
+
+
+def prepares(conn):
+    return [statement for statement in conn.statements if statement.startswith('PREPARE')]
+
+
+def test_same_columns_reuse_one_statement_name():
+    first = bot.booking_update_statement(['status', 'note'])
+    second = bot.booking_update_statement(['status', 'note'])
+    assert first == second
+    assert first in bot.PREPARED_STATEMENTS
+    assert bot.PREPARED_STATEMENTS[first].count('$') == 3
+
+
+def test_column_sets_and_returning_get_distinct_names():
+    names = {
+        bot.booking_update_statement(['status']),
+        bot.booking_update_statement(['status', 'note']),
+        bot.booking_update_statement(['status', 'note'], returning=True),
+    }
+    assert len(names) == 3
+    returning = bot.booking_update_statement(['status', 'note'], returning=True)
+    assert returning.endswith('_ret')
+    assert 'RETURNING' in bot.PREPARED_STATEMENTS[returning]
+    assert 'RETURNING' not in bot.PREPARED_STATEMENTS[bot.booking_update_statement(['status', 'note'])]
+
+
+def test_update_parameters_follow_column_order():
+    name = bot.booking_update_statement(['status', 'tee_time'])
+    sql = ' '.join(bot.PREPARED_STATEMENTS[name].split())
+    assert 'status = $2, tee_time = $3' in sql
+    assert 'WHERE booking_id = $1' in sql
+
+
+def test_prepare_once_per_connection():
+    conn = RecordingConnection()
+    cursor = conn.cursor()
+    bot.execute_prepared(cursor, 'booking_ins', tuple(range(13)))
+    bot.execute_prepared(cursor, 'booking_ins', tuple(range(13)))
+
+    assert len(prepares(conn)) == 1
+    assert prepares(conn)[0].startswith('PREPARE booking_ins AS INSERT INTO bookings')
+    executes = [statement for statement in conn.statements if statement.startswith('EXECUTE')]
+    assert executes == ['EXECUTE booking_ins (' + ', '.join(['%s'] * 13) + ')'] * 2
+
+
+def test_new_connection_prepares_again():
+    # A reconnect hands out a fresh server session with no prepared statements
+    name = bot.booking_update_statement(['status'])
+    old_conn, new_conn = RecordingConnection(), RecordingConnection()
+
+    bot.execute_prepared(old_conn.cursor(), name, ('ISL-1', 'Confirmed'))
+    bot.execute_prepared(new_conn.cursor(), name, ('ISL-1', 'Confirmed'))
+    bot.execute_prepared(new_conn.cursor(), name, ('ISL-2', 'Confirmed'))
+
+    assert len(prepares(old_conn)) == 1
+    assert len(prepares(new_conn)) == 1
+
+
+def test_closed_connection_is_forgotten():
+    conn = RecordingConnection()
+    bot.execute_prepared(conn.cursor(), 'booking_ins', tuple(range(13)))
+    tracked = len(bot._prepared_on_connection)
+    del conn
+    assert len(bot._prepared_on_connection) == tracked - 1
+
+
+def test_failed_transaction_deallocates_and_reprepares():
+    conn = RecordingConnection()
+    bot.execute_prepared(conn.cursor(), 'booking_ins', tuple(range(13)))
+
+    bot.forget_prepared_statements(conn)
+    assert conn.statements[-1] == 'DEALLOCATE ALL'
+    assert conn.commits == 1
+
+    bot.execute_prepared(conn.cursor(), 'booking_ins', tuple(range(13)))
+    assert len(prepares(conn)) == 2
+
+
+def test_forget_skips_connections_without_statements():
+    conn = RecordingConnection()
+    bot.forget_prepared_statements(conn)
+    bot.forget_prepared_statements(None)
+    assert conn.statements == []
+
+
+def test_update_booking_prepares_across_pool_reconnects():
+    connections = [RecordingConnection(), RecordingConnection()]
+    handed_out = iter([connections[0], connections[0], connections[1]])
+    with mock.patch.object(bot, 'get_db_connection', lambda: next(handed_out)), \
+            mock.patch.object(bot, 'release_db_connection', lambda conn: None):
+        for _ in range(3):
+            assert bot.update_booking_in_db('ISL-1', {'status': 'Confirmed', 'note': 'paid'}) is True
+
+    name = bot.booking_update_statement(['status', 'note'])
+    assert prepares(connections[0]) == [prepares(connections[1])[0]]
+    assert prepares(connections[0])[0].startswith(f'PREPARE {name} AS UPDATE bookings')
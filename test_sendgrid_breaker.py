@@ -0,0 +1,229 @@
+"""
+Tests for the SendGrid circuit breaker and the post-payment email retries:
+opening after SENDGRID_BREAKER_FAIL_MAX outage failures, 4xx not counting,
+the single half-open trial send, and log_email_errors re-sending a payment
+email only when the request never reached SendGrid.
+
+No network needed - the SendGrid session's post() is replaced by a fake.
+
+Run: pytest test_sendgrid_breaker.py
+"""
+
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+import island_email_bot as bot
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+
+class FakeSendGrid:
+    """
+    post() replacement: status is an HTTP code, None for a refused connection,
+    'timeout' for a read timeout or 'reset' for a connection dropped mid-request
+    """
+
+    def __init__(self, status=202):
+        self.status = status
+        self.calls = 0
+
+    def post(self, url, data, timeout):
+        self.calls += 1
+        if self.status is None:
+            refused = NewConnectionError(None, "Connection refused")
+            raise requests.ConnectionError(MaxRetryError(None, url, refused))
+        if self.status == 'timeout':
+            raise requests.ReadTimeout("Read timed out")
+        if self.status == 'reset':
+            raise requests.ConnectionError(ProtocolError("Connection aborted"))
+        return FakeResponse(self.status)
+
+
+@contextmanager
+def sendgrid_harness(status=202):
+    """Fresh breaker state and a fake SendGrid for the duration of a test"""
+    fake = FakeSendGrid(status)
+    with mock.patch.object(bot._sendgrid_http_session, 'post', fake.post), \
+            mock.patch.dict(bot._sendgrid_breaker, {'failures': 0, 'open_until': 0.0}):
+        yield fake
+
+
+def send():
+    return bot.send_email_sendgrid('guest@example.com', 'Subject', '<p>Hello</p>')
+
+
+def test_breaker_opens_after_consecutive_outages():
+    with sendgrid_harness(status=None) as fake:
+        for _ in range(bot.SENDGRID_BREAKER_FAIL_MAX):
+            assert send() == bot.EMAIL_UNREACHABLE
+        assert fake.calls == bot.SENDGRID_BREAKER_FAIL_MAX
+        assert bot.sendgrid_breaker_open() is True
+        assert bot.sendgrid_available() is False
+
+        # While open, sends are refused without touching SendGrid
+        assert send() == bot.EMAIL_BREAKER_OPEN
+        assert fake.calls == bot.SENDGRID_BREAKER_FAIL_MAX
+
+
+def test_client_errors_do_not_open_breaker():
+    with sendgrid_harness(status=400) as fake:
+        for _ in range(bot.SENDGRID_BREAKER_FAIL_MAX + 2):
+            assert send() == bot.EMAIL_FAILED
+        assert fake.calls == bot.SENDGRID_BREAKER_FAIL_MAX + 2
+        assert bot.sendgrid_available() is True
+
+
+def test_rate_limit_counts_as_outage():
+    with sendgrid_harness(status=429):
+        for _ in range(bot.SENDGRID_BREAKER_FAIL_MAX):
+            send()
+        assert bot.sendgrid_available() is False
+
+
+def test_success_resets_failure_count():
+    with sendgrid_harness(status=503) as fake:
+        for _ in range(bot.SENDGRID_BREAKER_FAIL_MAX - 1):
+            send()
+        fake.status = 202
+        assert send() == bot.EMAIL_SENT
+        assert bot._sendgrid_breaker['failures'] == 0
+
+
+def test_half_open_lets_one_trial_through():
+    with sendgrid_harness(status=None):
+        for _ in range(bot.SENDGRID_BREAKER_FAIL_MAX):
+            send()
+        bot._sendgrid_breaker['open_until'] = time.monotonic() - 1
+
+        # Peeking doesn't claim the trial
+        assert bot.sendgrid_breaker_open() is False
+        answers = [bot.sendgrid_available() for _ in range(5)]
+        assert answers == [True, False, False, False, False]
+        assert bot.sendgrid_breaker_open() is True
+
+
+def test_successful_trial_closes_breaker():
+    with sendgrid_harness(status=None) as fake:
+        for _ in range(bot.SENDGRID_BREAKER_FAIL_MAX):
+            send()
+        bot._sendgrid_breaker['open_until'] = time.monotonic() - 1
+        fake.status = 202
+
+        assert send() == bot.EMAIL_SENT
+        assert bot.sendgrid_available() is True
+        assert send() == bot.EMAIL_SENT
+
+
+def test_failed_trial_reopens_breaker():
+    with sendgrid_harness(status=None) as fake:
+        for _ in range(bot.SENDGRID_BREAKER_FAIL_MAX):
+            send()
+        bot._sendgrid_breaker['open_until'] = time.monotonic() - 1
+        calls = fake.calls
+
+        assert send() == bot.EMAIL_UNREACHABLE
+        assert fake.calls == calls + 1
+        assert bot.sendgrid_available() is False
+
+
+def run_sender(status_sequence, max_attempts=3):
+    """
+    Run a log_email_errors-wrapped sender against a SendGrid that answers
+    status_sequence; returns (first attempt's outcome, every attempt's outcome)
+    """
+    fake = FakeSendGrid()
+    statuses = iter(status_sequence)
+    outcomes = []
+
+    def post(url, data, timeout):
+        fake.status = next(statuses, 202)
+        return fake.post(url, data, timeout)
+
+    @bot.log_email_errors("test payment")
+    def sender():
+        sent = send()
+        outcomes.append(sent)
+        return sent
+
+    with mock.patch.object(bot._sendgrid_http_session, 'post', post), \
+            mock.patch.dict(bot._sendgrid_breaker, {'failures': 0, 'open_until': 0.0}), \
+            mock.patch.object(bot, 'PAYMENT_EMAIL_RETRY_SECONDS', 0.01), \
+            mock.patch.object(bot, 'PAYMENT_EMAIL_MAX_ATTEMPTS', max_attempts):
+        first = sender()
+        deadline = time.monotonic() + 5
+        while (len(outcomes) < max_attempts and outcomes[-1] in bot.EMAIL_RETRYABLE
+               and time.monotonic() < deadline):
+            time.sleep(0.01)
+        time.sleep(0.1)
+    return first, outcomes
+
+
+def test_payment_email_retried_until_sent():
+    unreachable, sent = bot.EMAIL_UNREACHABLE, bot.EMAIL_SENT
+    assert run_sender([None, None, 202]) == (unreachable, [unreachable, unreachable, sent])
+
+
+def test_payment_email_retries_are_bounded():
+    unreachable = bot.EMAIL_UNREACHABLE
+    assert run_sender([None] * 10, max_attempts=3) == (unreachable, [unreachable] * 3)
+
+
+def test_payment_email_sent_first_time_not_repeated():
+    assert run_sender([202]) == (bot.EMAIL_SENT, [bot.EMAIL_SENT])
+
+
+def test_possibly_delivered_email_not_retried():
+    # SendGrid may have accepted these, so a resend could duplicate the email
+    for status in (502, 503, 'timeout', 'reset'):
+        assert run_sender([status, 202]) == (bot.EMAIL_FAILED, [bot.EMAIL_FAILED]), status
+
+
+def test_rejected_email_not_retried():
+    for status in (400, 413, 429):
+        assert run_sender([status, 202]) == (bot.EMAIL_FAILED, [bot.EMAIL_FAILED]), status
+
+
+def test_payment_email_deferred_while_breaker_open():
+    outcomes = []
+
+    @bot.log_email_errors("test payment")
+    def sender():
+        sent = send()
+        outcomes.append(sent)
+        return sent
+
+    with sendgrid_harness(status=202) as fake, \
+            mock.patch.object(bot, 'PAYMENT_EMAIL_RETRY_SECONDS', 0.01), \
+            mock.patch.object(bot, 'PAYMENT_EMAIL_MAX_ATTEMPTS', 10):
+        bot._sendgrid_breaker.update(failures=bot.SENDGRID_BREAKER_FAIL_MAX, open_until=time.monotonic() + 0.03)
+        # Not rendered or sent while the breaker is open
+        assert sender() == bot.EMAIL_BREAKER_OPEN
+        assert outcomes == [] and fake.calls == 0
+
+        deadline = time.monotonic() + 5
+        while bot.EMAIL_SENT not in outcomes and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert outcomes == [bot.EMAIL_SENT]
+        assert fake.calls == 1
+
+
+def test_payment_email_not_rendered_while_breaker_open():
+    with sendgrid_harness() as fake, \
+            mock.patch.object(bot, 'payment_email_json') as render, \
+            mock.patch.object(bot, 'PAYMENT_EMAIL_MAX_ATTEMPTS', 1):
+        bot._sendgrid_breaker.update(failures=bot.SENDGRID_BREAKER_FAIL_MAX, open_until=time.monotonic() + 60)
+        outcome = bot.send_payment_confirmation_email('ISL-1', 'guest@example.com', '2026-05-01', '09:10', 4, 650)
+    assert outcome == bot.EMAIL_BREAKER_OPEN
+    render.assert_not_called()
+    assert fake.calls == 0
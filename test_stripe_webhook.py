@@ -0,0 +1,229 @@
+"""
+Tests for the Stripe webhook path: signature middleware -> stripe_events
+journal -> stripe_event_queue -> process_stripe_event, plus duplicate
+deliveries, startup replay and the shutdown drain.
+
+No database or Stripe account needed - the journal is an in-memory fake and
+process_stripe_event is replaced by a recorder.
+
+Run: pytest test_stripe_webhook.py
+"""
+
+import hashlib
+import hmac
+import json
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+import island_email_bot as bot
+
+WEBHOOK_SECRET = 'whsec_test_secret'
+
+
+class FakeJournalCursor:
+    """Cursor answering the stripe_events statements against FakeJournal.rows"""
+
+    def __init__(self, journal):
+        self.journal = journal
+        self.rowcount = 0
+        self.returned = []
+
+    def execute(self, sql, params=None):
+        statement = ' '.join(sql.split())
+        rows = self.journal.rows
+        if statement.startswith('INSERT INTO stripe_events'):
+            event_id, event_type, payload = params
+            if event_id in rows:
+                self.rowcount = 0
+            else:
+                rows[event_id] = {'type': event_type, 'payload': json.loads(payload), 'status': 'pending'}
+                self.rowcount = 1
+        elif "SET status = 'processing'" in statement:
+            row = rows.get(params[0])
+            self.rowcount = 1 if row and row['status'] == 'pending' else 0
+            if self.rowcount:
+                row['status'] = 'processing'
+        elif 'SET status = %s' in statement:
+            status, event_id = params
+            rows[event_id]['status'] = status
+            self.rowcount = 1
+        elif "SET status = 'pending'" in statement:
+            # Startup replay - the fake treats every unfinished row as stale
+            self.returned = []
+            for row in rows.values():
+                if row['status'] in ('pending', 'processing'):
+                    row['status'] = 'pending'
+                    self.returned.append((row['payload'],))
+            self.rowcount = len(self.returned)
+        else:
+            raise AssertionError(f"unexpected SQL: {statement}")
+
+    def fetchall(self):
+        return self.returned
+
+    def close(self):
+        pass
+
+
+class FakeJournal:
+    """Stands in for the connection pool; rows maps event_id -> journal row"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def cursor(self):
+        return FakeJournalCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@contextmanager
+def webhook_harness(journal=None, secret=WEBHOOK_SECRET):
+    """Patch the DB hooks and event processing; yields (test client, processed event IDs)"""
+    processed = []
+    with mock.patch.object(bot, 'get_db_connection', lambda: journal), \
+            mock.patch.object(bot, 'release_db_connection', lambda conn: None), \
+            mock.patch.object(bot, 'process_stripe_event', lambda event: processed.append(event['id'])), \
+            mock.patch.object(bot, 'STRIPE_WEBHOOK_SECRET', secret), \
+            mock.patch.object(bot, '_accepted_stripe_event_ids', bot.OrderedDict()):
+        yield bot.app.test_client(), processed
+        assert bot.drain_stripe_event_queue(5), "Stripe event queue did not drain"
+
+
+def signed_delivery(client, event, secret=WEBHOOK_SECRET):
+    """POST an event with a valid Stripe-Signature header"""
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return client.post(
+        bot.STRIPE_WEBHOOK_PATH,
+        data=payload,
+        content_type='application/json',
+        headers={'Stripe-Signature': f"t={timestamp},v1={signature}"},
+    )
+
+
+def charge_failed_event(event_id):
+    return {'id': event_id, 'type': 'charge.failed', 'data': {'object': {'id': 'ch_test'}}}
+
+
+def test_bad_signature_rejected_before_queueing():
+    journal = FakeJournal()
+    with webhook_harness(journal) as (client, processed):
+        response = client.post(
+            bot.STRIPE_WEBHOOK_PATH,
+            data=json.dumps(charge_failed_event('evt_forged')),
+            content_type='application/json',
+            headers={'Stripe-Signature': 't=1,v1=deadbeef'},
+        )
+    assert response.status_code == 400
+    assert json.loads(response.data) == {'error': 'Invalid signature'}
+    assert journal.rows == {} and processed == []
+
+
+def test_malformed_payload_rejected():
+    with webhook_harness(FakeJournal(), secret=None) as (client, processed):
+        response = client.post(bot.STRIPE_WEBHOOK_PATH, data=b'[1, 2]', content_type='application/json')
+    assert response.status_code == 400
+    assert processed == []
+
+
+def test_signed_event_is_journaled_queued_and_processed():
+    journal = FakeJournal()
+    with webhook_harness(journal) as (client, processed):
+        response = signed_delivery(client, charge_failed_event('evt_1'))
+    assert response.status_code == 200
+    assert json.loads(response.data) == {'status': 'queued'}
+    assert processed == ['evt_1']
+    assert journal.rows['evt_1']['status'] == 'processed'
+    assert journal.rows['evt_1']['payload']['type'] == 'charge.failed'
+
+
+def test_duplicate_event_id_processed_once():
+    journal = FakeJournal()
+    with webhook_harness(journal) as (client, processed):
+        first = signed_delivery(client, charge_failed_event('evt_dup'))
+        second = signed_delivery(client, charge_failed_event('evt_dup'))
+    assert json.loads(first.data) == {'status': 'queued'}
+    assert json.loads(second.data) == {'status': 'duplicate'}
+    assert processed == ['evt_dup']
+
+
+def test_duplicate_seen_by_another_worker_is_skipped():
+    # The other worker's journal insert won: this worker's insert is a no-op
+    journal = FakeJournal()
+    journal.rows['evt_other'] = {'type': 'charge.failed', 'payload': charge_failed_event('evt_other'), 'status': 'processed'}
+    with webhook_harness(journal) as (client, processed):
+        response = signed_delivery(client, charge_failed_event('evt_other'))
+    assert json.loads(response.data) == {'status': 'duplicate'}
+    assert processed == []
+
+
+def test_claimed_event_not_processed_twice():
+    # A replayed copy of an event another worker already claimed is dropped
+    journal = FakeJournal()
+    journal.rows['evt_claimed'] = {'type': 'charge.failed', 'payload': charge_failed_event('evt_claimed'), 'status': 'processing'}
+    with webhook_harness(journal) as (client, processed):
+        bot.stripe_event_queue.put(charge_failed_event('evt_claimed'))
+    assert processed == []
+
+
+def test_unhandled_event_type_ignored():
+    journal = FakeJournal()
+    with webhook_harness(journal) as (client, processed):
+        response = signed_delivery(client, {'id': 'evt_x', 'type': 'customer.created', 'data': {'object': {}}})
+    assert json.loads(response.data) == {'status': 'ignored'}
+    assert journal.rows == {} and processed == []
+
+
+def test_database_error_answers_500_so_stripe_retries():
+    class BrokenJournal(FakeJournal):
+        def cursor(self):
+            raise RuntimeError("connection lost")
+
+    with webhook_harness(BrokenJournal()) as (client, processed):
+        response = signed_delivery(client, charge_failed_event('evt_db_down'))
+    assert response.status_code == 500
+    assert processed == []
+
+
+def test_no_database_falls_back_to_in_memory_dedup():
+    with webhook_harness(None) as (client, processed):
+        first = signed_delivery(client, charge_failed_event('evt_nodb'))
+        second = signed_delivery(client, charge_failed_event('evt_nodb'))
+    assert json.loads(first.data) == {'status': 'queued'}
+    assert json.loads(second.data) == {'status': 'duplicate'}
+    assert processed == ['evt_nodb']
+
+
+def test_processing_error_marks_event_failed():
+    journal = FakeJournal()
+    with webhook_harness(journal) as (client, processed):
+        with mock.patch.object(bot, 'process_stripe_event', side_effect=ValueError("boom")):
+            signed_delivery(client, charge_failed_event('evt_boom'))
+            assert bot.drain_stripe_event_queue(5)
+    assert journal.rows['evt_boom']['status'] == 'failed'
+
+
+def test_startup_replay_requeues_unfinished_events():
+    journal = FakeJournal()
+    journal.rows['evt_lost'] = {'type': 'charge.failed', 'payload': charge_failed_event('evt_lost'), 'status': 'processing'}
+    journal.rows['evt_done'] = {'type': 'charge.failed', 'payload': charge_failed_event('evt_done'), 'status': 'processed'}
+    with webhook_harness(journal) as (client, processed):
+        assert bot.replay_unfinished_stripe_events() == 1
+    assert processed == ['evt_lost']
+    assert journal.rows['evt_lost']['status'] == 'processed'
+
+
+def test_drain_times_out_on_stuck_queue():
+    with mock.patch.object(bot, 'stripe_event_queue', bot.queue.Queue()):
+        bot.stripe_event_queue.put(charge_failed_event('evt_stuck'))
+        assert bot.drain_stripe_event_queue(0.05) is False
+        bot.stripe_event_queue.get()
+        bot.stripe_event_queue.task_done()
+        assert bot.drain_stripe_event_queue(0.05) is True